@@ -1,20 +1,205 @@
+import hashlib
+import hmac
 import json
-from pathlib import Path
+import os
 import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DATA_DIR = Path(__file__).parent.parent / 'data'
+USERS_FILE = DATA_DIR / 'users.json'     # snapshot
+USERS_LOG = DATA_DIR / 'users.jsonl'     # altas y cambios posteriores, una línea por usuario
+USERS_LOCK = DATA_DIR / 'users.lock'
+
+ALGORITHM = 'pbkdf2_sha256'
+ITERATIONS = 600_000
+SALT_BYTES = 16
+# Verificación sin usuario: mismo costo que una real
+DUMMY_HASH = f"{ALGORITHM}${ITERATIONS}${'00' * SALT_BYTES}${'00' * 32}"
+
+def hash_password(password, iterations=ITERATIONS):
+    salt = os.urandom(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    return f"{ALGORITHM}${iterations}${salt.hex()}${digest.hex()}"
+
+def verify_password(password, stored):
+    # Devuelve (válida, requiere rehash); las contraseñas en texto plano se aceptan y se rehashean
+    stored = stored or DUMMY_HASH
+    parts = stored.split('$')
+    if len(parts) == 4 and parts[0] == ALGORITHM:
+        try:
+            iterations, salt, expected = int(parts[1]), bytes.fromhex(parts[2]), bytes.fromhex(parts[3])
+        except ValueError:
+            return False, False
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+        valid = hmac.compare_digest(digest, expected)
+        return valid, valid and iterations < ITERATIONS
+    hash_password(password)  # igualar el costo del formato antiguo
+    valid = hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8'))
+    return valid, valid
+
+@contextmanager
+def file_lock(path=USERS_LOCK):
+    # Bloqueo consultivo entre procesos; el sistema lo libera si el proceso muere
+    with open(path, 'a+') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            # msvcrt.locking reintenta solo 10 veces: esperar hasta obtenerlo
+            while True:
+                try:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+class UserStore:
+    """Usuarios por email en memoria; al refrescar solo se lee lo agregado a users.jsonl desde la
+    última vez (users.json se relee solo si cambió). El log se compacta al pasar COMPACT_BYTES o
+    COMPACT_ENTRIES líneas."""
+    COMPACT_BYTES = 1 << 20
+    COMPACT_ENTRIES = 1000
+
+    def __init__(self, users_file=USERS_FILE, log_file=USERS_LOG, lock_file=USERS_LOCK):
+        self.users_file = Path(users_file)
+        self.log_file = Path(log_file)
+        self.lock_file = Path(lock_file)
+        self.lock = threading.RLock()
+        self.users_stamp = False  # aún sin leer (None: users.json no existe)
+        self.log_inode = None
+        self.log_offset = 0       # bytes de users.jsonl ya aplicados
+        self.log_entries = 0
+        self.by_email = {}
 
-USERS_FILE = Path(__file__).parent.parent / 'data' / 'users.json'
+    def _users_stamp(self):
+        try:
+            st = self.users_file.stat()
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
 
-def load_users():
-    return json.loads(USERS_FILE.read_text(encoding='utf-8'))
+    def refresh(self):
+        with self.lock:
+            users_stamp = self._users_stamp()
+            try:
+                st = self.log_file.stat()
+                log_inode, log_size = st.st_ino, st.st_size
+            except OSError:
+                log_inode, log_size = None, 0
+            if (users_stamp != self.users_stamp or log_inode != self.log_inode
+                    or log_size < self.log_offset):
+                # users.json cambió o el log se compactó/reemplazó: releer todo
+                users = json.loads(self.users_file.read_text(encoding='utf-8')).get("users", []) if users_stamp else []
+                self.by_email = {u["email"]: u for u in users}
+                self.users_stamp, self.log_inode = users_stamp, log_inode
+                self.log_offset = self.log_entries = 0
+            if log_size == self.log_offset:
+                return
+            try:
+                f = open(self.log_file, 'rb')
+            except FileNotFoundError:
+                return  # compactado entretanto: el próximo refresh relee users.json
+            with f:
+                if os.fstat(f.fileno()).st_ino != log_inode:
+                    return
+                f.seek(self.log_offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # escritura a medias: se lee cuando termine
+                    self.log_offset += len(line)
+                    self.log_entries += 1
+                    try:
+                        user = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.by_email[user["email"]] = user  # la última línea manda
 
-def save_users(data):
-    USERS_FILE.write_text(json.dumps(data, indent=2), encoding='utf-8')
+    def get(self, email):
+        with self.lock:
+            self.refresh()
+            return self.by_email.get(email)
+
+    def all(self):
+        with self.lock:
+            self.refresh()
+            return list(self.by_email.values())
+
+    def _append(self, user):
+        # El llamador tiene ambos bloqueos y acaba de refrescar
+        data = (json.dumps(user, ensure_ascii=False) + "\n").encode('utf-8')
+        with open(self.log_file, 'ab+') as f:
+            if f.seek(0, os.SEEK_END):
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    data = b"\n" + data
+            f.write(data)
+            self.log_offset = f.tell()
+        self.log_entries += 1
+        self.log_inode = self.log_file.stat().st_ino
+        self.by_email[user["email"]] = user
+        if self.log_offset > self.COMPACT_BYTES or self.log_entries > self.COMPACT_ENTRIES:
+            self._compact()
+
+    def put(self, user):
+        # Alta o cambio: se agrega al log sin reescribir users.json
+        with self.lock, file_lock(self.lock_file):
+            self.refresh()
+            self._append(user)
+
+    def add(self, user):
+        # Alta solo si el email no existe (comprobado con el bloqueo tomado)
+        with self.lock, file_lock(self.lock_file):
+            self.refresh()
+            if user["email"] in self.by_email:
+                return False
+            self._append(user)
+            return True
+
+    def _compact(self):
+        # El llamador tiene ambos bloqueos y acaba de refrescar
+        tmp = self.users_file.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"users": list(self.by_email.values())}, indent=2), encoding='utf-8')
+        tmp.replace(self.users_file)
+        if self.log_file.exists():
+            self.log_file.unlink()
+        self.users_stamp = self._users_stamp()
+        self.log_inode = None
+        self.log_offset = self.log_entries = 0
+
+    def compact(self):
+        # Vuelca el log en users.json y lo vacía
+        with self.lock, file_lock(self.lock_file):
+            self.refresh()
+            self._compact()
+
+store = UserStore()
 
 def authenticate(email, password):
-    for u in load_users().get("users", []):
-        if u["email"] == email and u["password"] == password:
-            return u
-    return None
+    # Lento a propósito (KDF): llamar fuera del hilo de la interfaz
+    user = store.get(email)
+    valid, rehash = verify_password(password, user["password"] if user else None)
+    if not user or not valid:
+        return None
+    if rehash:
+        user = dict(user, password=hash_password(password))
+        store.put(user)
+    return user
 
 def register_user(email, password):
     if "@" not in email:
@@ -23,10 +208,21 @@ def register_user(email, password):
         return False, "La contraseña debe contener al menos una letra mayúscula."
     if not re.search(r"\d", password):
         return False, "La contraseña debe contener al menos un número."
-    data = load_users()
-    for u in data.get("users", []):
-        if u["email"] == email:
-            return False, "El correo ya está registrado."
-    data["users"].append({"email": email, "password": password})
-    save_users(data)
+    if store.get(email):
+        return False, "El correo ya está registrado."
+    if not store.add({"email": email, "password": hash_password(password)}):
+        return False, "El correo ya está registrado."
     return True, "Usuario registrado exitosamente."
+
+def legacy_users():
+    # Usuarios con la contraseña aún en texto plano
+    return [u for u in store.all() if not u["password"].startswith(ALGORITHM + "$")]
+
+def migrate_passwords():
+    # Hashea las contraseñas que siguen en texto plano y consolida users.json; sin ellas no escribe nada
+    pending = legacy_users()
+    for user in pending:
+        store.put(dict(user, password=hash_password(user["password"])))
+    if pending:
+        store.compact()
+    return len(pending)
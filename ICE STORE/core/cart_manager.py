@@ -8,6 +8,13 @@ class Cart:
             self.items[prod_id] -= 1
             if self.items[prod_id] <= 0:
                 del self.items[prod_id]
+    def remove_items(self, items):
+        for prod_id, qty in items.items():
+            left = self.items.get(prod_id, 0) - qty
+            if left > 0:
+                self.items[prod_id] = left
+            else:
+                self.items.pop(prod_id, None)
     def get_items(self):
         return dict(self.items)
 
@@ -0,0 +1,153 @@
+import json
+import sys
+from collections.abc import MutableMapping
+from pathlib import Path
+
+PRODUCTS_FILE = Path(__file__).parent.parent / 'data' / 'products.json'
+
+class Product(MutableMapping):
+    """Producto compacto con interfaz de dict: __slots__ en vez de un dict por producto.
+
+    Los ids de texto numéricos ("12") se guardan como int (_text_id lo marca) y las
+    rutas de imagen se internan; al leer se devuelven los valores originales, también
+    si el id ya era un int. Claves extra van a un dict aparte."""
+    FIELDS = ("id", "name", "price", "stock", "image_url")
+    __slots__ = FIELDS + ("_text_id", "_extra")
+
+    def __init__(self, data=()):
+        self._text_id = False
+        self._extra = None
+        for key, value in dict(data).items():
+            self[key] = value
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            try:
+                value = getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+            return str(value) if key == "id" and self._text_id else value
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key == "id":
+            self._text_id = type(value) is str and value.isascii() and value.isdigit() and str(int(value)) == value
+            if self._text_id:
+                value = int(value)
+        elif key == "image_url" and type(value) is str:
+            value = sys.intern(value)
+        if key in self.FIELDS:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self.FIELDS and hasattr(self, key):
+            delattr(self, key)
+            if key == "id":
+                self._text_id = False
+        elif key in (self._extra or ()):
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        yield from (k for k in self.FIELDS if hasattr(self, k))
+        yield from list(self._extra or ())
+
+    def __len__(self):
+        return sum(hasattr(self, k) for k in self.FIELDS) + len(self._extra or ())
+
+    def __repr__(self):
+        return f"Product({dict(self)!r})"
+
+class Catalog:
+    """Catálogo de productos compartido: se lee una vez y se recarga solo si products.json cambia.
+
+    add/update/remove avisan a los suscriptores con listener(evento, producto),
+    evento "added", "updated" o "deleted", para que las vistas toquen solo ese producto."""
+    def __init__(self, products_file=PRODUCTS_FILE):
+        self.products_file = Path(products_file)
+        self.stamp = None
+        self.version = 0
+        self.items = []
+        self.by_id = {}
+        self.listeners = []
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def _emit(self, event, product):
+        for listener in list(self.listeners):
+            listener(event, product)
+
+    def _stamp(self):
+        st = self.products_file.stat()
+        return st.st_mtime_ns, st.st_size
+
+    def _set(self, products):
+        self.items = [p if isinstance(p, Product) else Product(p) for p in products]
+        self.by_id = {p["id"]: p for p in self.items}
+        self.version += 1
+
+    def refresh(self):
+        stamp = self._stamp()
+        if stamp != self.stamp:
+            self._set(json.loads(self.products_file.read_text(encoding='utf-8'))["products"])
+            self.stamp = stamp
+
+    def products(self):
+        self.refresh()
+        return list(self.items)
+
+    def get(self, pid):
+        self.refresh()
+        return self.by_id.get(pid)
+
+    def _write(self, products):
+        tmp = self.products_file.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"products": products}, indent=2, default=dict), encoding='utf-8')
+        tmp.replace(self.products_file)
+
+    def _position(self, pid):
+        return next((i for i, p in enumerate(self.items) if p["id"] == pid), None)
+
+    def _commit(self, items, event, product):
+        # Guarda items y, si se pudo escribir, los aplica en memoria y avisa
+        self._write(items)
+        self.items = items
+        if event == "deleted":
+            del self.by_id[product["id"]]
+        else:
+            self.by_id[product["id"]] = product
+        self.version += 1
+        self.stamp = self._stamp()
+        self._emit(event, product)
+        return product
+
+    def add(self, data):
+        self.refresh()
+        product = Product(data)
+        return self._commit(self.items + [product], "added", product)
+
+    def update(self, pid, **changes):
+        self.refresh()
+        i = self._position(pid)
+        if i is None:
+            return None
+        product = Product(self.items[i])
+        product.update(changes)
+        return self._commit(self.items[:i] + [product] + self.items[i+1:], "updated", product)
+
+    def remove(self, pid):
+        self.refresh()
+        i = self._position(pid)
+        if i is None:
+            return None
+        return self._commit(self.items[:i] + self.items[i+1:], "deleted", self.items[i])
+
+catalog = Catalog()
@@ -0,0 +1,100 @@
+import argparse
+import asyncio
+import json
+import random
+import uuid
+
+class FakeGatewayServer:
+    """Pasarela de pagos local para desarrollo y pruebas.
+
+    Responde POST /<pasarela>/authorize con keep-alive, latencia y tasa de errores
+    configurables, y respeta Idempotency-Key (misma clave, mismo resultado)."""
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 decline_over=None, seed=None):
+        self.host, self.port = host, port
+        self.latency, self.jitter = latency, jitter
+        self.error_rate = error_rate
+        self.decline_over = decline_over
+        self.random = random.Random(seed)
+        self.results = {}  # Idempotency-Key -> respuesta
+        self.requests = 0
+        self.server = None
+        self.clients = set()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return f"http://{self.host}:{self.port}"
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            for task in list(self.clients):
+                task.cancel()
+            await asyncio.gather(*self.clients, return_exceptions=True)
+            await self.server.wait_closed()
+
+    def _decide(self, gateway, body):
+        amount = body.get("amount", 0)
+        if self.decline_over is not None and amount > self.decline_over:
+            return {"approved": False, "transaction_id": None, "reason": "Fondos insuficientes"}
+        return {"approved": True, "transaction_id": f"{gateway}-{uuid.uuid4().hex[:12]}", "reason": None}
+
+    async def _respond(self, path, headers, body):
+        self.requests += 1
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        parts = path.strip("/").split("/")
+        if len(parts) != 2 or parts[1] != "authorize":
+            return 404, {"error": "not found"}
+        if self.random.random() < self.error_rate:
+            return 503, {"error": "unavailable"}
+        key = headers.get("idempotency-key") or body.get("idempotency_key")
+        if key not in self.results:
+            self.results[key] = self._decide(parts[0], body)
+        return 200, self.results[key]
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self.clients.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                raw = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, data = await self._respond(path, headers, json.loads(raw or b"{}"))
+                payload = json.dumps(data).encode()
+                writer.write((f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                              f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+                              f"Connection: keep-alive\r\n\r\n").encode() + payload)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError, asyncio.CancelledError):
+            pass
+        finally:
+            self.clients.discard(task)
+            writer.close()
+
+async def serve(args):
+    server = FakeGatewayServer(args.host, args.port, args.latency, args.jitter, args.error_rate, args.decline_over)
+    print(f"Pasarela falsa en {await server.start()}")
+    await asyncio.Event().wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pasarela de pagos falsa (python -m core.fake_gateway)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="segundos por respuesta")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fracción de respuestas 503")
+    parser.add_argument("--decline-over", type=int, default=None, help="rechaza montos mayores")
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
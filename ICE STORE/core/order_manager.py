@@ -1,36 +1,175 @@
 import json
+import os
+import secrets
+import threading
+import time
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
+from core.auth import file_lock
+from core.catalog import catalog
 
-ORDERS_FILE = Path(__file__).parent.parent / 'data' / 'orders.json'
-PRODUCTS_FILE = Path(__file__).parent.parent / 'data' / 'products.json'
+DATA_DIR = Path(__file__).parent.parent / 'data'
+ORDERS_FILE = DATA_DIR / 'orders.json'           # formato antiguo, solo se lee para migrar
+ORDERS_LOG = DATA_DIR / 'orders.jsonl'           # un pedido por línea, solo se agrega al final
+ORDERS_INDEX = DATA_DIR / 'orders.index.jsonl'  # [usuario, inicio, fin] por pedido de ORDERS_LOG, solo se agrega
+ORDERS_LOCK = DATA_DIR / 'orders.lock'          # migración, escrituras del log y del índice
+
+_index = None
+
+# Ids: "P" + AAAAMMDDhhmmss + milisegundos (UTC) + 16 caracteres Crockford con 40 bits de nodo (aleatorio
+# por proceso) | 40 bits de secuencia. Los ids antiguos eran solo la fecha local (dígitos): el prefijo
+# ordena los nuevos después de todos ellos sin depender de la zona horaria
+ID_PREFIX = "P"
+CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+SEQ_BITS = 40
+NODE_BITS = 40
+_id_lock = threading.Lock()
+_id_state = {"pid": None, "node": 0, "ms": 0, "seq": 0}
 
 def load_json(path):
     return json.loads(Path(path).read_text(encoding='utf-8'))
 
-def save_orders(data):
-    ORDERS_FILE.write_text(json.dumps(data, indent=2), encoding='utf-8')
+def _encode(order):
+    return (json.dumps(order, ensure_ascii=False) + "\n").encode('utf-8')
+
+def _migrate():
+    # Convierte orders.json en el log la primera vez
+    if ORDERS_LOG.exists() or not ORDERS_FILE.exists():
+        return
+    with file_lock(ORDERS_LOCK):
+        if ORDERS_LOG.exists():
+            return  # otro proceso migró mientras se esperaba el bloqueo
+        tmp = ORDERS_LOG.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(b"".join(_encode(o) for o in load_json(ORDERS_FILE).get("orders", [])))
+        tmp.replace(ORDERS_LOG)
+
+def new_order_id():
+    # Único entre procesos (nodo) y ordenable por tiempo; monótono dentro del proceso
+    with _id_lock:
+        st = _id_state
+        if st["pid"] != os.getpid():  # proceso nuevo (o fork): nodo nuevo
+            st.update(pid=os.getpid(), node=secrets.randbits(NODE_BITS), ms=0, seq=0)
+        ms = max(time.time_ns() // 1_000_000, st["ms"])  # el reloj nunca retrocede
+        if ms == st["ms"]:
+            st["seq"] += 1
+            if st["seq"] >> SEQ_BITS:
+                ms, st["seq"] = ms + 1, 0
+        else:
+            st["seq"] = 0
+        st["ms"] = ms
+        value = (st["node"] << SEQ_BITS) | st["seq"]
+    stamp = datetime.fromtimestamp(ms // 1000, timezone.utc).strftime("%Y%m%d%H%M%S")
+    tail = "".join(CROCKFORD[(value >> shift) & 31] for shift in range(NODE_BITS + SEQ_BITS - 5, -1, -5))
+    return f"{ID_PREFIX}{stamp}{ms % 1000:03d}{tail}"
+
+def _append_bytes(path, data):
+    # Modo "a": cada bloque se escribe de una vez al final, aunque haya varios procesos
+    with open(path, 'ab+') as f:
+        if f.seek(0, os.SEEK_END):
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                data = b"\n" + data  # línea cortada por un cierre abrupto: no pegarse a ella
+        f.write(data)
+
+def _read_index():
+    # Aplica las entradas del índice agregadas desde la última lectura (también por otros procesos)
+    global _index
+    st = ORDERS_INDEX.stat() if ORDERS_INDEX.exists() else None
+    size, inode = (st.st_size, st.st_ino) if st else (0, None)
+    if _index is None or size < _index["read"] or inode != _index["inode"]:
+        _index = {"read": 0, "log": 0, "users": {}, "inode": inode}  # índice nuevo o reconstruido
+    if size == _index["read"]:
+        return
+    with open(ORDERS_INDEX, 'rb') as f:
+        f.seek(_index["read"])
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            _index["read"] += len(line)
+            try:
+                user, offset, end = json.loads(line)
+            except ValueError:
+                continue
+            if offset != _index["log"]:
+                continue  # repetida: dos procesos indexaron el mismo tramo
+            if user is not None:
+                _index["users"].setdefault(user, []).append(offset)
+            _index["log"] = end
+
+def _sync_index():
+    # Indexa solo lo agregado al log desde la última vez; el índice también es solo de agregar
+    _migrate()
+    _read_index()
+    if _log_size() == _index["log"]:
+        return _index
+    with file_lock(ORDERS_LOCK):
+        # Con el bloqueo: otro proceso pudo indexar o reconstruir mientras se esperaba
+        _read_index()
+        size = _log_size()
+        if size < _index["log"]:
+            # El índice no corresponde al log (log reemplazado): reconstruirlo desde cero.
+            # Archivo nuevo (otro inode): los demás procesos descartan lo que tenían leído
+            tmp = ORDERS_INDEX.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_bytes(b"")
+            tmp.replace(ORDERS_INDEX)
+            _read_index()
+        if size == _index["log"]:
+            return _index
+        offset = _index["log"]
+        entries = []
+        with open(ORDERS_LOG, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # escritura a medias: se indexa cuando termine
+                try:
+                    user = json.loads(line)["user"]
+                except (ValueError, KeyError):
+                    user = None
+                entries.append(json.dumps([user, offset, offset + len(line)], ensure_ascii=False) + "\n")
+                offset += len(line)
+        if entries:
+            _append_bytes(ORDERS_INDEX, "".join(entries).encode('utf-8'))
+            _read_index()
+    return _index
+
+def _log_size():
+    return ORDERS_LOG.stat().st_size if ORDERS_LOG.exists() else 0
+
+def _append(order):
+    _migrate()
+    with file_lock(ORDERS_LOCK):
+        _append_bytes(ORDERS_LOG, _encode(order))
+    _sync_index()
 
-def create_order(user_email, items, shipping, payment_method, discount_code=None, discount_rate=0):
-    data = load_json(ORDERS_FILE)
-    products = load_json(PRODUCTS_FILE)["products"]
-    total = sum(next(p for p in products if p["id"] == pid)["price"] * qty for pid, qty in items.items())
+def create_order(user_email, items, shipping, payment_method, discount_code=None, discount_rate=0, transaction_id=None,
+                 prices=None):
+    # prices: los cobrados (el producto pudo cambiar o eliminarse durante el pago); si no, los del catálogo
+    prices = prices or {pid: catalog.get(pid)["price"] for pid in items}
+    total = sum(prices[pid] * qty for pid, qty in items.items())
     discounted = int(total*(1-discount_rate))
     order = {
-        "id": datetime.now().strftime("%Y%m%d%H%M%S"),
+        "id": new_order_id(),
         "user": user_email,
         "items": [{"id": pid, "qty": qty} for pid, qty in items.items()],
         "shipping": shipping,
         "payment_method": payment_method,
+        "transaction_id": transaction_id,
         "discount_code": discount_code,
         "total": total,
         "discounted_total": discounted,
         "date": datetime.now().isoformat()
     }
-    data["orders"].append(order)
-    save_orders(data)
+    _append(order)
     return order
 
 def get_orders_by_user(user_email):
-    data = load_json(ORDERS_FILE)
-    return [o for o in data["orders"] if o["user"] == user_email]
+    offsets = _sync_index()["users"].get(user_email, [])
+    orders = []
+    if not offsets:
+        return orders
+    with open(ORDERS_LOG, 'rb') as f:
+        for offset in offsets:
+            f.seek(offset)
+            orders.append(json.loads(f.readline()))
+    return orders
@@ -0,0 +1,120 @@
+import argparse
+import itertools
+import json
+import platform
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from core.fake_gateway import FakeGatewayServer
+from core.payment_gateways import GATEWAYS, MAX_CONNECTIONS, RETRIES, TIMEOUT, WORKERS, PaymentProcessor
+
+def percentile(sorted_values, p):
+    # Percentil por rango más cercano
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+def run_scenario(workers, max_connections, concurrency, requests, args):
+    """Lanza `requests` pagos por PaymentProcessor (cola + `workers`) con hasta `concurrency`
+    pendientes a la vez, contra una pasarela falsa nueva. La latencia va de submit al resultado,
+    como la ve el checkout: incluye la espera en la cola."""
+    server = FakeGatewayServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                               seed=args.seed)
+    processor = PaymentProcessor(base_url=None, fake=server, workers=workers, timeout=args.timeout,
+                                 retries=args.retries, backoff=args.backoff, max_connections=max_connections)
+    latencies, outcomes = [], []
+    in_flight = threading.BoundedSemaphore(concurrency)
+    done = threading.Event()
+    lock = threading.Lock()
+
+    def finished(future, start):
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            outcomes.append(future.result())
+            if len(outcomes) == requests:
+                done.set()
+        in_flight.release()
+
+    try:
+        started = time.perf_counter()
+        for _ in range(requests):
+            in_flight.acquire()
+            start = time.perf_counter()
+            future = processor.submit(args.gateway, args.amount)
+            future.add_done_callback(lambda f, start=start: finished(f, start))
+        done.wait()
+        elapsed = time.perf_counter() - started
+    finally:
+        processor.close()
+
+    latencies.sort()
+    ms = lambda v: None if v is None else round(v * 1000, 3)
+    ok = sum(o["ok"] for o in outcomes)
+    return {
+        "workers": workers,
+        "max_connections": max_connections,
+        "concurrency": concurrency,
+        "requests": requests,
+        "ok": ok,
+        "failed": requests - ok,
+        "mean_attempts": round(sum(o["attempts"] for o in outcomes) / requests, 3),
+        "server_requests": server.requests,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]),
+        "mean_ms": ms(sum(latencies) / len(latencies)),
+        "throughput_rps": round(requests / elapsed, 2),
+        "elapsed_s": round(elapsed, 3),
+    }
+
+def run(args):
+    results = []
+    for workers, max_connections, concurrency in itertools.product(
+            args.workers, args.max_connections, args.concurrency):
+        row = run_scenario(workers, max_connections, concurrency, args.requests, args)
+        results.append(row)
+        print(f"workers={workers:<3} conns={max_connections:<3} c={concurrency:<4} "
+              f"ok={row['ok']}/{row['requests']:<6} "
+              f"p50={row['p50_ms']}ms p95={row['p95_ms']}ms p99={row['p99_ms']}ms "
+              f"{row['throughput_rps']} req/s")
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de pasarelas de pago (python -m core.payment_bench)")
+    # Todas las pasarelas usan el mismo cliente: el nombre solo cambia la ruta
+    parser.add_argument("--gateway", choices=GATEWAYS, default=GATEWAYS[0])
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 4, WORKERS, 16],
+                        help="workers de la cola de pagos")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[8, 32],
+                        help="pagos pendientes a la vez")
+    parser.add_argument("--requests", type=int, default=200, help="autorizaciones por escenario")
+    parser.add_argument("--amount", type=int, default=10000)
+    parser.add_argument("--latency", type=float, default=0.02, help="latencia base del servidor (s)")
+    parser.add_argument("--jitter", type=float, default=0.01, help="latencia extra aleatoria (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fracción de respuestas 503")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT)
+    parser.add_argument("--retries", type=int, default=RETRIES)
+    parser.add_argument("--backoff", type=float, default=0.05)
+    parser.add_argument("--max-connections", nargs="+", type=int, default=[MAX_CONNECTIONS],
+                        help="conexiones por pasarela")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", type=Path, default=Path("payment_bench.json"))
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    report = {
+        "date": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "params": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Resultados en {args.output}")
+    return report
+
+if __name__ == "__main__":
+    main()
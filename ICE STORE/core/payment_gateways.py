@@ -1,15 +1,166 @@
-class WebPay:
-    @staticmethod
-    def process(amount): return True
+import asyncio
+import json
+import os
+import random
+import threading
+import uuid
+from typing import Protocol
+from urllib.parse import urlsplit
 
-class MACH:
-    @staticmethod
-    def process(amount): return True
+PAYMENTS_URL = os.environ.get("ICE_PAYMENTS_URL")
+# ICE_FAKE_PAYMENTS=1 levanta la pasarela falsa local (core/fake_gateway.py), que aprueba todo:
+# solo para desarrollo. Sin ninguna de las dos no se puede pagar.
+FAKE_PAYMENTS = os.environ.get("ICE_FAKE_PAYMENTS") == "1"
+TIMEOUT = 5.0
+RETRIES = 3
+BACKOFF = 0.2
+MAX_CONNECTIONS = 4
+WORKERS = 8
+RETRY_STATUS = {429, 500, 502, 503, 504}
 
-class BancoEstado:
-    @staticmethod
-    def process(amount): return True
+class PaymentsNotConfigured(RuntimeError):
+    pass
 
-class Transferencia:
-    @staticmethod
-    def process(amount): return True
+class PaymentGateway(Protocol):
+    name: str
+    async def authorize(self, amount, idempotency_key): ...
+    async def close(self): ...
+
+def result(gateway, key, ok, attempts, transaction_id=None, error=None, declined=False):
+    # declined: la pasarela respondió y rechazó el pago (no tiene sentido reintentar con la misma clave)
+    return {"ok": ok, "gateway": gateway, "idempotency_key": key, "attempts": attempts,
+            "transaction_id": transaction_id, "error": error, "declined": declined}
+
+class HttpGateway:
+    """Cliente HTTP/1.1 keep-alive sobre asyncio con pool de conexiones, timeout y reintentos.
+
+    Todas las pasarelas hablan el mismo protocolo; solo cambia la ruta (/<nombre>/authorize)."""
+    def __init__(self, name, base_url, timeout=TIMEOUT, retries=RETRIES, backoff=BACKOFF,
+                 max_connections=MAX_CONNECTIONS):
+        self.name = name
+        url = urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.path = f"{url.path.rstrip('/')}/{self.name.lower()}/authorize"
+        self.timeout, self.retries, self.backoff = timeout, retries, backoff
+        self.slots = asyncio.Semaphore(max_connections)
+        self.idle = []  # conexiones (reader, writer) libres para reutilizar
+
+    async def _connection(self):
+        while self.idle:
+            reader, writer = self.idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        return await asyncio.open_connection(self.host, self.port)
+
+    async def _request(self, body, key):
+        reader, writer = await self._connection()
+        try:
+            payload = json.dumps(body).encode()
+            writer.write((f"POST {self.path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                          f"Content-Type: application/json\r\nIdempotency-Key: {key}\r\n"
+                          f"Content-Length: {len(payload)}\r\n\r\n").encode() + payload)
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode().partition(":")
+                headers[name.strip().lower()] = value.strip()
+            data = json.loads(await reader.readexactly(int(headers.get("content-length", 0))) or b"{}")
+        except BaseException:
+            writer.close()
+            raise
+        if headers.get("connection", "").lower() == "close":
+            writer.close()
+        else:
+            self.idle.append((reader, writer))
+        return status, data
+
+    async def authorize(self, amount, idempotency_key=None):
+        # Los reintentos reutilizan la clave: la pasarela no cobra dos veces
+        key = idempotency_key or str(uuid.uuid4())
+        error = None
+        for attempt in range(1, self.retries + 2):
+            try:
+                async with self.slots:
+                    status, data = await asyncio.wait_for(
+                        self._request({"amount": amount, "idempotency_key": key}, key), self.timeout)
+                if status == 200:
+                    approved = data.get("approved", False)
+                    return result(self.name, key, approved, attempt, data.get("transaction_id"),
+                                  data.get("reason"), declined=not approved)
+                error = f"HTTP {status}: {data.get('error', '')}".strip()
+                if status not in RETRY_STATUS:
+                    return result(self.name, key, False, attempt, error=error, declined=True)
+            except (asyncio.TimeoutError, OSError, ValueError, IndexError, asyncio.IncompleteReadError) as e:
+                error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+            if attempt <= self.retries:
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1) * (0.5 + random.random()))
+        return result(self.name, key, False, self.retries + 1, error=error)
+
+    async def close(self):
+        while self.idle:
+            self.idle.pop()[1].close()
+
+GATEWAYS = ("WebPay", "MACH", "BancoEstado", "Transferencia")
+
+class PaymentProcessor:
+    """Cola de pagos procesada en paralelo por un event loop propio en un hilo de fondo."""
+    def __init__(self, base_url=PAYMENTS_URL, workers=WORKERS, fake=FAKE_PAYMENTS, **gateway_options):
+        # fake: True para la pasarela falsa por defecto o un FakeGatewayServer ya configurado;
+        # solo se usa si no hay base_url
+        if base_url is None and not fake:
+            raise PaymentsNotConfigured("No hay pasarela de pagos configurada (ICE_PAYMENTS_URL)")
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="payments", daemon=True)
+        self.thread.start()
+        self.fake = None
+        if base_url is None:
+            if fake is True:
+                from core.fake_gateway import FakeGatewayServer
+                fake = FakeGatewayServer()
+            self.fake = fake
+            base_url = self._call(self.fake.start()).result()
+        self.gateways = self._call(self._setup(base_url, workers, gateway_options)).result()
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def _setup(self, base_url, workers, options):
+        # Semáforos, colas y tareas deben crearse dentro del loop
+        self.queue = asyncio.Queue()
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(workers)]
+        return {name: HttpGateway(name, base_url, **options) for name in GATEWAYS}
+
+    async def _worker(self):
+        while True:
+            gateway, amount, key, future = await self.queue.get()
+            try:
+                outcome = await self.gateways[gateway].authorize(amount, key)
+            except Exception as e:
+                outcome = result(gateway, key, False, 0, error=str(e))
+            if not future.cancelled():
+                future.set_result(outcome)
+            self.queue.task_done()
+
+    async def _enqueue(self, gateway, amount, key):
+        future = self.loop.create_future()
+        await self.queue.put((gateway, amount, key, future))
+        return await future
+
+    def submit(self, gateway, amount, idempotency_key=None):
+        # Seguro desde cualquier hilo; devuelve un concurrent.futures.Future con el resultado
+        return self._call(self._enqueue(gateway, amount, idempotency_key or str(uuid.uuid4())))
+
+    async def _close(self):
+        for task in self.tasks:
+            task.cancel()
+        for gateway in self.gateways.values():
+            await gateway.close()
+        if self.fake:
+            await self.fake.stop()
+
+    def close(self):
+        if self.loop.is_running():
+            self._call(self._close()).result(TIMEOUT)
+            self.loop.call_soon_threadsafe(self.loop.stop)
@@ -0,0 +1,123 @@
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from heapq import nlargest
+from core.catalog import catalog
+
+FIELD_WEIGHTS = {"name": 3.0, "description": 1.0}
+PREFIX_PENALTY = 0.5
+MAX_PREFIX_TERMS = 500
+MIN_PREFIX_LEN = 2  # términos más cortos solo coinciden exactos ("l" no trae todo lo que empieza por l)
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def fold(text):
+    # "Canción Ñandú" -> "cancion nandu"
+    text = unicodedata.normalize("NFKD", str(text))
+    return "".join(c for c in text if not unicodedata.combining(c)).casefold()
+
+def tokenize(text):
+    return TOKEN_RE.findall(fold(text))
+
+class SearchIndex:
+    """Índice invertido de productos (nombre y descripción) con prefijos y ranking."""
+    def __init__(self, source=catalog):
+        self.source = source
+        self.version = None
+        self.clear()
+        source.subscribe(self.on_change)
+
+    def clear(self):
+        self.docs = {}       # id -> producto
+        self.postings = {}   # término -> {id: peso}
+        self.doc_terms = {}  # id -> términos del producto (para borrar)
+        self.terms = []      # términos ordenados, para buscar prefijos con bisect
+
+    def refresh(self):
+        # Reconstruye solo si el catálogo cambió fuera de add()/update()
+        self.source.refresh()
+        if self.source.version == self.version:
+            return
+        self.clear()
+        for p in self.source.items:
+            self._index(p)
+        self.version = self.source.version
+
+    def on_change(self, event, product):
+        # Evento de catalog.add/update/remove: si el índice estaba al día se aplica solo ese
+        # producto; si no, refresh() lo reconstruye en la próxima búsqueda
+        if self.version != self.source.version - 1:
+            return
+        if event == "deleted":
+            self.remove(product["id"])
+        else:
+            self.add(product)
+        self.version = self.source.version
+
+    def _index(self, product):
+        pid = product["id"]
+        weights = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(product.get(field) or ""):
+                weights[term] = weights.get(term, 0) + weight
+        for term, weight in weights.items():
+            if term not in self.postings:
+                self.postings[term] = {}
+                insort(self.terms, term)
+            self.postings[term][pid] = weight
+        self.docs[pid] = product
+        self.doc_terms[pid] = tuple(weights)
+
+    def remove(self, pid):
+        for term in self.doc_terms.pop(pid, ()):
+            docs = self.postings[term]
+            docs.pop(pid, None)
+            if not docs:
+                del self.postings[term]
+                del self.terms[bisect_left(self.terms, term)]
+        self.docs.pop(pid, None)
+
+    def add(self, product):
+        self.remove(product["id"])
+        self._index(product)
+
+    update = add
+
+    def _expand(self, token):
+        # Términos que empiezan por token: exacto con peso completo, resto penalizados
+        if len(token) < MIN_PREFIX_LEN:
+            if token in self.postings:
+                yield token, 1.0
+            return
+        i = bisect_left(self.terms, token)
+        end = min(len(self.terms), i + MAX_PREFIX_TERMS)
+        while i < end and self.terms[i].startswith(token):
+            term = self.terms[i]
+            yield term, 1.0 if term == token else PREFIX_PENALTY * len(token) / len(term)
+            i += 1
+
+    def search(self, query, limit=50):
+        """Devuelve (total, productos) ordenados por relevancia; todos los términos deben coincidir."""
+        self.refresh()
+        tokens = tokenize(query)
+        if not tokens:
+            return len(self.docs), list(self.docs.values())[:limit]
+        per_token = []
+        for token in dict.fromkeys(tokens):
+            token_scores = {}
+            for term, factor in self._expand(token):
+                for pid, weight in self.postings[term].items():
+                    score = weight * factor
+                    if score > token_scores.get(pid, 0):
+                        token_scores[pid] = score
+            if not token_scores:
+                return 0, []
+            per_token.append(token_scores)
+        # Intersección empezando por el término más selectivo
+        per_token.sort(key=len)
+        scores = per_token[0]
+        for token_scores in per_token[1:]:
+            scores = {pid: s + token_scores[pid] for pid, s in scores.items() if pid in token_scores}
+        top = nlargest(limit, scores.items(), key=lambda item: item[1])
+        return len(scores), [self.docs[pid] for pid, _ in top]
+
+search_index = SearchIndex()
@@ -0,0 +1,24 @@
+import time
+
+STARTED = time.perf_counter()  # se importa antes que el resto de la app
+
+class StartupTimer:
+    """Tiempo de cada etapa del arranque, medido desde que se importó este módulo."""
+    def __init__(self, started=STARTED):
+        self.started = self.last = started
+        self.marks = []
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.marks.append((stage, now - self.last))
+        self.last = now
+
+    def total(self):
+        return self.last - self.started
+
+    def report(self):
+        lines = [f"  {stage:<28}{seconds * 1000:8.1f} ms" for stage, seconds in self.marks]
+        lines.append(f"  {'total':<28}{self.total() * 1000:8.1f} ms")
+        return "Arranque:\n" + "\n".join(lines)
+
+timer = StartupTimer()
@@ -0,0 +1,12 @@
+from pathlib import Path
+import customtkinter as ctk
+from shared.images import ThumbnailCache
+
+DATA_DIR = Path(__file__).parent.parent / 'data'
+THUMBS_DIR = DATA_DIR / 'thumbnails'
+
+def ctk_image(img, size):
+    return ctk.CTkImage(img, size=size)
+
+# Las image_url locales ("images/...") son relativas a data/
+thumbnails = ThumbnailCache(THUMBS_DIR, base_dir=DATA_DIR, to_photo=ctk_image)
@@ -1,16 +1,23 @@
 
+from core.startup import timer  # primero: mide también las importaciones
 import customtkinter as ctk
-from PIL import Image
-from io import BytesIO
-from urllib.request import urlopen
-import json
+import os
+import sys
 from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # shared/: código común con Proyecto
 from tkinter import messagebox, filedialog, simpledialog
 from core.cart_manager import cart
-from core.auth import authenticate, register_user
-from core.payment_gateways import WebPay, MACH, BancoEstado, Transferencia
+from core.auth import authenticate, register_user, legacy_users, migrate_passwords
 from core.order_manager import create_order, get_orders_by_user
+from core.thumbnails import thumbnails
+from shared.images import ImageLoader
+from core.search_index import search_index
+from core.catalog import catalog
 import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+timer.mark("importaciones")
 
 # Theme
 ctk.set_appearance_mode("dark")
@@ -22,31 +29,20 @@ ENTRY_BG = "#1F1F1F"
 ACCENT = "#00FF00"
 TEXT = "#FFFFFF"
 FONT = ("Courier", 12)
+SEARCH_DELAY_MS = 150
+SEARCH_LIMIT = 50
+AUTH_WORKERS = 2
+POLL_MS = 50
+CATALOG_BATCH = 24  # tarjetas por tanda; la primera tanda se arma antes de mostrar la ventana
+# ICE_STARTUP_REPORT=1 imprime el tiempo de cada etapa del arranque
+STARTUP_REPORT = bool(os.environ.get("ICE_STARTUP_REPORT"))
 
 # Data paths
 DATA_DIR = Path(__file__).parent / "data"
-PRODUCTS_FILE = DATA_DIR / "products.json"
 IMAGES_DIR = DATA_DIR / "images"
 
 def load_products():
-    return json.loads(Path(PRODUCTS_FILE).read_text(encoding="utf-8"))["products"]
-
-def save_products(products):
-    Path(PRODUCTS_FILE).write_text(json.dumps({"products": products}, indent=2), encoding="utf-8")
-
-def load_image(url, size):
-    if not url:
-        return None
-    try:
-        if url.startswith("images/"):
-            path = Path(__file__).parent / "data" / url
-            img = Image.open(path)
-        else:
-            data = urlopen(url).read()
-            img = Image.open(BytesIO(data))
-        return ctk.CTkImage(img, size=size)
-    except:
-        return None
+    return catalog.products()
 
 class App(ctk.CTk):
     def __init__(self):
@@ -58,6 +54,16 @@ class App(ctk.CTk):
         self.shipping_info = {}
         self.discount_code = None
         self.discount_rate = 0
+        self.image_loader = ImageLoader(self, thumbnails)
+        # Hashing de contraseñas fuera del hilo de la interfaz
+        self.auth_pool = ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix="auth")
+        if legacy_users():  # sin contraseñas en texto plano no hay nada que migrar ni reescribir
+            self.auth_pool.submit(migrate_passwords)
+        # Pagos: cola asíncrona con su propio event loop, creada con el primer pago
+        self._payments = None
+        self.payment_key = None
+        self.payment_amount = None
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
 
         # Header
         header = ctk.CTkFrame(self, fg_color=BG, height=50)
@@ -72,37 +78,128 @@ class App(ctk.CTk):
         ctk.CTkButton(header, text="⚙️", fg_color=BG, text_color=ACCENT,
                       font=("Courier",20), command=self.show_admin).pack(side="right", padx=5)
 
-        # Container frames
+        # Container: cada vista se crea la primera vez que se muestra
         self.container = ctk.CTkFrame(self, fg_color=BG)
         self.container.pack(fill="both", expand=True)
         self.frames = {}
-        for name in ["catalog","cart","account","search","shipping","payment","history","admin"]:
-            f = ctk.CTkScrollableFrame(self.container, fg_color=BG)
-            f.place(relx=0, rely=0, relwidth=1, relheight=1)
-            self.frames[name] = f
-
-        # Build views
-        self.build_catalog(); self.build_cart(); self.build_account()
-        self.build_search(); self.build_shipping(); self.build_payment()
-        self.build_history(); self.build_admin()
+        self.catalog_job = None
+        self.cards = {}  # id -> tarjeta ya dibujada en el catálogo
+        catalog.subscribe(self.on_catalog_change)
+        timer.mark("ventana")
         self.show_catalog()
+        timer.mark("catálogo (primera tanda)")
+        self.after_idle(self.startup_done)
+
+    def startup_done(self):
+        timer.mark("interactiva")
+        if STARTUP_REPORT:
+            print(timer.report())
+
+    def view(self, name, rebuild=False):
+        # Frame de la vista; build_<name> corre al crearlo y, con rebuild, en cada llamada
+        f = self.frames.get(name)
+        if f is None:
+            f = self.frames[name] = ctk.CTkScrollableFrame(self.container, fg_color=BG)
+            f.place(relx=0, rely=0, relwidth=1, relheight=1)
+            getattr(self, f"build_{name}")()
+        elif rebuild:
+            getattr(self, f"build_{name}")()
+        return f
+
+    @property
+    def payments(self):
+        if self._payments is None:
+            from core.payment_gateways import PaymentProcessor
+            self._payments = PaymentProcessor()
+        return self._payments
 
     def build_catalog(self):
         f = self.frames["catalog"]; [w.destroy() for w in f.winfo_children()]
-        prods = load_products()
-        grid = ctk.CTkScrollableFrame(f, fg_color=BG)
-        grid.pack(fill="both", expand=True, padx=20, pady=10)
-        for idx, p in enumerate(prods):
-            card = ctk.CTkFrame(grid, fg_color=ENTRY_BG, corner_radius=8)
-            card.grid(row=idx//4, column=idx%4, padx=10, pady=10)
-            img = load_image(p.get("image_url",""), size=(120,120))
-            if img:
-                lbl = ctk.CTkLabel(card, image=img, text="")
-                lbl.image = img; lbl.pack(pady=(10,5))
-            ctk.CTkLabel(card, text=p["name"], text_color=TEXT, font=FONT).pack()
-            ctk.CTkLabel(card, text=f"$ {p['price']:,}", text_color=ACCENT, font=FONT).pack(pady=(0,5))
-            ctk.CTkButton(card, text="Agregar al carrito", fg_color=ACCENT, text_color=BG,
-                          command=lambda pid=p["id"]: self.add_to_cart(pid)).pack(pady=(0,10))
+        if self.catalog_job:
+            self.after_cancel(self.catalog_job); self.catalog_job = None
+        self.catalog_grid = ctk.CTkScrollableFrame(f, fg_color=BG)
+        self.catalog_grid.pack(fill="both", expand=True, padx=20, pady=10)
+        self.catalog_items = load_products()
+        self.catalog_next = 0  # tarjetas ya dibujadas: catalog_items[:catalog_next]
+        self.cards = {}
+        self.add_catalog_cards()
+
+    def add_catalog_cards(self):
+        # Por tandas: la ventana responde mientras se arma el resto del catálogo
+        prods = self.catalog_items
+        end = min(self.catalog_next + CATALOG_BATCH, len(prods))
+        for idx in range(self.catalog_next, end):
+            self.build_card(self.catalog_grid, idx, prods[idx])
+        self.catalog_next = end
+        self.catalog_job = self.after(1, self.add_catalog_cards) if end < len(prods) else None
+
+    def on_catalog_change(self, event, product):
+        # Solo se dibuja, redibuja o quita la tarjeta del producto afectado
+        if "catalog" not in self.frames:
+            return  # el catálogo aún no se armó: lo hará con los datos nuevos
+        prods = self.catalog_items
+        if event == "added":
+            prods.append(product)
+            if self.catalog_job is None:
+                self.add_catalog_cards()
+            return
+        idx = next((i for i, p in enumerate(prods) if p["id"] == product["id"]), None)
+        if idx is None:
+            return
+        card = self.cards.pop(product["id"], None)
+        if card:
+            card.destroy()
+        if event == "updated":
+            prods[idx] = product
+            if idx < self.catalog_next:
+                self.build_card(self.catalog_grid, idx, product)
+        else:
+            del prods[idx]
+            if idx < self.catalog_next:
+                # Las tarjetas siguientes solo cambian de celda
+                self.catalog_next -= 1
+                for i in range(idx, self.catalog_next):
+                    self.cards[prods[i]["id"]].grid(row=i//4, column=i%4)
+
+    def build_card(self, grid, idx, p):
+        card = ctk.CTkFrame(grid, fg_color=ENTRY_BG, corner_radius=8)
+        card.grid(row=idx//4, column=idx%4, padx=10, pady=10)
+        if p.get("image_url"):
+            # Placeholder hasta que el pool de imágenes entregue la miniatura
+            lbl = ctk.CTkLabel(card, text="...", width=120, height=120, text_color=TEXT, font=FONT)
+            lbl.pack(pady=(10,5))
+            self.image_loader.request(p["image_url"], (120,120),
+                                      lambda img, lbl=lbl: self.set_card_image(lbl, img))
+        ctk.CTkLabel(card, text=p["name"], text_color=TEXT, font=FONT).pack()
+        ctk.CTkLabel(card, text=f"$ {p['price']:,}", text_color=ACCENT, font=FONT).pack(pady=(0,5))
+        ctk.CTkButton(card, text="Agregar al carrito", fg_color=ACCENT, text_color=BG,
+                      command=lambda pid=p["id"]: self.add_to_cart(pid)).pack(pady=(0,10))
+        self.cards[p["id"]] = card
+        return card
+
+    def set_card_image(self, lbl, img):
+        if not lbl.winfo_exists():
+            return
+        lbl.configure(image=img, text="") if img else lbl.configure(text="")
+        lbl.image = img
+
+    def on_close(self):
+        self.image_loader.shutdown()
+        self.auth_pool.shutdown(wait=False, cancel_futures=True)
+        if self._payments:
+            self._payments.close()
+        self.destroy()
+
+    def when_done(self, future, callback):
+        # callback(future) en el hilo de Tk cuando el Future termine
+        if future.done():
+            callback(future)
+        else:
+            self.after(POLL_MS, lambda: self.when_done(future, callback))
+
+    def run_async(self, callback, fn, *args):
+        # fn corre en el pool de autenticación
+        self.when_done(self.auth_pool.submit(fn, *args), callback)
 
     def build_cart(self):
         f = self.frames["cart"]; [w.destroy() for w in f.winfo_children()]
@@ -112,7 +209,7 @@ class App(ctk.CTk):
             ctk.CTkLabel(f, text="Carrito vacío", text_color=TEXT, font=FONT).pack(pady=20)
         else:
             for pid, qty in items.items():
-                prod = next(x for x in load_products() if x['id']==pid)
+                prod = catalog.get(pid)
                 row = ctk.CTkFrame(f, fg_color=ENTRY_BG, corner_radius=8); row.pack(fill="x", padx=20, pady=5)
                 ctk.CTkLabel(row, text=f"{prod['name']} x{qty} - ${prod['price']*qty}",
                              text_color=TEXT, font=FONT).pack(side="left", padx=5)
@@ -143,22 +240,32 @@ class App(ctk.CTk):
 
     def build_search(self):
         f = self.frames["search"]; [w.destroy() for w in f.winfo_children()]
-        ctk.CTkEntry(f, placeholder_text="Buscar...").pack(pady=10)
+        self.search_entry = ctk.CTkEntry(f, placeholder_text="Buscar..."); self.search_entry.pack(pady=10)
+        self.search_entry.bind("<KeyRelease>", self.schedule_search)
+        self.search_entry.bind("<Return>", lambda e: self.perform_search(self.search_entry.get()))
         ctk.CTkButton(f, text="Buscar", fg_color=ACCENT, text_color=BG,
-                      command=lambda q="": self.perform_search(q)).pack(pady=5)
+                      command=lambda: self.perform_search(self.search_entry.get())).pack(pady=5)
+        self.search_info = ctk.CTkLabel(f, text="", text_color=TEXT, font=FONT); self.search_info.pack()
         self.results = ctk.CTkScrollableFrame(f, fg_color=BG); self.results.pack(fill="both", expand=True, padx=10, pady=10)
+        self.search_job = None
+
+    def schedule_search(self, event=None):
+        # Búsqueda mientras se escribe, con debounce
+        if self.search_job:
+            self.after_cancel(self.search_job)
+        self.search_job = self.after(SEARCH_DELAY_MS, lambda: self.perform_search(self.search_entry.get()))
 
     def perform_search(self, query):
-        f = self.frames["search"]; [w.destroy() for w in f.winfo_children()]
-        entry = ctk.CTkEntry(f, placeholder_text="Buscar..."); entry.pack(pady=10)
-        ctk.CTkButton(f, text="Buscar", fg_color=ACCENT, text_color=BG,
-                      command=lambda q=entry.get(): self.perform_search(q)).pack(pady=5)
-        results = ctk.CTkScrollableFrame(f, fg_color=BG); results.pack(fill="both", expand=True, padx=10, pady=10)
-        found = [p for p in load_products() if query.lower() in p['name'].lower()]
+        if self.search_job:
+            self.after_cancel(self.search_job)
+        self.search_job = None
+        [w.destroy() for w in self.results.winfo_children()]
+        total, found = search_index.search(query, limit=SEARCH_LIMIT)
+        self.search_info.configure(text=f"{total} resultados" + (f" (mostrando {len(found)})" if total > len(found) else ""))
         if not found:
-            ctk.CTkLabel(results, text="Sin resultados", text_color=TEXT, font=FONT).pack(pady=20)
+            ctk.CTkLabel(self.results, text="Sin resultados", text_color=TEXT, font=FONT).pack(pady=20)
         for p in found:
-            row = ctk.CTkFrame(results, fg_color=ENTRY_BG, corner_radius=8); row.pack(fill="x", padx=20, pady=5)
+            row = ctk.CTkFrame(self.results, fg_color=ENTRY_BG, corner_radius=8); row.pack(fill="x", padx=20, pady=5)
             ctk.CTkLabel(row, text=p['name'], text_color=TEXT, font=FONT).pack(side="left", padx=10)
             ctk.CTkLabel(row, text=f"$ {p['price']:,}", text_color=ACCENT, font=FONT).pack(side="left", padx=10)
             ctk.CTkButton(row, text="Agregar al carrito", fg_color=ACCENT, text_color=BG,
@@ -175,14 +282,16 @@ class App(ctk.CTk):
                       command=self.show_payment).pack(pady=20)
 
     def build_payment(self):
+        from core.payment_gateways import GATEWAYS  # asyncio solo cuando se llega a pagar
         f = self.frames["payment"]; [w.destroy() for w in f.winfo_children()]
         ctk.CTkLabel(f, text="Datos de Pago", text_color=TEXT, font=("Courier",16)).pack(pady=10)
         self.card_num = ctk.CTkEntry(f, placeholder_text="Número tarjeta"); self.card_num.pack(pady=5)
         self.card_exp = ctk.CTkEntry(f, placeholder_text="MM/AA"); self.card_exp.pack(pady=5)
         self.card_cvv = ctk.CTkEntry(f, placeholder_text="CVV"); self.card_cvv.pack(pady=5)
-        self.pay_menu = ctk.CTkOptionMenu(f, values=["WebPay","MACH","BancoEstado","Transferencia"]); self.pay_menu.pack(pady=5)
-        ctk.CTkButton(f, text="Pagar", fg_color=ACCENT, text_color=BG,
-                      command=self.process_payment).pack(pady=20)
+        self.pay_menu = ctk.CTkOptionMenu(f, values=list(GATEWAYS)); self.pay_menu.pack(pady=5)
+        self.pay_btn = ctk.CTkButton(f, text="Pagar", fg_color=ACCENT, text_color=BG,
+                                     command=self.process_payment)
+        self.pay_btn.pack(pady=20)
 
     def build_history(self):
         f = self.frames["history"]; [w.destroy() for w in f.winfo_children()]
@@ -223,49 +332,50 @@ class App(ctk.CTk):
         item = {"id": new_id, "name": self.a_name.get(),
                 "price": int(self.a_price.get()), "stock": int(self.a_stock.get()),
                 "image_url": self.a_url.get()}
-        prods.append(item); save_products(prods)
+        # El catálogo y el índice de búsqueda reciben el alta como evento
+        catalog.add(item)
         messagebox.showinfo("Admin","Producto agregado")
-        self.build_catalog(); self.show_catalog()
+        self.show_catalog()
 
     def open_menu(self):
         messagebox.showinfo("Menú","Menú en construcción")
 
     def show_catalog(self):
-        self.frames["catalog"].lift()
+        self.view("catalog").lift()
 
     def show_cart(self):
-        self.build_cart(); self.frames["cart"].lift()
+        self.view("cart", rebuild=True).lift()
 
     def show_account(self):
-        self.build_account(); self.frames["account"].lift()
+        self.view("account", rebuild=True).lift()
 
     def show_search(self):
-        self.frames["search"].lift()
+        self.view("search").lift()
 
     def show_shipping(self):
-        self.build_shipping(); self.frames["shipping"].lift()
+        self.view("shipping", rebuild=True).lift()
 
     def show_payment(self):
-        self.build_payment(); self.frames["payment"].lift()
+        self.view("payment", rebuild=True).lift()
 
     def show_history(self):
-        self.build_history(); self.frames["history"].lift()
+        self.view("history", rebuild=True).lift()
 
     def show_admin(self):
         # Solicitar clave admin antes de mostrar panel
         pwd = simpledialog.askstring("Acceso Admin", "Ingrese la clave de administrador:", show="*")
         if pwd == "admin":
-            self.frames["admin"].lift()
+            self.view("admin").lift()
         else:
             messagebox.showerror("Acceso denegado", "Clave inválida")
 
     def add_to_cart(self, pid):
-        cart.add_item(pid)
+        cart.add_item(pid); self.payment_key = None
         messagebox.showinfo("Carrito","Agregado exitoso al carrito")
         self.show_cart()
 
     def remove_from_cart(self, pid):
-        cart.remove_item(pid)
+        cart.remove_item(pid); self.payment_key = None
         self.show_cart()
 
     def submit_shipping(self):
@@ -280,16 +390,55 @@ class App(ctk.CTk):
     def process_payment(self):
         method = self.pay_menu.get()
         items = cart.get_items()
+        if not items:
+            messagebox.showerror("Error","Carrito vacío"); return
+        prices = {pid: (catalog.get(pid) or {}).get("price") for pid in items}
+        gone = {pid: items[pid] for pid, price in prices.items() if price is None}
+        if gone:
+            # Eliminados del catálogo mientras estaban en el carrito
+            cart.remove_items(gone)
+            messagebox.showerror("Error", "Algunos productos ya no están disponibles y se quitaron del carrito")
+            self.show_cart(); return
+        from core.payment_gateways import PaymentsNotConfigured
+        try:
+            payments = self.payments
+        except PaymentsNotConfigured as e:
+            messagebox.showerror("Pagos no disponibles", str(e)); return
+        amount = int(sum(prices[pid]*qty for pid, qty in items.items())*(1-self.discount_rate))
+        # Misma clave al reintentar este checkout: la pasarela no cobra dos veces.
+        # Si el monto cambió (descuento, precios) es otro cobro y lleva clave nueva
+        if amount != self.payment_amount:
+            self.payment_key = None
+        self.payment_key = self.payment_key or str(uuid.uuid4())
+        self.payment_amount = amount
+        self.pay_btn.configure(state="disabled", text="Procesando...")
+        self.when_done(payments.submit(method, amount, self.payment_key),
+                       lambda f: self.payment_done(f, method, items, prices))
+
+    def payment_done(self, future, method, items, prices):
+        res = future.result()
+        if self.pay_btn.winfo_exists():
+            self.pay_btn.configure(state="normal", text="Pagar")
+        if not res["ok"]:
+            if res["declined"]:
+                self.payment_key = None
+            messagebox.showerror("Pago rechazado", res["error"] or "Pago no autorizado"); return
+        self.payment_key = None
         create_order(self.logged_user or "anonymous", items, self.shipping_info,
-                     method, self.discount_code, self.discount_rate)
+                     method, self.discount_code, self.discount_rate, res["transaction_id"], prices)
         messagebox.showinfo("Éxito","Pago realizado y orden creada")
-        cart.items.clear()
+        # Solo lo cobrado: lo agregado mientras el pago estaba pendiente sigue en el carrito
+        cart.remove_items(items)
         self.show_history()
 
     def login_user(self):
-        user = authenticate(self.email_entry.get(), self.pwd_entry.get())
+        email = self.email_entry.get()
+        self.run_async(lambda f: self.login_done(f, email), authenticate, email, self.pwd_entry.get())
+
+    def login_done(self, future, email):
+        user = future.result()
         if user:
-            self.logged_user = self.email_entry.get()
+            self.logged_user = email
             messagebox.showinfo("Éxito","Login exitoso")
             self.show_account()
         else:
@@ -299,7 +448,10 @@ class App(ctk.CTk):
         email = self.reg_email.get(); pwd = self.reg_pwd.get(); conf = self.reg_conf.get()
         if pwd != conf:
             messagebox.showerror("Error","Las contraseñas no coinciden"); return
-        ok, msg = register_user(email, pwd)
+        self.run_async(self.register_done, register_user, email, pwd)
+
+    def register_done(self, future):
+        ok, msg = future.result()
         if ok:
             messagebox.showinfo("Éxito", msg)
             self.show_account()
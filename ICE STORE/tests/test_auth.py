@@ -0,0 +1,71 @@
+import json
+import multiprocessing
+
+from core import auth
+from core.auth import UserStore
+
+def make_store(tmp_path):
+    return UserStore(tmp_path / "users.json", tmp_path / "users.jsonl", tmp_path / "users.lock")
+
+def add_users(tmp_path, worker, count):
+    store = make_store(tmp_path)
+    for i in range(count):
+        assert store.add({"email": f"{worker}-{i}@x.cl", "password": ""})
+
+def test_leftover_lock_file_does_not_block(tmp_path):
+    (tmp_path / "users.lock").write_text("")
+    store = make_store(tmp_path)
+    assert store.add({"email": "a@x.cl", "password": ""})
+    assert not store.add({"email": "a@x.cl", "password": "otra"})
+
+def test_concurrent_adds_from_processes(tmp_path):
+    workers = [multiprocessing.Process(target=add_users, args=(tmp_path, w, 50)) for w in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+    store = make_store(tmp_path)
+    assert len(store.all()) == 200
+    store.compact()
+    assert len(make_store(tmp_path).all()) == 200
+
+def test_refresh_reads_only_new_log_lines(tmp_path):
+    writer, reader = make_store(tmp_path), make_store(tmp_path)
+    assert writer.add({"email": "a@x.cl", "password": ""})
+    assert reader.get("a@x.cl")
+    consumed = reader.log_offset
+    # Si se releyera desde el principio, la línea ya aplicada ahora es inválida
+    log = tmp_path / "users.jsonl"
+    with open(log, "r+b") as f:
+        f.write(b"x" * (consumed - 1))
+    assert writer.add({"email": "b@x.cl", "password": ""})
+    assert reader.get("b@x.cl") and reader.get("a@x.cl")
+    assert reader.log_offset == log.stat().st_size and reader.log_entries == 2
+
+def test_log_compacted_past_threshold(tmp_path):
+    store = make_store(tmp_path)
+    store.COMPACT_ENTRIES = 5
+    for i in range(5):
+        assert store.add({"email": f"{i}@x.cl", "password": ""})
+    assert (tmp_path / "users.jsonl").exists()
+    assert store.add({"email": "5@x.cl", "password": ""})
+    assert not (tmp_path / "users.jsonl").exists()
+    assert len(json.loads((tmp_path / "users.json").read_text(encoding="utf-8"))["users"]) == 6
+    other = make_store(tmp_path)
+    assert len(other.all()) == 6
+    assert store.add({"email": "6@x.cl", "password": ""}) and other.get("6@x.cl")
+
+def test_migrate_passwords_only_with_plain_text(tmp_path, monkeypatch):
+    users = tmp_path / "users.json"
+    users.write_text(json.dumps({"users": [{"email": "a@x.cl", "password": "Clave1"}]}), encoding="utf-8")
+    monkeypatch.setattr(auth, "store", make_store(tmp_path))
+    assert auth.legacy_users()
+    assert auth.migrate_passwords() == 1
+    assert auth.authenticate("a@x.cl", "Clave1")
+    # Sin contraseñas en texto plano no se reescribe nada
+    stamp = users.stat().st_mtime_ns, users.read_bytes()
+    assert not auth.legacy_users()
+    assert auth.migrate_passwords() == 0
+    assert (users.stat().st_mtime_ns, users.read_bytes()) == stamp
+    assert not (tmp_path / "users.jsonl").exists()
@@ -0,0 +1,20 @@
+from core.cart_manager import Cart
+
+def test_remove_items_keeps_items_added_later():
+    cart = Cart()
+    for pid in ("1", "1", "2"):
+        cart.add_item(pid)
+    paid = cart.get_items()
+    # Agregados mientras el pago estaba pendiente
+    cart.add_item("1")
+    cart.add_item("3")
+    cart.remove_items(paid)
+    assert cart.get_items() == {"1": 1, "3": 1}
+
+def test_remove_items_ignores_items_already_removed():
+    cart = Cart()
+    cart.add_item("1")
+    paid = cart.get_items()
+    cart.remove_item("1")
+    cart.remove_items(paid)
+    assert cart.get_items() == {}
@@ -0,0 +1,26 @@
+import json
+
+import pytest
+
+from core.catalog import Catalog, Product
+
+PRODUCTS = [
+    {"id": "12", "name": "Helado", "price": 1500, "stock": 4, "image_url": "images/a.jpeg"},
+    {"id": 7, "name": "Id entero", "price": 100, "stock": 1, "image_url": ""},
+    {"id": "007", "name": "Ceros a la izquierda", "price": 1, "stock": 0, "image_url": ""},
+    {"id": "²", "name": "Dígito no ASCII", "price": 1, "stock": 0},
+    {"id": "abc", "name": "Texto", "price": 2, "stock": 3, "image_url": "x", "color": "azul"},
+]
+
+@pytest.mark.parametrize("product", PRODUCTS, ids=lambda p: repr(p["id"]))
+def test_product_round_trip(product):
+    assert dict(Product(product)) == product
+
+def test_catalog_round_trip(tmp_path):
+    path = tmp_path / "products.json"
+    path.write_text(json.dumps({"products": PRODUCTS}), encoding="utf-8")
+    catalog = Catalog(path)
+    assert [dict(p) for p in catalog.products()] == PRODUCTS
+    assert catalog.get(7)["id"] == 7 and catalog.get("12")["id"] == "12"
+    catalog.add({"id": "13", "name": "Nuevo", "price": 1, "stock": 1, "image_url": ""})
+    assert json.loads(path.read_text(encoding="utf-8"))["products"][:-1] == PRODUCTS
@@ -0,0 +1,109 @@
+import json
+import multiprocessing
+
+import pytest
+
+from core import order_manager
+from core.catalog import Catalog
+
+SHIPPING = {"address": "Calle 1", "method": "Retiro en tienda"}
+
+@pytest.fixture
+def orders(tmp_path, monkeypatch):
+    products = tmp_path / "products.json"
+    products.write_text(json.dumps({"products": [
+        {"id": "1", "name": "Helado", "price": 1000, "stock": 10, "image_url": ""},
+    ]}), encoding="utf-8")
+    monkeypatch.setattr(order_manager, "catalog", Catalog(products))
+    monkeypatch.setattr(order_manager, "ORDERS_FILE", tmp_path / "orders.json")
+    monkeypatch.setattr(order_manager, "ORDERS_LOG", tmp_path / "orders.jsonl")
+    monkeypatch.setattr(order_manager, "ORDERS_INDEX", tmp_path / "orders.index.jsonl")
+    monkeypatch.setattr(order_manager, "ORDERS_LOCK", tmp_path / "orders.lock")
+    monkeypatch.setattr(order_manager, "_index", None)
+    return order_manager
+
+def place(orders, user, qty=1):
+    return orders.create_order(user, {"1": qty}, SHIPPING, "Tarjeta")
+
+def test_no_orders_without_log(orders):
+    assert orders.get_orders_by_user("a@x.cl") == []
+
+def test_orders_by_user(orders):
+    placed = [place(orders, "a@x.cl"), place(orders, "b@x.cl", 2), place(orders, "a@x.cl", 3)]
+    assert orders.get_orders_by_user("a@x.cl") == [placed[0], placed[2]]
+    assert orders.get_orders_by_user("b@x.cl") == [placed[1]]
+    assert orders.get_orders_by_user("c@x.cl") == []
+    # Una entrada del índice por pedido: agregar no reescribe las anteriores
+    assert len(orders.ORDERS_INDEX.read_bytes().splitlines()) == 3
+
+def test_index_rebuilt_when_missing(orders):
+    placed = [place(orders, "a@x.cl"), place(orders, "a@x.cl")]
+    orders.ORDERS_INDEX.unlink()
+    orders._index = None
+    assert orders.get_orders_by_user("a@x.cl") == placed
+
+def test_index_rebuilt_when_log_replaced(orders):
+    place(orders, "a@x.cl")
+    place(orders, "a@x.cl")
+    kept = place(orders, "b@x.cl")
+    orders.ORDERS_LOG.write_bytes(orders._encode(kept))
+    assert orders.get_orders_by_user("a@x.cl") == []
+    assert orders.get_orders_by_user("b@x.cl") == [kept]
+
+def test_duplicate_index_entries_are_ignored(orders):
+    placed = place(orders, "a@x.cl")
+    # Otro proceso indexó el mismo tramo del log
+    orders.ORDERS_INDEX.write_bytes(orders.ORDERS_INDEX.read_bytes() * 2)
+    orders._index = None
+    assert orders.get_orders_by_user("a@x.cl") == [placed]
+    assert orders.get_orders_by_user("a@x.cl") == [placed]
+
+def test_ids_sort_by_creation(orders):
+    ids = [place(orders, "a@x.cl")["id"] for _ in range(5)]
+    assert ids == sorted(ids)
+
+def test_new_ids_sort_after_any_legacy_id(orders, monkeypatch):
+    # Los antiguos usaban la hora local: aunque esté adelantada respecto de UTC, los nuevos van después
+    monkeypatch.setattr(orders.time, "time_ns", lambda: 0)
+    monkeypatch.setattr(orders, "_id_state", {"pid": None, "node": 0, "ms": 0, "seq": 0})
+    new_id = orders.new_order_id()
+    assert new_id.startswith("P19700101000000000")
+    assert sorted(["99991231235959", new_id, "20250101120000"]) == ["20250101120000", "99991231235959", new_id]
+
+def test_order_keeps_charged_prices(orders):
+    # Producto eliminado durante el pago: la orden usa el precio cobrado
+    orders.catalog.remove("1")
+    order = orders.create_order("a@x.cl", {"1": 2}, SHIPPING, "Tarjeta", prices={"1": 1000})
+    assert order["total"] == 2000
+    assert orders.get_orders_by_user("a@x.cl") == [order]
+
+def test_migrates_legacy_orders(orders):
+    legacy = {"id": "20250101120000", "user": "a@x.cl", "items": [], "total": 0}
+    orders.ORDERS_FILE.write_text(json.dumps({"orders": [legacy]}), encoding="utf-8")
+    placed = place(orders, "a@x.cl")
+    assert orders.get_orders_by_user("a@x.cl") == [legacy, placed]
+    # Los ids nuevos se ordenan después de los antiguos
+    assert placed["id"] > legacy["id"]
+
+def place_many(orders, user, count):
+    for _ in range(count):
+        place(orders, user)
+
+def test_concurrent_processes_migrate_and_index_once(orders):
+    legacy = {"id": "20250101120000", "user": "a@x.cl", "items": [], "total": 0}
+    orders.ORDERS_FILE.write_text(json.dumps({"orders": [legacy]}), encoding="utf-8")
+    # fork: los procesos heredan las rutas del fixture
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=place_many, args=(orders, f"{n}@x.cl", 20)) for n in range(4)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+        assert w.exitcode == 0
+    orders._index = None
+    assert orders.get_orders_by_user("a@x.cl") == [legacy]
+    for n in range(4):
+        assert len(orders.get_orders_by_user(f"{n}@x.cl")) == 20
+    # El log se migró una sola vez y cada pedido quedó indexado una vez
+    assert len(orders.ORDERS_LOG.read_bytes().splitlines()) == 81
+    assert len(orders.ORDERS_INDEX.read_bytes().splitlines()) == 81
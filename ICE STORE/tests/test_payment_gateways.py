@@ -0,0 +1,27 @@
+import pytest
+
+from core.fake_gateway import FakeGatewayServer
+from core.payment_gateways import PaymentProcessor, PaymentsNotConfigured
+
+def test_no_gateway_configured_refuses_to_start():
+    with pytest.raises(PaymentsNotConfigured):
+        PaymentProcessor(base_url=None, fake=False)
+
+def test_fake_gateway_is_opt_in():
+    processor = PaymentProcessor(base_url=None, fake=FakeGatewayServer(decline_over=5000))
+    try:
+        approved = processor.submit("WebPay", 1000, "k1").result(5)
+        declined = processor.submit("WebPay", 9000, "k2").result(5)
+        # Misma clave: misma respuesta, sin cobrar dos veces
+        assert processor.submit("WebPay", 1000, "k1").result(5)["transaction_id"] == approved["transaction_id"]
+    finally:
+        processor.close()
+    assert approved["ok"] and approved["transaction_id"]
+    assert not declined["ok"] and declined["declined"]
+
+def test_bench_runs_through_the_processor(tmp_path):
+    from core.payment_bench import main
+    report = main(["--requests", "6", "--workers", "1", "3", "--concurrency", "3",
+                   "--latency", "0", "--jitter", "0", "--output", str(tmp_path / "bench.json")])
+    assert [(r["workers"], r["ok"]) for r in report["results"]] == [(1, 6), (3, 6)]
+    assert (tmp_path / "bench.json").exists()
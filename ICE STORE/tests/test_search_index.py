@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from core.catalog import Catalog
+from core.search_index import MIN_PREFIX_LEN, SearchIndex
+
+PRODUCTS = [
+    {"id": "1", "name": "Helado de Limón", "description": "Sorbete ácido", "price": 1500, "stock": 4},
+    {"id": "2", "name": "Helado de Chocolate", "description": "Con trozos de limón", "price": 1800, "stock": 2},
+    {"id": "3", "name": "Paleta de Frutilla", "description": "", "price": 900, "stock": 9},
+]
+
+@pytest.fixture
+def catalog(tmp_path):
+    path = tmp_path / "products.json"
+    path.write_text(json.dumps({"products": PRODUCTS}), encoding="utf-8")
+    return Catalog(path)
+
+@pytest.fixture
+def index(catalog):
+    return SearchIndex(catalog)
+
+def ids(result):
+    total, products = result
+    assert total == len(products)
+    return [p["id"] for p in products]
+
+def test_accents_and_case_are_folded(index):
+    # El nombre pesa más que la descripción
+    assert ids(index.search("limon")) == ["1", "2"]
+    assert ids(index.search("LIMÓN")) == ["1", "2"]
+    assert ids(index.search("acido")) == ["1"]
+
+def test_prefixes_and_all_terms_must_match(index):
+    assert ids(index.search("hel")) == ["1", "2"]
+    assert ids(index.search("hel choc")) == ["2"]
+    assert ids(index.search("frut")) == ["3"]
+    assert ids(index.search("helados")) == []
+
+def test_minimum_prefix_length(index):
+    assert MIN_PREFIX_LEN == 2
+    # Un carácter solo coincide con un término idéntico, nunca como prefijo
+    assert index.search("h") == (0, [])
+    assert ids(index.search("he")) == ["1", "2"]
+    assert sorted(ids(index.search("de"))) == ["1", "2", "3"]
+
+def test_empty_query_returns_everything(index):
+    assert ids(index.search("")) == ["1", "2", "3"]
+    assert ids(index.search("  ¿?  ")) == ["1", "2", "3"]
+    assert index.search("", limit=2)[0] == 3
+
+def test_catalog_changes_update_index_incrementally(catalog, index, monkeypatch):
+    index.search("")
+    rebuilds = []
+    monkeypatch.setattr(index, "clear", lambda: rebuilds.append(1))
+
+    catalog.add({"id": "4", "name": "Helado de Piña", "description": "", "price": 1200, "stock": 1})
+    assert ids(index.search("pina")) == ["4"]
+    catalog.update("1", name="Granizado de Limón")
+    assert ids(index.search("helado")) == ["2", "4"]
+    assert ids(index.search("granizado")) == ["1"]
+    catalog.remove("3")
+    assert index.search("frutilla") == (0, [])
+    assert "frutilla" not in index.terms and "3" not in index.docs
+    assert rebuilds == []
+
+def test_external_change_rebuilds(catalog, index, tmp_path):
+    index.search("")
+    path = tmp_path / "products.json"
+    path.write_text(json.dumps({"products": PRODUCTS[:1]}), encoding="utf-8")
+    assert ids(index.search("helado")) == ["1"]
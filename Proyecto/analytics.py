@@ -0,0 +1,296 @@
+"""Analítica de ventas en columnas.
+
+Aplana las líneas de venta unidas con sus productos en columnas numéricas
+(códigos enteros para producto, categoría, proveedor y cliente; día como
+entero desde 1970-01-01) y resuelve los reportes con agrupaciones
+vectorizadas. Usa NumPy si está instalado; si no, columnas del módulo array
+y bucles simples, con los mismos resultados.
+
+    python analytics.py --storage sqlite --top 10 --bucket month
+"""
+
+import argparse
+import heapq
+import json
+import os
+import time
+from array import array
+from datetime import date, timedelta
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional
+    np = None
+
+from services import DataManager
+
+ENGINE = "numpy" if np is not None else "array"
+EPOCH = date(1970, 1, 1)
+NO_CATEGORY = "(sin categoría)"
+NO_SUPPLIER = "(sin proveedor)"
+
+
+def _column(typecode, values):
+    """Columna numérica: ndarray con NumPy, array.array sin él"""
+    if np is not None:
+        return np.array(values, dtype={'i': np.int32, 'q': np.int64, 'd': np.float64}[typecode])
+    return array(typecode, values)
+
+
+def _day_numbers(iso_dates):
+    """Fechas ISO ('2024-05-01T10:00:00') a días desde 1970-01-01"""
+    if np is not None:
+        return np.array([d[:10] for d in iso_dates], dtype='datetime64[D]').astype(np.int32)
+    parsed = {}
+    days = array('i')
+    for d in iso_dates:
+        day = d[:10]
+        if day not in parsed:
+            parsed[day] = (date.fromisoformat(day) - EPOCH).days
+        days.append(parsed[day])
+    return days
+
+
+def _group_sum(codes, weights, size):
+    """Suma de weights por código (0..size-1)"""
+    if np is not None:
+        return np.bincount(codes, weights=weights, minlength=size)
+    totals = [0.0] * size
+    for code, weight in zip(codes, weights):
+        totals[code] += weight
+    return totals
+
+
+def _total(column):
+    return float(column.sum()) if np is not None else float(sum(column))
+
+
+def _top(totals, n):
+    """Índices de los n mayores totales, de mayor a menor"""
+    if np is not None:
+        totals = np.asarray(totals)
+        if n < len(totals):
+            idx = np.argpartition(-totals, n - 1)[:n]
+        else:
+            idx = np.arange(len(totals))
+        return idx[np.argsort(-totals[idx], kind='stable')].tolist()
+    return heapq.nlargest(n, range(len(totals)), key=totals.__getitem__)
+
+
+class SalesColumns:
+    """Líneas de venta y productos en columnas paralelas"""
+
+    def __init__(self, sales, products):
+        # Productos: código -> id, con su categoría y proveedor también codificados
+        self.product_ids = []
+        self.categories = []
+        self.supplier_ids = []
+        product_codes, category_codes, supplier_codes = {}, {}, {}
+        product_category, product_supplier = [], []
+
+        def product_code(product_id, product=None):
+            code = product_codes.get(product_id)
+            if code is None:
+                code = product_codes[product_id] = len(self.product_ids)
+                self.product_ids.append(product_id)
+                category = (product or {}).get('category') or NO_CATEGORY
+                supplier = (product or {}).get('supplier_id') or NO_SUPPLIER
+                if category not in category_codes:
+                    category_codes[category] = len(self.categories)
+                    self.categories.append(category)
+                if supplier not in supplier_codes:
+                    supplier_codes[supplier] = len(self.supplier_ids)
+                    self.supplier_ids.append(supplier)
+                product_category.append(category_codes[category])
+                product_supplier.append(supplier_codes[supplier])
+            return code
+
+        for product in products:
+            product_code(product['id'], product)
+
+        # Ventas y líneas (productos borrados quedan sin categoría ni proveedor)
+        self.customer_ids = []
+        customer_codes = {}
+        sale_customer, sale_dates = [], []
+        line_sale, line_product, line_quantity, line_revenue = [], [], [], []
+        for sale_index, sale in enumerate(sales):
+            customer = sale.get('customer_id')
+            if customer not in customer_codes:
+                customer_codes[customer] = len(self.customer_ids)
+                self.customer_ids.append(customer)
+            sale_customer.append(customer_codes[customer])
+            sale_dates.append(sale['date'])
+            for item in sale.get('items', ()):
+                line_sale.append(sale_index)
+                line_product.append(product_code(item['product_id']))
+                line_quantity.append(item['quantity'])
+                line_revenue.append(item.get('subtotal', item['price'] * item['quantity']))
+
+        self.product_category = _column('i', product_category)
+        self.product_supplier = _column('i', product_supplier)
+        self.sale_customer = _column('i', sale_customer)
+        self.sale_day = _day_numbers(sale_dates)
+        self.line_sale = _column('i', line_sale)
+        self.line_product = _column('i', line_product)
+        self.line_quantity = _column('q', line_quantity)
+        self.line_revenue = _column('d', line_revenue)
+
+        # Columnas derivadas por línea (join vectorizado por código)
+        if np is not None:
+            self.line_category = self.product_category[self.line_product]
+            self.line_supplier = self.product_supplier[self.line_product]
+            self.line_day = self.sale_day[self.line_sale]
+        else:
+            self.line_category = array('i', (product_category[p] for p in line_product))
+            self.line_supplier = array('i', (product_supplier[p] for p in line_product))
+            self.line_day = array('i', (self.sale_day[s] for s in line_sale))
+
+    def __len__(self):
+        return len(self.line_revenue)
+
+
+class SalesAnalytics:
+    """Reportes de ventas para administradores; las columnas se recalculan solo si cambian los datos"""
+
+    def __init__(self, data_manager):
+        self.data_manager = data_manager
+        self._signature = None
+        self._columns = None
+
+    def columns(self):
+        sales = self.data_manager.load_data('sales')
+        products = self.data_manager.load_data('products')
+        signature = (self.data_manager.cached_signature('sales'),
+                     self.data_manager.cached_signature('products'))
+        if self._columns is None or signature != self._signature:
+            self._columns = SalesColumns(sales, products)
+            self._signature = signature
+        return self._columns
+
+    @staticmethod
+    def _rows(labels, revenue, units, order):
+        return [{'key': labels[i], 'revenue': float(revenue[i]), 'units': int(units[i])}
+                for i in order if units[i]]
+
+    def _grouped(self, codes, labels, n=None):
+        cols = self.columns()
+        revenue = _group_sum(codes, cols.line_revenue, len(labels))
+        units = _group_sum(codes, cols.line_quantity, len(labels))
+        return self._rows(labels, revenue, units, _top(revenue, n if n is not None else len(labels)))
+
+    def revenue_by_category(self):
+        """Ingresos y unidades por categoría, de mayor a menor"""
+        cols = self.columns()
+        return self._grouped(cols.line_category, cols.categories)
+
+    def revenue_by_supplier(self):
+        """Ingresos y unidades por proveedor, de mayor a menor"""
+        cols = self.columns()
+        rows = self._grouped(cols.line_supplier, cols.supplier_ids)
+        for row in rows:
+            supplier = self.data_manager.get_by_id('users', row['key'])
+            row['name'] = (supplier.get('store_name') or supplier['name']) if supplier else row['key']
+        return rows
+
+    def top_products(self, n=10):
+        """Los n productos con más ingresos"""
+        cols = self.columns()
+        rows = self._grouped(cols.line_product, cols.product_ids, n)
+        for row in rows:
+            product = self.data_manager.get_by_id('products', row['key'])
+            row['name'] = product['name'] if product else row['key']
+        return rows
+
+    def revenue_by_period(self, bucket='day'):
+        """Ingresos y unidades por día ('day') o mes ('month'), en orden cronológico"""
+        cols = self.columns()
+        if not len(cols):
+            return []
+        if np is not None:
+            # Períodos como enteros consecutivos: el código es la distancia al primero
+            unit = 'M' if bucket == 'month' else 'D'
+            periods = cols.line_day
+            if unit == 'M':
+                periods = periods.astype('datetime64[D]').astype('datetime64[M]').astype(np.int32)
+            first = int(periods.min())
+            codes = periods - first
+            labels = [str(np.datetime64(first + i, unit)) for i in range(int(codes.max()) + 1)]
+        else:
+            label_of = {}
+            for day in set(cols.line_day):
+                label = (EPOCH + timedelta(days=day)).isoformat()
+                label_of[day] = label[:7] if bucket == 'month' else label
+            labels = sorted(set(label_of.values()))
+            position = {label: i for i, label in enumerate(labels)}
+            codes = [position[label_of[day]] for day in cols.line_day]
+        revenue = _group_sum(codes, cols.line_revenue, len(labels))
+        units = _group_sum(codes, cols.line_quantity, len(labels))
+        return self._rows(labels, revenue, units, range(len(labels)))
+
+    def repeat_customers(self):
+        """Clientes con compras y cuántos compraron más de una vez"""
+        cols = self.columns()
+        if np is not None:
+            counts = np.bincount(cols.sale_customer, minlength=len(cols.customer_ids))
+            customers, repeat = int((counts > 0).sum()), int((counts > 1).sum())
+        else:
+            counts = [0] * len(cols.customer_ids)
+            for code in cols.sale_customer:
+                counts[code] += 1
+            customers = sum(1 for c in counts if c)
+            repeat = sum(1 for c in counts if c > 1)
+        return {'customers': customers, 'repeat': repeat,
+                'rate': repeat / customers if customers else 0.0}
+
+    def report(self, top=10, bucket='month'):
+        """Todos los reportes juntos"""
+        cols = self.columns()
+        return {
+            'engine': ENGINE,
+            'lines': len(cols),
+            'revenue': _total(cols.line_revenue),
+            'by_category': self.revenue_by_category(),
+            'by_supplier': self.revenue_by_supplier(),
+            'by_period': self.revenue_by_period(bucket),
+            'top_products': self.top_products(top),
+            'repeat_customers': self.repeat_customers(),
+        }
+
+
+def print_report(report, bucket):
+    def table(title, rows, label='key'):
+        print(f"\n{title}")
+        for row in rows:
+            print(f"  {str(row.get(label, row['key']))[:40]:<40} {row['units']:>10} u  ${row['revenue']:>14,.2f}")
+
+    print(f"Motor: {report['engine']} | líneas: {report['lines']} | ingresos: ${report['revenue']:,.2f}")
+    table("Ingresos por categoría", report['by_category'])
+    table("Ingresos por proveedor", report['by_supplier'], 'name')
+    table("Ingresos por " + ("mes" if bucket == 'month' else "día"), report['by_period'])
+    table("Productos más vendidos", report['top_products'], 'name')
+    repeat = report['repeat_customers']
+    print(f"\nClientes recurrentes: {repeat['repeat']} de {repeat['customers']} ({repeat['rate']:.1%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reportes de ventas")
+    parser.add_argument("--storage", choices=["json", "sqlite"],
+                        default=os.environ.get("ECOMMERCE_STORAGE", "json"),
+                        help="Motor de almacenamiento (por defecto: json)")
+    parser.add_argument("--top", type=int, default=10, help="cantidad de productos en el ranking")
+    parser.add_argument("--bucket", choices=["day", "month"], default="month")
+    parser.add_argument("--json", action="store_true", help="imprime el reporte como JSON")
+    args = parser.parse_args()
+
+    analytics = SalesAnalytics(DataManager(args.storage))
+    started = time.perf_counter()
+    analytics.columns()
+    loaded = time.perf_counter()
+    report = analytics.report(args.top, args.bucket)
+    finished = time.perf_counter()
+
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_report(report, args.bucket)
+        print(f"\nCarga {loaded - started:.3f}s, reportes {finished - loaded:.3f}s")
@@ -0,0 +1,452 @@
+"""API HTTP asíncrona del e-commerce (solo biblioteca estándar).
+
+Un único proceso atiende a muchos clientes sobre un DataManager con los datos
+en memoria. Los managers no son seguros entre hilos, así que todas las
+operaciones de datos se ejecutan en un solo hilo dedicado; el event loop solo
+lee y escribe HTTP, y el hashing de contraseñas va al pool del PasswordHasher.
+
+    python api.py --storage sqlite --port 8080
+
+Rutas (JSON; las marcadas con * requieren 'Authorization: Bearer <token>'):
+    POST   /login                 {email, password} -> {token, user}
+    POST   /register              {rut, email, password, name, type}
+    POST   /logout              *
+    GET    /products              ?category=&supplier_id=&q=&offset=&limit=
+    GET    /products/<id>
+    GET    /cart                *
+    PUT    /cart/<product_id>   * {quantity}  (0 lo quita)
+    DELETE /cart/<product_id>   *
+    POST   /checkout            *
+    GET    /purchases           * ?cursor=&limit=
+    GET    /reports/sales       * ?cursor=&limit=  (proveedores)
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+from services import (
+    DataManager, AuthManager, ProductManager, SalesManager, StockReservationManager,
+)
+
+MAX_BODY = 1024 * 1024
+MAX_LIMIT = 200
+SESSION_TTL = StockReservationManager.DEFAULT_TTL
+SWEEP_SECONDS = SESSION_TTL // 3
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized",
+           403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class ApiError(Exception):
+    """Error con código HTTP que se devuelve al cliente como {"error": mensaje}"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Session:
+    """Usuario autenticado con su carrito y sus reservas de stock"""
+
+    def __init__(self, user, data_manager):
+        self.token = uuid.uuid4().hex
+        self.user = user
+        self.cart = []
+        self.reservations = StockReservationManager(data_manager, owner_id=f"api-{self.token}")
+        self.touch()
+
+    def touch(self):
+        self.expires_at = time.time() + SESSION_TTL
+
+
+def public_user(user):
+    """Usuario sin el hash de la contraseña"""
+    return {k: v for k, v in user.items() if k != 'password'}
+
+
+def query_int(query, name, default, maximum=None):
+    try:
+        value = int(query.get(name, default))
+    except ValueError:
+        raise ApiError(400, f"'{name}' debe ser un entero")
+    if value < 0:
+        raise ApiError(400, f"'{name}' no puede ser negativo")
+    return min(value, maximum) if maximum is not None else value
+
+
+class EcommerceService:
+    """Operaciones de la API sobre los managers; se ejecutan en el hilo de datos"""
+
+    def __init__(self, storage='json'):
+        self.data_manager = DataManager(storage)
+        self.auth_manager = AuthManager(self.data_manager)
+        self.product_manager = ProductManager(self.data_manager)
+        self.sales_manager = SalesManager(self.data_manager)
+        self.sessions = {}
+
+    # --- sesiones ---
+
+    def session(self, token):
+        session = self.sessions.get(token)
+        if session is None or session.expires_at < time.time():
+            raise ApiError(401, "Sesión inválida o vencida")
+        session.touch()
+        return session
+
+    def open_session(self, user):
+        session = Session(user, self.data_manager)
+        self.sessions[session.token] = session
+        return {'token': session.token, 'user': public_user(user)}
+
+    def close_session(self, token):
+        session = self.sessions.pop(token, None)
+        if session is not None:
+            session.reservations.release_all()
+        return {'ok': True}
+
+    def sweep(self):
+        """Cierra sesiones vencidas y renueva las reservas de las activas"""
+        now = time.time()
+        for token, session in list(self.sessions.items()):
+            if session.expires_at < now:
+                self.close_session(token)
+            else:
+                session.reservations.renew_all()
+
+    def close(self):
+        for token in list(self.sessions):
+            self.close_session(token)
+        self.auth_manager.hasher.shutdown()
+
+    # --- autenticación (el hashing corre en el pool del PasswordHasher) ---
+
+    def begin_login(self, email, password):
+        return self.auth_manager.begin_login(email, password)
+
+    def finish_login(self, match):
+        success, message = self.auth_manager.finish_login(match)
+        if not success:
+            raise ApiError(401, message)
+        user = self.auth_manager.current_user
+        self.auth_manager.logout_user()  # el usuario vive en la sesión, no en el manager
+        return self.open_session(user)
+
+    def begin_register(self, rut, email, password):
+        valid, message = self.auth_manager.validate_registration(rut, email, password)
+        if not valid:
+            raise ApiError(400, message)
+        return self.auth_manager.begin_register(password)
+
+    def create_user(self, rut, email, password_hash, user_type, name):
+        success, message = self.auth_manager.create_user(rut, email, password_hash, user_type, name)
+        if not success:
+            raise ApiError(409 if message == "Usuario ya existe" else 500, message)
+        return {'ok': True, 'message': message}
+
+    # --- catálogo ---
+
+    def list_products(self, query):
+        if query.get('supplier_id'):
+            products = self.data_manager.find_by('products', 'supplier_id', query['supplier_id'])
+        elif query.get('category'):
+            products = self.data_manager.find_by('products', 'category', query['category'])
+        else:
+            products = self.product_manager.get_all_products()
+
+        category = query.get('category')
+        text = query.get('q', '').casefold()
+        products = [
+            p for p in products
+            if p['stock'] > 0
+            and (not category or p.get('category') == category)
+            and (not text or text in p['name'].casefold()
+                 or text in (p.get('description') or '').casefold())
+        ]
+        offset = query_int(query, 'offset', 0)
+        limit = query_int(query, 'limit', SalesManager.PAGE_SIZE, MAX_LIMIT)
+        return {'total': len(products), 'products': products[offset:offset + limit]}
+
+    def get_product(self, product_id):
+        product = self.data_manager.get_by_id('products', product_id)
+        if product is None:
+            raise ApiError(404, "Producto no encontrado")
+        return product
+
+    # --- carrito ---
+
+    def cart(self, session):
+        items = [dict(item, subtotal=item['price'] * item['quantity']) for item in session.cart]
+        return {'items': items, 'total': sum(item['subtotal'] for item in items)}
+
+    def set_cart_quantity(self, session, product_id, quantity):
+        """Fija la cantidad del producto en el carrito, reservando el stock"""
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 0:
+            raise ApiError(400, "'quantity' debe ser un entero no negativo")
+        if quantity == 0:
+            return self.remove_from_cart(session, product_id)
+
+        product = self.get_product(product_id)
+        if quantity > product['stock'] or not session.reservations.reserve(product_id, quantity):
+            raise ApiError(409, "No hay suficiente stock")
+
+        for item in session.cart:
+            if item['product_id'] == product_id:
+                item['quantity'] = quantity
+                break
+        else:
+            session.cart.append({
+                'product_id': product['id'],
+                'name': product['name'],
+                'price': product['price'],
+                'quantity': quantity,
+                'max_stock': product['stock']
+            })
+        return self.cart(session)
+
+    def remove_from_cart(self, session, product_id):
+        session.cart = [item for item in session.cart if item['product_id'] != product_id]
+        session.reservations.release(product_id)
+        return self.cart(session)
+
+    def checkout(self, session):
+        if not session.cart:
+            raise ApiError(400, "El carrito está vacío")
+        success, message = self.sales_manager.checkout(
+            session.user['id'], session.cart, session.reservations
+        )
+        if not success:
+            raise ApiError(409, message)
+        session.cart = []
+        return {'ok': True, 'message': message}
+
+    # --- reportes ---
+
+    def purchases(self, session, query):
+        limit = query_int(query, 'limit', SalesManager.PAGE_SIZE, MAX_LIMIT)
+        rows, cursor = self.sales_manager.get_customer_purchases_page(
+            session.user['id'], query.get('cursor'), limit
+        )
+        return {'purchases': rows, 'next_cursor': cursor}
+
+    def sales_report(self, session, query):
+        if session.user['type'] != 'proveedor':
+            raise ApiError(403, "Solo para proveedores")
+        limit = query_int(query, 'limit', SalesManager.PAGE_SIZE, MAX_LIMIT)
+        supplier_id = session.user['id']
+        rows, cursor = self.sales_manager.get_supplier_sales_page(supplier_id, query.get('cursor'), limit)
+        return {'summary': self.sales_manager.get_supplier_summary(supplier_id),
+                'sales': rows, 'next_cursor': cursor}
+
+
+class ApiServer:
+    """Servidor HTTP/1.1 keep-alive sobre asyncio que despacha a EcommerceService"""
+
+    def __init__(self, service, host="127.0.0.1", port=8080):
+        self.service = service
+        self.host, self.port = host, port
+        # Un solo hilo: los managers y las sesiones nunca se tocan en paralelo
+        self.data_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="data")
+        self.server = None
+        self.clients = set()
+        self.routes = [
+            ('POST', r'/login', self.login),
+            ('POST', r'/register', self.register),
+            ('POST', r'/logout', self.logout),
+            ('GET', r'/products', self.products),
+            ('GET', r'/products/([^/]+)', self.product),
+            ('GET', r'/cart', self.cart),
+            ('PUT', r'/cart/([^/]+)', self.set_cart_item),
+            ('DELETE', r'/cart/([^/]+)', self.remove_cart_item),
+            ('POST', r'/checkout', self.checkout),
+            ('GET', r'/purchases', self.purchases),
+            ('GET', r'/reports/sales', self.sales_report),
+        ]
+        self.routes = [(method, re.compile(pattern + '$'), handler)
+                       for method, pattern, handler in self.routes]
+
+    def run(self, fn, *args):
+        """Ejecuta fn en el hilo de datos"""
+        return asyncio.get_running_loop().run_in_executor(self.data_thread, fn, *args)
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.sweeper = asyncio.create_task(self._sweep())
+        return f"http://{self.host}:{self.port}"
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            self.sweeper.cancel()
+            for task in list(self.clients):
+                task.cancel()
+            await asyncio.gather(self.sweeper, *self.clients, return_exceptions=True)
+            await self.server.wait_closed()
+        await self.run(self.service.close)
+        self.data_thread.shutdown()
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(SWEEP_SECONDS)
+            await self.run(self.service.sweep)
+
+    # --- HTTP ---
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self.clients.add(task)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode('latin-1').partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY:
+                    status, data = 413, {"error": "Cuerpo demasiado grande"}
+                    keep_alive = False
+                else:
+                    raw = await reader.readexactly(length)
+                    status, data = await self._dispatch(method, target, headers, raw)
+                    keep_alive = (headers.get("connection", "").lower() != "close"
+                                  and version == "HTTP/1.1")
+                payload = json.dumps(data, ensure_ascii=False, default=dict).encode('utf-8')
+                writer.write((f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}\r\n"
+                              f"Content-Type: application/json; charset=utf-8\r\n"
+                              f"Content-Length: {len(payload)}\r\n"
+                              f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                              ).encode() + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError, asyncio.CancelledError):
+            pass
+        finally:
+            self.clients.discard(task)
+            writer.close()
+
+    async def _dispatch(self, method, target, headers, raw):
+        url = urlsplit(target)
+        allowed = False
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(url.path)
+            if not match:
+                continue
+            allowed = True
+            if route_method != method:
+                continue
+            try:
+                body = json.loads(raw) if raw else {}
+            except ValueError:
+                return 400, {"error": "JSON inválido"}
+            if not isinstance(body, dict):
+                return 400, {"error": "Se esperaba un objeto JSON"}
+            request = {'headers': headers, 'query': dict(parse_qsl(url.query)), 'body': body}
+            try:
+                return 200, await handler(request, *match.groups())
+            except ApiError as e:
+                return e.status, {"error": str(e)}
+            except Exception as e:
+                print(f"Error en {method} {url.path}: {e}")
+                return 500, {"error": "Error interno"}
+        if allowed:
+            return 405, {"error": "Método no permitido"}
+        return 404, {"error": "Ruta no encontrada"}
+
+    # --- rutas ---
+
+    @staticmethod
+    def _token(request):
+        scheme, _, token = request['headers'].get('authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not token:
+            raise ApiError(401, "Falta el token de sesión")
+        return token.strip()
+
+    async def _with_session(self, request, fn, *args):
+        token = self._token(request)
+        return await self.run(lambda: fn(self.service.session(token), *args))
+
+    @staticmethod
+    def _fields(request, *names):
+        body = request['body']
+        missing = [name for name in names if not isinstance(body.get(name), str) or not body[name]]
+        if missing:
+            raise ApiError(400, f"Faltan campos: {', '.join(missing)}")
+        return [body[name] for name in names]
+
+    async def login(self, request):
+        email, password = self._fields(request, 'email', 'password')
+        future = await self.run(self.service.begin_login, email.strip(), password)
+        return await self.run(self.service.finish_login, await asyncio.wrap_future(future))
+
+    async def register(self, request):
+        rut, email, password, name = self._fields(request, 'rut', 'email', 'password', 'name')
+        user_type = request['body'].get('type', 'cliente')
+        if user_type not in ('cliente', 'proveedor'):
+            raise ApiError(400, "Tipo de usuario inválido")
+        future = await self.run(self.service.begin_register, rut.strip(), email.strip(), password)
+        password_hash = await asyncio.wrap_future(future)
+        return await self.run(self.service.create_user, rut.strip(), email.strip(),
+                              password_hash, user_type, name.strip())
+
+    async def logout(self, request):
+        return await self.run(self.service.close_session, self._token(request))
+
+    async def products(self, request):
+        return await self.run(self.service.list_products, request['query'])
+
+    async def product(self, request, product_id):
+        return await self.run(self.service.get_product, product_id)
+
+    async def cart(self, request):
+        return await self._with_session(request, self.service.cart)
+
+    async def set_cart_item(self, request, product_id):
+        return await self._with_session(request, self.service.set_cart_quantity,
+                                        product_id, request['body'].get('quantity'))
+
+    async def remove_cart_item(self, request, product_id):
+        return await self._with_session(request, self.service.remove_from_cart, product_id)
+
+    async def checkout(self, request):
+        return await self._with_session(request, self.service.checkout)
+
+    async def purchases(self, request):
+        return await self._with_session(request, self.service.purchases, request['query'])
+
+    async def sales_report(self, request):
+        return await self._with_session(request, self.service.sales_report, request['query'])
+
+
+async def serve(args):
+    service = EcommerceService(args.storage)
+    server = ApiServer(service, args.host, args.port)
+    print(f"API en {await server.start()}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API HTTP del e-commerce")
+    parser.add_argument("--storage", choices=["json", "sqlite"],
+                        default=os.environ.get("ECOMMERCE_STORAGE", "json"),
+                        help="Motor de almacenamiento (por defecto: json)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
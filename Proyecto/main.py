@@ -1,460 +1,26 @@
 import customtkinter as ctk
 import tkinter as tk
 from tkinter import filedialog, messagebox
-import json
 import os
-import hashlib
-import re
+import sys
+import argparse
 from datetime import datetime
 import shutil
-from PIL import Image, ImageTk
-import uuid
+
+from services import (
+    DataManager, AuthManager, ProductManager, SalesManager, SupplierManager,
+    StockReservationManager, migrate_json_to_sqlite,
+)
+from analytics import SalesAnalytics
+
+# shared/: código común con ICE STORE (miniaturas de productos)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.images import ThumbnailCache, ImageLoader
 
 # Configuración de CustomTkinter
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
 
-class DataManager:
-    """Gestor de datos para persistencia en JSON"""
-    
-    def __init__(self):
-        self.data_dir = "data"
-        self.images_dir = os.path.join(self.data_dir, "product_images")
-        self.users_file = os.path.join(self.data_dir, "users.json")
-        self.products_file = os.path.join(self.data_dir, "products.json")
-        self.sales_file = os.path.join(self.data_dir, "sales.json")
-        self.admin_file = os.path.join(self.data_dir, "admin.json")
-        self.suppliers_file = os.path.join(self.data_dir, "suppliers.json")
-        
-        # Crear directorios si no existen
-        os.makedirs(self.data_dir, exist_ok=True)
-        os.makedirs(self.images_dir, exist_ok=True)
-        
-        # Inicializar archivos JSON
-        self._init_json_files()
-    
-    def _init_json_files(self):
-        """Inicializa archivos JSON si no existen"""
-        for file_path in [self.users_file, self.products_file, self.sales_file, self.suppliers_file]:
-            if not os.path.exists(file_path):
-                with open(file_path, 'w') as f:
-                    json.dump([], f)
-
-        if not os.path.exists(self.admin_file):
-            admin_data = [{
-                "id": "admin-001",
-                "rut": "11111111-1",
-                "email": "admin@sistema.com",
-                "password": "ef92b778bafe771e89245b89ecbc08a44a4e166c06659911881f383d4473e94f",
-                "type": "admin",
-                "name": "Administrador del Sistema",
-                "created_at": "2024-01-01T00:00:00"
-            }]
-            with open(self.admin_file, 'w') as f:
-                json.dump(admin_data, f, indent=2, ensure_ascii=False)
-    
-    def load_data(self, file_type):
-        """Carga datos desde archivo JSON"""
-        file_map = {
-            'users': self.users_file,
-            'products': self.products_file,
-            'sales': self.sales_file,
-            'admin': self.admin_file,
-            'suppliers': self.suppliers_file
-        }
-        
-        try:
-            with open(file_map[file_type], 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error cargando {file_type}: {e}")
-            return []
-        
-        try:
-            with open(file_map[file_type], 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error cargando {file_type}: {e}")
-            return []
-    
-    def save_data(self, file_type, data):
-        """Guarda datos en archivo JSON"""
-        file_map = {
-            'users': self.users_file,
-            'products': self.products_file,
-            'sales': self.sales_file,
-            'admin': self.admin_file,
-            'suppliers': self.suppliers_file
-        }
-        
-        try:
-            with open(file_map[file_type], 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            return True
-        except Exception as e:
-            print(f"Error guardando {file_type}: {e}")
-            return False
-
-class Validator:
-    """Clase para validaciones"""
-
-    @staticmethod
-    def validate_rut(rut):
-        """Valida el formato y dígito verificador del RUT chileno"""
-        rut = rut.replace(".", "").replace("-", "").upper()
-        if len(rut) < 2:
-            return False
-        cuerpo = rut[:-1]
-        dv = rut[-1]
-
-        try:
-            cuerpo_int = list(map(int, reversed(cuerpo)))
-        except ValueError:
-            return False
-
-        suma = 0
-        multiplicador = 2
-        for d in cuerpo_int:
-            suma += d * multiplicador
-            multiplicador = 2 if multiplicador == 7 else multiplicador + 1
-
-        resto = suma % 11
-        dv_calculado = 11 - resto
-        if dv_calculado == 11:
-            dv_calculado = "0"
-        elif dv_calculado == 10:
-            dv_calculado = "K"
-        else:
-            dv_calculado = str(dv_calculado)
-
-        return dv == dv_calculado
-
-    @staticmethod
-    def validate_email(email):
-        """Valida formato de email"""
-        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return re.match(pattern, email) is not None
-
-    @staticmethod
-    def hash_password(password):
-        """Hashea contraseña con SHA-256"""
-        return hashlib.sha256(password.encode()).hexdigest()
-
-
-class AuthManager:
-    """Gestor de autenticación"""
-    
-    def __init__(self, data_manager):
-        self.data_manager = data_manager
-        self.current_user = None
-    
-    def register_user(self, rut, email, password, user_type, name):
-        """Registra nuevo usuario"""
-        # Validaciones
-        if not Validator.validate_rut(rut):
-            return False, "RUT inválido"
-        
-        if not Validator.validate_email(email):
-            return False, "Email inválido"
-        
-        if len(password) < 6:
-            return False, "Contraseña debe tener al menos 6 caracteres"
-        
-        # Cargar usuarios existentes
-        users = self.data_manager.load_data('users')
-        
-        # Verificar si el usuario ya existe
-        for user in users:
-            if user['rut'] == rut or user['email'] == email:
-                return False, "Usuario ya existe"
-        
-        # Crear nuevo usuario
-        new_user = {
-            'id': str(uuid.uuid4()),
-            'rut': rut,
-            'email': email,
-            'password': Validator.hash_password(password),
-            'type': user_type,
-            'name': name,
-            'created_at': datetime.now().isoformat()
-        }
-        
-        users.append(new_user)
-        
-        if self.data_manager.save_data('users', users):
-            return True, "Usuario registrado exitosamente"
-        else:
-            return False, "Error al guardar usuario"
-    
-    def login_user(self, email, password):
-        """Autentica usuario"""
-        # Verificar admin primero
-        admins = self.data_manager.load_data('admin')
-        hashed_password = Validator.hash_password(password)
-        
-        for admin in admins:
-            if admin['email'] == email and admin['password'] == hashed_password:
-                self.current_user = admin
-                return True, "Login exitoso"
-        
-        # Verificar usuarios normales
-        users = self.data_manager.load_data('users')
-        
-        for user in users:
-            if user['email'] == email and user['password'] == hashed_password:
-                self.current_user = user
-                return True, "Login exitoso"
-        
-        return False, "Email o contraseña incorrectos"
-    
-    def logout_user(self):
-        """Cierra sesión"""
-        self.current_user = None
-
-class ProductManager:
-    """Gestor de productos"""
-    
-    def __init__(self, data_manager):
-        self.data_manager = data_manager
-    
-    def add_product(self, name, description, price, stock, category, image_path, supplier_id):
-        """Agrega nuevo producto"""
-        if price < 0 or stock < 0:
-            return False, "Precio y stock no pueden ser negativos"
-        
-        products = self.data_manager.load_data('products')
-        
-        new_product = {
-            'id': str(uuid.uuid4()),
-            'name': name,
-            'description': description,
-            'price': float(price),
-            'stock': int(stock),
-            'category': category,
-            'image_path': image_path,
-            'supplier_id': supplier_id,
-            'created_at': datetime.now().isoformat()
-        }
-        
-        products.append(new_product)
-        
-        if self.data_manager.save_data('products', products):
-            return True, "Producto agregado exitosamente"
-        else:
-            return False, "Error al guardar producto"
-    
-    def update_product(self, product_id, name, description, price, stock, category, image_path):
-        """Actualiza producto existente"""
-        if price < 0 or stock < 0:
-            return False, "Precio y stock no pueden ser negativos"
-        
-        products = self.data_manager.load_data('products')
-        
-        for product in products:
-            if product['id'] == product_id:
-                product['name'] = name
-                product['description'] = description
-                product['price'] = float(price)
-                product['stock'] = int(stock)
-                product['category'] = category
-                if image_path:
-                    product['image_path'] = image_path
-                product['updated_at'] = datetime.now().isoformat()
-                
-                if self.data_manager.save_data('products', products):
-                    return True, "Producto actualizado exitosamente"
-                else:
-                    return False, "Error al guardar producto"
-        
-        return False, "Producto no encontrado"
-    
-    def delete_product(self, product_id):
-        """Elimina producto"""
-        products = self.data_manager.load_data('products')
-        
-        for i, product in enumerate(products):
-            if product['id'] == product_id:
-                # Eliminar imagen si existe
-                if product.get('image_path') and os.path.exists(product['image_path']):
-                    try:
-                        os.remove(product['image_path'])
-                    except:
-                        pass
-                
-                products.pop(i)
-                
-                if self.data_manager.save_data('products', products):
-                    return True, "Producto eliminado exitosamente"
-                else:
-                    return False, "Error al eliminar producto"
-        
-        return False, "Producto no encontrado"
-    
-    def get_products_by_supplier(self, supplier_id):
-        """Obtiene productos de un proveedor"""
-        products = self.data_manager.load_data('products')
-        return [p for p in products if p['supplier_id'] == supplier_id]
-    
-    def get_all_products(self):
-        """Obtiene todos los productos"""
-        return self.data_manager.load_data('products')
-    
-    def update_stock(self, product_id, quantity):
-        """Actualiza stock de producto"""
-        products = self.data_manager.load_data('products')
-        
-        for product in products:
-            if product['id'] == product_id:
-                if product['stock'] >= quantity:
-                    product['stock'] -= quantity
-                    self.data_manager.save_data('products', products)
-                    return True
-                else:
-                    return False
-        
-        return False
-
-class SalesManager:
-    """Gestor de ventas"""
-    
-    def __init__(self, data_manager):
-        self.data_manager = data_manager
-
-    
-    def make_purchase(self, customer_id, products_cart):
-        """Realiza una compra"""
-        sales = self.data_manager.load_data('sales')
-        
-        total_amount = 0
-        sale_items = []
-        
-        for item in products_cart:
-            product_id = item['product_id']
-            quantity = item['quantity']
-            price = item['price']
-            
-            total_amount += price * quantity
-            sale_items.append({
-                'product_id': product_id,
-                'quantity': quantity,
-                'price': price,
-                'subtotal': price * quantity
-            })
-        
-        new_sale = {
-            'id': str(uuid.uuid4()),
-            'customer_id': customer_id,
-            'items': sale_items,
-            'total_amount': total_amount,
-            'date': datetime.now().isoformat()
-        }
-        
-        sales.append(new_sale)
-        
-        if self.data_manager.save_data('sales', sales):
-            return True, "Compra realizada exitosamente"
-        else:
-            return False, "Error al procesar compra"
-    
-    def get_customer_purchases(self, customer_id):
-        """Obtiene compras de un cliente"""
-        sales = self.data_manager.load_data('sales')
-        return [s for s in sales if s['customer_id'] == customer_id]
-    
-    def get_supplier_sales(self, supplier_id):
-        """Obtiene ventas de productos de un proveedor"""
-        sales = self.data_manager.load_data('sales')
-        products = self.data_manager.load_data('products')
-        
-        # Mapear productos por proveedor
-        supplier_products = {p['id']: p for p in products if p['supplier_id'] == supplier_id}
-        
-        supplier_sales = []
-        for sale in sales:
-            for item in sale['items']:
-                if item['product_id'] in supplier_products:
-                    supplier_sales.append({
-                        'sale_id': sale['id'],
-                        'product_name': supplier_products[item['product_id']]['name'],
-                        'quantity': item['quantity'],
-                        'price': item['price'],
-                        'subtotal': item['subtotal'],
-                        'date': sale['date']
-                    })
-        
-        return supplier_sales
-    def update_sale(self, sale_id, new_status=None, tracking_number=None):
-        """Actualiza el estado de pago o número de seguimiento de una venta"""
-        sales = self.data_manager.load_data('sales')
-    
-        for sale in sales:
-            if sale['id'] == sale_id:
-                if new_status is not None:
-                    sale['payment_status'] = new_status
-                if tracking_number is not None:
-                    sale['tracking_number'] = tracking_number
-                sale['updated_at'] = datetime.now().isoformat()
-                saved = self.data_manager.save_data('sales', sales)
-                return saved, "Venta actualizada exitosamente" if saved else "Error al guardar cambios"
-    
-        return False, "Venta no encontrada"
-
-    def delete_sale(self, sale_id):
-        """Elimina una venta"""
-        sales = self.data_manager.load_data('sales')
-    
-        for i, sale in enumerate(sales):
-            if sale['id'] == sale_id:
-                sales.pop(i)
-                saved = self.data_manager.save_data('sales', sales)
-                return saved, "Venta eliminada exitosamente" if saved else "Error al eliminar venta"
-    
-        return False, "Venta no encontrada"
-
-    
-class SupplierManager:
-    """Gestor de proveedores"""
-    
-    def __init__(self, data_manager):
-        self.data_manager = data_manager
-    
-    def get_all_suppliers(self):
-        """Obtiene todos los proveedores"""
-        users = self.data_manager.load_data('users')
-        return [user for user in users if user['type'] == 'proveedor']
-    
-    def delete_supplier(self, supplier_id):
-        """Elimina un proveedor"""
-        users = self.data_manager.load_data('users')
-        
-        for i, user in enumerate(users):
-            if user['id'] == supplier_id and user['type'] == 'proveedor':
-                users.pop(i)
-                if self.data_manager.save_data('users', users):
-                    return True, "Proveedor eliminado exitosamente"
-                else:
-                    return False, "Error al eliminar proveedor"
-        
-        return False, "Proveedor no encontrado"
-    
-    def update_supplier_info(self, supplier_id, store_name, store_description, contact_phone):
-        """Actualiza información de tienda del proveedor"""
-        users = self.data_manager.load_data('users')
-        
-        for user in users:
-            if user['id'] == supplier_id and user['type'] == 'proveedor':
-                user['store_name'] = store_name
-                user['store_description'] = store_description
-                user['contact_phone'] = contact_phone
-                user['updated_at'] = datetime.now().isoformat()
-                
-                if self.data_manager.save_data('users', users):
-                    return True, "Información actualizada exitosamente"
-                else:
-                    return False, "Error al actualizar información"
-        
-        return False, "Proveedor no encontrado"
-
 class LoginWindow:
     """Ventana de login"""
     
@@ -488,9 +54,9 @@ class LoginWindow:
         self.password_entry.pack(pady=5, padx=20, fill="x")
         
         # Botón login
-        login_btn = ctk.CTkButton(main_frame, text="Iniciar Sesión", 
-                                 command=self.login_user, height=40)
-        login_btn.pack(pady=20, padx=20, fill="x")
+        self.login_btn = ctk.CTkButton(main_frame, text="Iniciar Sesión", 
+                                      command=self.login_user, height=40)
+        self.login_btn.pack(pady=20, padx=20, fill="x")
         
         # Separador
         ctk.CTkLabel(main_frame, text="¿No tienes cuenta?").pack(pady=(10, 5))
@@ -509,7 +75,21 @@ class LoginWindow:
             messagebox.showerror("Error", "Todos los campos son obligatorios")
             return
         
-        success, message = self.app.auth_manager.login_user(email, password)
+        # La verificación de la contraseña corre en el pool de hashing
+        self.login_btn.configure(state="disabled", text="Verificando...")
+        self.app.when_done(self.app.auth_manager.begin_login(email, password), self.login_done)
+    
+    def login_done(self, future):
+        if not self.window.winfo_exists():
+            return
+        self.login_btn.configure(state="normal", text="Iniciar Sesión")
+        try:
+            match = future.result()
+        except Exception as e:
+            messagebox.showerror("Error", f"Error al iniciar sesión: {e}")
+            return
+        
+        success, message = self.app.auth_manager.finish_login(match)
         
         if success:
             messagebox.showinfo("Éxito", message)
@@ -570,9 +150,9 @@ class RegisterWindow:
         self.user_type.pack(pady=5, padx=20, fill="x")
         
         # Botón registro
-        register_btn = ctk.CTkButton(main_frame, text="Registrarse", 
-                                   command=self.register_user, height=40)
-        register_btn.pack(pady=20, padx=20, fill="x")
+        self.register_btn = ctk.CTkButton(main_frame, text="Registrarse", 
+                                         command=self.register_user, height=40)
+        self.register_btn.pack(pady=20, padx=20, fill="x")
         
         # Botón volver
         back_btn = ctk.CTkButton(main_frame, text="Volver al Login", 
@@ -591,8 +171,30 @@ class RegisterWindow:
             messagebox.showerror("Error", "Todos los campos son obligatorios")
             return
         
-        success, message = self.app.auth_manager.register_user(
-            rut, email, password, user_type, name
+        valid, message = self.app.auth_manager.validate_registration(rut, email, password)
+        if not valid:
+            messagebox.showerror("Error", message)
+            return
+        
+        # El hash de la contraseña se calcula en el pool de hashing
+        self.register_btn.configure(state="disabled", text="Registrando...")
+        self.app.when_done(
+            self.app.auth_manager.begin_register(password),
+            lambda future: self.register_done(future, rut, email, user_type, name)
+        )
+    
+    def register_done(self, future, rut, email, user_type, name):
+        if not self.window.winfo_exists():
+            return
+        self.register_btn.configure(state="normal", text="Registrarse")
+        try:
+            password_hash = future.result()
+        except Exception as e:
+            messagebox.showerror("Error", f"Error al registrar usuario: {e}")
+            return
+        
+        success, message = self.app.auth_manager.create_user(
+            rut, email, password_hash, user_type, name
         )
         
         if success:
@@ -709,9 +311,9 @@ class ProductFormWindow:
                 self.image_path = destino
                 
                 # Mostrar previsualización
-                img = Image.open(destino)
-                img.thumbnail((150, 150))
-                self.img_preview = ImageTk.PhotoImage(img)
+                self.img_preview = self.app.thumbnails.get(destino, (150, 150))
+                if self.img_preview is None:
+                    raise ValueError("formato de imagen no soportado")
                 
                 self.img_label.configure(image=self.img_preview, text="")
                 
@@ -728,14 +330,10 @@ class ProductFormWindow:
         
         # Cargar imagen si existe
         if self.product.get('image_path') and os.path.exists(self.product['image_path']):
-            try:
-                img = Image.open(self.product['image_path'])
-                img.thumbnail((150, 150))
-                self.img_preview = ImageTk.PhotoImage(img)
+            self.img_preview = self.app.thumbnails.get(self.product['image_path'], (150, 150))
+            if self.img_preview is not None:
                 self.img_label.configure(image=self.img_preview, text="")
                 self.image_path = self.product['image_path']
-            except:
-                pass
     
     def save_product(self):
         """Guarda el producto"""
@@ -769,24 +367,373 @@ class ProductFormWindow:
         if success:
             messagebox.showinfo("Éxito", message)
             self.window.destroy()
-            self.app.refresh_products()
         else:
             messagebox.showerror("Error", message)
 
+class ProductCard(ctk.CTkFrame):
+    """Tarjeta de producto reutilizable: los widgets se crean una vez y se rellenan con show()"""
+    
+    def __init__(self, parent, app, is_supplier=False):
+        super().__init__(parent)
+        self.app = app
+        self.is_supplier = is_supplier
+        self.product = None
+        self.photo = None
+        
+        # Frame horizontal para imagen y contenido
+        content_frame = ctk.CTkFrame(self)
+        content_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        # Frame para imagen
+        img_frame = ctk.CTkFrame(content_frame)
+        img_frame.pack(side="left", padx=(0, 10))
+        self.img_label = ctk.CTkLabel(img_frame, text="Sin\nImagen", width=100, height=100)
+        self.img_label.pack(padx=10, pady=10)
+        
+        # Frame para información
+        info_frame = ctk.CTkFrame(content_frame)
+        info_frame.pack(side="left", fill="both", expand=True)
+        
+        self.name_label = ctk.CTkLabel(info_frame, text="", 
+                                      font=ctk.CTkFont(size=16, weight="bold"))
+        self.name_label.pack(anchor="w", padx=10, pady=(10, 5))
+        
+        self.desc_label = ctk.CTkLabel(info_frame, text="", wraplength=300, justify="left")
+        self.desc_label.pack(anchor="w", padx=10, pady=2)
+        
+        self.price_label = ctk.CTkLabel(info_frame, text="", font=ctk.CTkFont(weight="bold"))
+        self.price_label.pack(anchor="w", padx=10, pady=2)
+        
+        self.stock_label = ctk.CTkLabel(info_frame, text="")
+        self.stock_label.pack(anchor="w", padx=10, pady=2)
+        
+        self.category_label = ctk.CTkLabel(info_frame, text="")
+        self.category_label.pack(anchor="w", padx=10, pady=(2, 10))
+        
+        # Frame para botones
+        btn_frame = ctk.CTkFrame(content_frame)
+        btn_frame.pack(side="right", padx=(10, 0))
+        
+        if is_supplier:
+            # Botones para proveedor
+            self.edit_btn = ctk.CTkButton(btn_frame, text="Editar", 
+                                         command=lambda: self.app.edit_product(self.product))
+            self.edit_btn.pack(pady=5, padx=10)
+            
+            self.delete_btn = ctk.CTkButton(btn_frame, text="Eliminar", 
+                                           command=lambda: self.app.delete_product(self.product),
+                                           fg_color="red")
+            self.delete_btn.pack(pady=5, padx=10)
+        else:
+            # Botones para cliente
+            self.add_cart_btn = ctk.CTkButton(btn_frame, text="Agregar al Carrito", 
+                                             command=lambda: self.app.add_to_cart(self.product))
+            self.out_stock_label = ctk.CTkLabel(btn_frame, text="Sin Stock", text_color="red")
+    
+    def show(self, product):
+        """Rellena la tarjeta con los datos del producto"""
+        self.product = product
+        
+        self.name_label.configure(text=product['name'])
+        self.desc_label.configure(text=product['description'])
+        self.price_label.configure(text=f"Precio: ${product['price']:.2f}")
+        self.stock_label.configure(text=f"Stock: {product['stock']} unidades")
+        self.category_label.configure(text=f"Categoría: {product['category']}")
+        
+        # Imagen en segundo plano: placeholder hasta que llegue la miniatura
+        self.photo = None
+        image_path = product.get('image_path')
+        if image_path:
+            self.img_label.configure(image="", text="Cargando...")
+            self.app.image_loader.request(
+                image_path, (100, 100),
+                lambda photo, pid=product['id'], path=image_path: self.set_photo(pid, path, photo))
+        else:
+            self.img_label.configure(image="", text="Sin\nImagen")
+        
+        if not self.is_supplier:
+            if product['stock'] > 0:
+                self.out_stock_label.pack_forget()
+                self.add_cart_btn.pack(pady=5, padx=10)
+            else:
+                self.add_cart_btn.pack_forget()
+                self.out_stock_label.pack(pady=5, padx=10)
+    
+    def set_photo(self, product_id, image_path, photo):
+        """Aplica una miniatura cargada, salvo que la tarjeta ya muestre otro producto"""
+        if (self.product is None or self.product['id'] != product_id
+                or self.product.get('image_path') != image_path or not self.winfo_exists()):
+            return
+        self.photo = photo
+        if photo is not None:
+            self.img_label.configure(image=photo, text="")
+        else:
+            self.img_label.configure(image="", text="Sin\nImagen")
+
+
+class VirtualProductList(ctk.CTkFrame):
+    """Lista de productos virtualizada.
+    
+    Solo existen tarjetas para las filas visibles más un pequeño margen; al
+    desplazarse, las tarjetas que salen de la vista se reutilizan para las
+    filas que entran, así que memoria y tiempo de dibujo no dependen del
+    tamaño del catálogo."""
+    
+    ROW_HEIGHT = 170
+    BUFFER_ROWS = 2
+    
+    def __init__(self, parent, app, products, is_supplier=False, accepts=None):
+        super().__init__(parent)
+        self.app = app
+        self.products = products
+        self.is_supplier = is_supplier
+        # Qué productos pertenecen a esta lista (para altas y ediciones)
+        self.accepts = accepts or (lambda product: True)
+        
+        # Slots del pool: [tarjeta, id de ventana en el canvas, índice mostrado]
+        self._slots = []
+        
+        bg_color = self._apply_appearance_mode(ctk.ThemeManager.theme["CTkFrame"]["fg_color"])
+        self.canvas = tk.Canvas(self, highlightthickness=0, bg=bg_color)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+        
+        self.canvas.bind("<Configure>", lambda e: self._refresh())
+        self.canvas.bind("<Enter>", self._bind_mousewheel)
+        self.bind("<Destroy>", self._unbind_mousewheel)
+        
+        self._update_scrollregion()
+    
+    def set_products(self, products):
+        """Reemplaza la lista mostrada conservando las tarjetas ya creadas"""
+        self.products = products
+        for slot in self._slots:
+            slot[2] = None
+        self._update_scrollregion()
+        self._refresh()
+    
+    def apply_change(self, event, product):
+        """Aplica un alta, edición o baja sin volver a dibujar las demás filas"""
+        index = next((i for i, p in enumerate(self.products) if p['id'] == product['id']), None)
+        if event != 'deleted' and self.accepts(product):
+            if index is None:
+                # Alta: fila nueva al final, solo se dibuja si queda visible
+                self.products.append(product)
+            else:
+                self.products[index] = product
+                for slot in self._slots:
+                    if slot[2] == index:
+                        slot[2] = None
+        elif index is not None:
+            # Baja: las filas siguientes suben una posición con la misma tarjeta
+            del self.products[index]
+            for slot in self._slots:
+                if slot[2] == index:
+                    slot[2] = None
+                elif slot[2] is not None and slot[2] > index:
+                    slot[2] -= 1
+        else:
+            return
+        self._refresh()
+    
+    def _update_scrollregion(self):
+        height = len(self.products) * self.ROW_HEIGHT
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), height))
+    
+    def _on_scrollbar(self, *args):
+        self.canvas.yview(*args)
+        self._refresh()
+    
+    def _bind_mousewheel(self, event):
+        self.canvas.bind_all("<MouseWheel>", self._on_mousewheel)
+        self.canvas.bind_all("<Button-4>", self._on_mousewheel)
+        self.canvas.bind_all("<Button-5>", self._on_mousewheel)
+    
+    def _unbind_mousewheel(self, event):
+        if event.widget is not self:
+            return
+        self.canvas.unbind_all("<MouseWheel>")
+        self.canvas.unbind_all("<Button-4>")
+        self.canvas.unbind_all("<Button-5>")
+    
+    def _on_mousewheel(self, event):
+        # La rueda se enlaza globalmente: ignorarla fuera de esta lista
+        widget = self.winfo_containing(event.x_root, event.y_root)
+        if widget is None or not str(widget).startswith(str(self)):
+            return
+        if getattr(event, 'num', None) == 4:
+            delta = -1
+        elif getattr(event, 'num', None) == 5:
+            delta = 1
+        else:
+            delta = -1 if event.delta > 0 else 1
+        self.canvas.yview_scroll(delta, "units")
+        self._refresh()
+    
+    def _refresh(self):
+        """Asigna las tarjetas del pool a las filas visibles"""
+        width = self.canvas.winfo_width()
+        view_height = self.canvas.winfo_height()
+        self._update_scrollregion()
+        
+        top = self.canvas.canvasy(0)
+        first = max(0, int(top // self.ROW_HEIGHT) - self.BUFFER_ROWS)
+        last = min(len(self.products),
+                   int((top + view_height) // self.ROW_HEIGHT) + 1 + self.BUFFER_ROWS)
+        needed = last - first
+        
+        # Crear tarjetas solo si el viewport necesita más que las existentes
+        while len(self._slots) < needed:
+            card = ProductCard(self.canvas, self.app, self.is_supplier)
+            window_id = self.canvas.create_window(0, 0, window=card, anchor="nw",
+                                                  state="hidden")
+            self._slots.append([card, window_id, None])
+        
+        # Reutilizar las tarjetas que ya muestran una fila visible
+        visible = set(range(first, last))
+        free = []
+        for slot in self._slots:
+            if slot[2] in visible:
+                visible.discard(slot[2])
+            else:
+                free.append(slot)
+        
+        for index, slot in zip(sorted(visible), free):
+            card, window_id, _ = slot
+            card.show(self.products[index])
+            slot[2] = index
+        
+        for card, window_id, index in self._slots:
+            if index is None or not first <= index < last:
+                self.canvas.itemconfigure(window_id, state="hidden")
+                continue
+            self.canvas.coords(window_id, 0, index * self.ROW_HEIGHT)
+            self.canvas.itemconfigure(window_id, state="normal", width=width,
+                                      height=self.ROW_HEIGHT - 10)
+
+
+class PagedList(ctk.CTkFrame):
+    """Lista desplazable que carga la página siguiente al acercarse al final.
+    
+    fetch(cursor) devuelve (filas, cursor siguiente o None) y render(parent, fila)
+    dibuja cada fila dentro de self.body, así que cada consulta y cada dibujo
+    cubren una sola página."""
+    
+    # Fracción del scroll a partir de la cual se pide la página siguiente
+    PREFETCH_AT = 0.9
+    
+    def __init__(self, parent, fetch, render, empty_text):
+        super().__init__(parent)
+        self.fetch = fetch
+        self.render = render
+        self._cursor = None
+        self._done = False
+        self._loading = False
+        
+        # Canvas y barra propios (como VirtualProductList) para vigilar el scroll
+        bg_color = self._apply_appearance_mode(ctk.ThemeManager.theme["CTkFrame"]["fg_color"])
+        self.canvas = tk.Canvas(self, highlightthickness=0, bg=bg_color)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self._on_scroll)
+        self.body = ctk.CTkFrame(self.canvas, fg_color="transparent")
+        self._body_id = self.canvas.create_window(0, 0, window=self.body, anchor="nw")
+        
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+        
+        self.body.bind("<Configure>", self._update_scrollregion)
+        self.canvas.bind("<Configure>",
+                         lambda e: self.canvas.itemconfigure(self._body_id, width=e.width))
+        self.canvas.bind("<Enter>", self._bind_mousewheel)
+        self.bind("<Destroy>", self._unbind_mousewheel)
+        
+        if not self.load_next():
+            ctk.CTkLabel(self.body, text=empty_text).pack(pady=20)
+    
+    def _update_scrollregion(self, event=None):
+        self.canvas.configure(scrollregion=(0, 0, self.body.winfo_width(),
+                                            self.body.winfo_height()))
+    
+    def _bind_mousewheel(self, event):
+        self.canvas.bind_all("<MouseWheel>", self._on_mousewheel)
+        self.canvas.bind_all("<Button-4>", self._on_mousewheel)
+        self.canvas.bind_all("<Button-5>", self._on_mousewheel)
+    
+    def _unbind_mousewheel(self, event):
+        if event.widget is not self:
+            return
+        self.canvas.unbind_all("<MouseWheel>")
+        self.canvas.unbind_all("<Button-4>")
+        self.canvas.unbind_all("<Button-5>")
+    
+    def _on_mousewheel(self, event):
+        # La rueda se enlaza globalmente: ignorarla fuera de esta lista
+        widget = self.winfo_containing(event.x_root, event.y_root)
+        if widget is None or not str(widget).startswith(str(self)):
+            return
+        if getattr(event, 'num', None) == 4:
+            delta = -1
+        elif getattr(event, 'num', None) == 5:
+            delta = 1
+        else:
+            delta = -1 if event.delta > 0 else 1
+        self.canvas.yview_scroll(delta, "units")
+    
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if float(last) >= self.PREFETCH_AT and not self._done and not self._loading:
+            self._loading = True
+            self.after_idle(self.load_next)
+    
+    def load_next(self):
+        """Dibuja la página siguiente; devuelve cuántas filas agregó"""
+        if self._done:
+            return 0
+        self._loading = True
+        try:
+            rows, self._cursor = self.fetch(self._cursor)
+            for row in rows:
+                self.render(self.body, row)
+        finally:
+            self._done = self._cursor is None
+            self._loading = False
+        return len(rows)
+
+
 class EcommerceApp:
     """Aplicación principal"""
     
-    def __init__(self):
+    # Renovar reservas bastante antes de su vencimiento
+    RESERVATION_RENEW_MS = StockReservationManager.DEFAULT_TTL * 1000 // 3
+    
+    # Sondeo de tareas en segundo plano (hashing de contraseñas)
+    FUTURE_POLL_MS = 50
+    
+    def __init__(self, storage='json'):
         self.root = ctk.CTk()
         self.root.title("E-commerce Platform")
         self.root.geometry("1000x700")
         
         # Inicializar managers
-        self.data_manager = DataManager()
+        self.data_manager = DataManager(storage)
         self.auth_manager = AuthManager(self.data_manager)
         self.product_manager = ProductManager(self.data_manager)
+        self.product_manager.subscribe(self.on_product_change)
+        self.products_frame = None
         self.sales_manager = SalesManager(self.data_manager)
         self.supplier_manager = SupplierManager(self.data_manager)
+        self.analytics = SalesAnalytics(self.data_manager)
+        self.thumbnails = ThumbnailCache(os.path.join(self.data_manager.data_dir, "thumbnails"))
+        self.image_loader = ImageLoader(self.root, self.thumbnails)
+        
+        # Reservas de stock del carrito de esta instancia
+        self.reservations = StockReservationManager(self.data_manager)
+        self.cart = []
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(self.RESERVATION_RENEW_MS, self.renew_reservations)
         
         # Mostrar login
         self.show_login()
@@ -954,6 +901,10 @@ class EcommerceApp:
                                           command=self.show_suppliers_management)
         self.suppliers_btn.pack(side="left", padx=5, pady=5)
         
+        self.analytics_btn = ctk.CTkButton(nav_frame, text="Analítica de Ventas", 
+                                          command=self.show_analytics)
+        self.analytics_btn.pack(side="left", padx=5, pady=5)
+        
         logout_btn = ctk.CTkButton(nav_frame, text="Cerrar Sesión", 
                                   command=self.logout, fg_color="red")
         logout_btn.pack(side="right", padx=5, pady=5)
@@ -965,6 +916,54 @@ class EcommerceApp:
         # Mostrar gestión de proveedores por defecto
         self.show_suppliers_management()
 
+    def show_analytics(self):
+        """Muestra reportes de ventas para el administrador"""
+        # Limpiar contenido
+        for widget in self.content_frame.winfo_children():
+            widget.destroy()
+        
+        # Título
+        title = ctk.CTkLabel(self.content_frame, text="Analítica de Ventas", 
+                            font=ctk.CTkFont(size=18, weight="bold"))
+        title.pack(pady=10)
+        
+        report = self.analytics.report(top=10, bucket='month')
+        if not report['lines']:
+            no_sales_label = ctk.CTkLabel(self.content_frame, text="No hay ventas registradas")
+            no_sales_label.pack(pady=20)
+            return
+        
+        repeat = report['repeat_customers']
+        summary_label = ctk.CTkLabel(self.content_frame,
+                                   text=f"Ingresos totales: ${report['revenue']:.2f} | Líneas de venta: {report['lines']} | "
+                                        f"Clientes recurrentes: {repeat['repeat']} de {repeat['customers']} ({repeat['rate']:.0%})",
+                                   font=ctk.CTkFont(size=14, weight="bold"))
+        summary_label.pack(pady=(0, 10))
+        
+        report_frame = ctk.CTkScrollableFrame(self.content_frame)
+        report_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        sections = [
+            ("Productos más vendidos", report['top_products'], 'name'),
+            ("Ingresos por categoría", report['by_category'], 'key'),
+            ("Ingresos por proveedor", report['by_supplier'], 'name'),
+            ("Ingresos por mes", report['by_period'], 'key'),
+        ]
+        for section_title, rows, label in sections:
+            section_label = ctk.CTkLabel(report_frame, text=section_title, 
+                                       font=ctk.CTkFont(size=15, weight="bold"))
+            section_label.pack(anchor="w", padx=10, pady=(10, 2))
+            
+            for row in rows:
+                row_frame = ctk.CTkFrame(report_frame)
+                row_frame.pack(fill="x", padx=10, pady=1)
+                
+                name_label = ctk.CTkLabel(row_frame, text=str(row[label]))
+                name_label.pack(side="left", padx=10)
+                
+                value_label = ctk.CTkLabel(row_frame, text=f"{row['units']} u | ${row['revenue']:.2f}")
+                value_label.pack(side="right", padx=10)
+    
     def show_suppliers_management(self):
         """Muestra gestión de proveedores"""
         # Limpiar contenido
@@ -1117,24 +1116,22 @@ class EcommerceApp:
                                command=self.add_product)
         add_btn.pack(pady=10)
         
-        # Frame para productos
-        products_frame = ctk.CTkScrollableFrame(self.content_frame)
-        products_frame.pack(fill="both", expand=True, padx=10, pady=10)
-        
         # Cargar productos del proveedor
         products = self.product_manager.get_products_by_supplier(
             self.auth_manager.current_user['id']
         )
         
         if not products:
-            no_products_label = ctk.CTkLabel(products_frame, 
+            no_products_label = ctk.CTkLabel(self.content_frame, 
                                            text="No tienes productos registrados")
             no_products_label.pack(pady=20)
             return
         
-        # Mostrar productos
-        for product in products:
-            self.create_product_card(products_frame, product, is_supplier=True)
+        # Mostrar productos (solo se dibujan las filas visibles)
+        supplier_id = self.auth_manager.current_user['id']
+        products_frame = VirtualProductList(self.content_frame, self, products, is_supplier=True,
+                                            accepts=lambda p: p.get('supplier_id') == supplier_id)
+        products_frame.pack(fill="both", expand=True, padx=10, pady=10)
         
         self.products_frame = products_frame
     
@@ -1149,105 +1146,21 @@ class EcommerceApp:
                             font=ctk.CTkFont(size=18, weight="bold"))
         title.pack(pady=10)
         
-        # Frame para productos
-        products_frame = ctk.CTkScrollableFrame(self.content_frame)
-        products_frame.pack(fill="both", expand=True, padx=10, pady=10)
-        
-        # Cargar todos los productos
-        products = self.product_manager.get_all_products()
+        # Cargar todos los productos (solo mostrar productos con stock)
+        products = [p for p in self.product_manager.get_all_products() if p['stock'] > 0]
         
         if not products:
-            no_products_label = ctk.CTkLabel(products_frame, 
+            no_products_label = ctk.CTkLabel(self.content_frame, 
                                            text="No hay productos disponibles")
             no_products_label.pack(pady=20)
             return
         
-        # Mostrar productos
-        for product in products:
-            if product['stock'] > 0:  # Solo mostrar productos con stock
-                self.create_product_card(products_frame, product, is_supplier=False)
-    
-    def create_product_card(self, parent, product, is_supplier=False):
-        """Crea tarjeta de producto"""
-        # Frame principal del producto
-        card_frame = ctk.CTkFrame(parent)
-        card_frame.pack(fill="x", padx=5, pady=5)
-        
-        # Frame horizontal para imagen y contenido
-        content_frame = ctk.CTkFrame(card_frame)
-        content_frame.pack(fill="x", padx=10, pady=10)
-        
-        # Frame para imagen
-        img_frame = ctk.CTkFrame(content_frame)
-        img_frame.pack(side="left", padx=(0, 10))
-        
-        # Cargar imagen
-        if product.get('image_path') and os.path.exists(product['image_path']):
-            try:
-                img = Image.open(product['image_path'])
-                img.thumbnail((100, 100))
-                photo = ImageTk.PhotoImage(img)
-                img_label = ctk.CTkLabel(img_frame, image=photo, text="")
-                img_label.image = photo  # Mantener referencia
-                img_label.pack(padx=10, pady=10)
-            except:
-                img_label = ctk.CTkLabel(img_frame, text="Sin\nImagen", 
-                                       width=100, height=100)
-                img_label.pack(padx=10, pady=10)
-        else:
-            img_label = ctk.CTkLabel(img_frame, text="Sin\nImagen", 
-                                   width=100, height=100)
-            img_label.pack(padx=10, pady=10)
-        
-        # Frame para información
-        info_frame = ctk.CTkFrame(content_frame)
-        info_frame.pack(side="left", fill="both", expand=True)
-        
-        # Nombre del producto
-        name_label = ctk.CTkLabel(info_frame, text=product['name'], 
-                                 font=ctk.CTkFont(size=16, weight="bold"))
-        name_label.pack(anchor="w", padx=10, pady=(10, 5))
-        
-        # Descripción
-        desc_label = ctk.CTkLabel(info_frame, text=product['description'], 
-                                 wraplength=300, justify="left")
-        desc_label.pack(anchor="w", padx=10, pady=2)
-        
-        # Precio y stock
-        price_label = ctk.CTkLabel(info_frame, text=f"Precio: ${product['price']:.2f}", 
-                                  font=ctk.CTkFont(weight="bold"))
-        price_label.pack(anchor="w", padx=10, pady=2)
-        
-        stock_label = ctk.CTkLabel(info_frame, text=f"Stock: {product['stock']} unidades")
-        stock_label.pack(anchor="w", padx=10, pady=2)
-        
-        category_label = ctk.CTkLabel(info_frame, text=f"Categoría: {product['category']}")
-        category_label.pack(anchor="w", padx=10, pady=(2, 10))
-        
-        # Frame para botones
-        btn_frame = ctk.CTkFrame(content_frame)
-        btn_frame.pack(side="right", padx=(10, 0))
+        # Mostrar productos (solo se dibujan las filas visibles)
+        products_frame = VirtualProductList(self.content_frame, self, products, is_supplier=False,
+                                            accepts=lambda p: p['stock'] > 0)
+        products_frame.pack(fill="both", expand=True, padx=10, pady=10)
         
-        if is_supplier:
-            # Botones para proveedor
-            edit_btn = ctk.CTkButton(btn_frame, text="Editar", 
-                                   command=lambda p=product: self.edit_product(p))
-            edit_btn.pack(pady=5, padx=10)
-            
-            delete_btn = ctk.CTkButton(btn_frame, text="Eliminar", 
-                                     command=lambda p=product: self.delete_product(p),
-                                     fg_color="red")
-            delete_btn.pack(pady=5, padx=10)
-        else:
-            # Botones para cliente
-            if product['stock'] > 0:
-                add_cart_btn = ctk.CTkButton(btn_frame, text="Agregar al Carrito", 
-                                           command=lambda p=product: self.add_to_cart(p))
-                add_cart_btn.pack(pady=5, padx=10)
-            else:
-                out_stock_label = ctk.CTkLabel(btn_frame, text="Sin Stock", 
-                                             text_color="red")
-                out_stock_label.pack(pady=5, padx=10)
+        self.products_frame = products_frame
     
     def add_product(self):
         """Abre ventana para agregar producto"""
@@ -1264,7 +1177,6 @@ class EcommerceApp:
             success, message = self.product_manager.delete_product(product['id'])
             if success:
                 messagebox.showinfo("Éxito", message)
-                self.refresh_products()
             else:
                 messagebox.showerror("Error", message)
     
@@ -1273,7 +1185,8 @@ class EcommerceApp:
         # Verificar si el producto ya está en el carrito
         for item in self.cart:
             if item['product_id'] == product['id']:
-                if item['quantity'] < product['stock']:
+                if (item['quantity'] < product['stock']
+                        and self.reservations.reserve(product['id'], item['quantity'] + 1)):
                     item['quantity'] += 1
                     self.update_cart_button()
                     messagebox.showinfo("Éxito", f"Agregado al carrito: {product['name']}")
@@ -1281,6 +1194,11 @@ class EcommerceApp:
                     messagebox.showwarning("Advertencia", "No hay suficiente stock")
                 return
         
+        # Reservar la unidad para que otras instancias no la vendan
+        if not self.reservations.reserve(product['id'], 1):
+            messagebox.showwarning("Advertencia", "No hay suficiente stock")
+            return
+        
         # Agregar nuevo producto al carrito
         self.cart.append({
             'product_id': product['id'],
@@ -1381,7 +1299,9 @@ class EcommerceApp:
             
             if new_quantity <= 0:
                 self.cart.pop(item_index)
-            elif new_quantity <= item['max_stock']:
+                self.reservations.release(item['product_id'])
+            elif (new_quantity <= item['max_stock']
+                    and self.reservations.reserve(item['product_id'], new_quantity)):
                 item['quantity'] = new_quantity
             else:
                 messagebox.showwarning("Advertencia", "No hay suficiente stock")
@@ -1394,7 +1314,8 @@ class EcommerceApp:
     def remove_from_cart(self, item_index, cart_window):
         """Elimina producto del carrito"""
         if 0 <= item_index < len(self.cart):
-            self.cart.pop(item_index)
+            item = self.cart.pop(item_index)
+            self.reservations.release(item['product_id'])
             self.update_cart_button()
             cart_window.destroy()
             if self.cart:
@@ -1405,15 +1326,9 @@ class EcommerceApp:
         if not self.cart:
             return
         
-        # Verificar stock disponible
-        for item in self.cart:
-            if not self.product_manager.update_stock(item['product_id'], item['quantity']):
-                messagebox.showerror("Error", f"No hay suficiente stock para {item['name']}")
-                return
-        
-        # Registrar venta
-        success, message = self.sales_manager.make_purchase(
-            self.auth_manager.current_user['id'], self.cart
+        # Validar stock, descontarlo y registrar la venta en una sola transacción
+        success, message = self.sales_manager.checkout(
+            self.auth_manager.current_user['id'], self.cart, self.reservations
         )
         
         if success:
@@ -1435,24 +1350,15 @@ class EcommerceApp:
                             font=ctk.CTkFont(size=18, weight="bold"))
         title.pack(pady=10)
         
-        # Frame para compras
-        purchases_frame = ctk.CTkScrollableFrame(self.content_frame)
-        purchases_frame.pack(fill="both", expand=True, padx=10, pady=10)
-        
-        # Cargar compras del cliente
-        purchases = self.sales_manager.get_customer_purchases(
-            self.auth_manager.current_user['id']
+        # Compras del cliente, por páginas a medida que se desplaza
+        customer_id = self.auth_manager.current_user['id']
+        purchases_frame = PagedList(
+            self.content_frame,
+            lambda cursor: self.sales_manager.get_customer_purchases_page(customer_id, cursor),
+            self.create_purchase_card,
+            "No tienes compras registradas"
         )
-        
-        if not purchases:
-            no_purchases_label = ctk.CTkLabel(purchases_frame, 
-                                            text="No tienes compras registradas")
-            no_purchases_label.pack(pady=20)
-            return
-        
-        # Mostrar compras
-        for purchase in purchases:
-            self.create_purchase_card(purchases_frame, purchase)
+        purchases_frame.pack(fill="both", expand=True, padx=10, pady=10)
     
     def create_purchase_card(self, parent, purchase):
         """Crea tarjeta de compra"""
@@ -1485,37 +1391,33 @@ class EcommerceApp:
                             font=ctk.CTkFont(size=18, weight="bold"))
         title.pack(pady=10)
         
-        # Frame para ventas
-        sales_frame = ctk.CTkScrollableFrame(self.content_frame)
-        sales_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        # Resumen desde los agregados (sin recorrer las ventas)
+        supplier_id = self.auth_manager.current_user['id']
+        summary = self.sales_manager.get_supplier_summary(supplier_id)
         
-        # Cargar ventas del proveedor
-        sales = self.sales_manager.get_supplier_sales(
-            self.auth_manager.current_user['id']
+        if summary['lines']:
+            summary_frame = ctk.CTkFrame(self.content_frame)
+            summary_frame.pack(fill="x", padx=15, pady=(10, 0))
+            
+            summary_label = ctk.CTkLabel(summary_frame, 
+                                       text=f"Total de ventas: {summary['lines']} | Unidades: {summary['units']} | Ingresos totales: ${summary['revenue']:.2f}",
+                                       font=ctk.CTkFont(size=14, weight="bold"))
+            summary_label.pack(pady=(10, 2))
+            
+            current_month = datetime.now().strftime('%Y-%m')
+            month = summary['monthly'].get(current_month, {'lines': 0, 'revenue': 0})
+            month_label = ctk.CTkLabel(summary_frame,
+                                     text=f"Este mes: {month['lines']} ventas | ${month['revenue']:.2f}")
+            month_label.pack(pady=(0, 10))
+        
+        # Detalle por páginas a medida que se desplaza
+        sales_frame = PagedList(
+            self.content_frame,
+            lambda cursor: self.sales_manager.get_supplier_sales_page(supplier_id, cursor),
+            self.create_sale_card,
+            "No tienes ventas registradas"
         )
-        
-        if not sales:
-            no_sales_label = ctk.CTkLabel(sales_frame, 
-                                        text="No tienes ventas registradas")
-            no_sales_label.pack(pady=20)
-            return
-        
-        # Calcular totales
-        total_sales = len(sales)
-        total_revenue = sum(sale['subtotal'] for sale in sales)
-        
-        # Mostrar resumen
-        summary_frame = ctk.CTkFrame(sales_frame)
-        summary_frame.pack(fill="x", padx=5, pady=10)
-        
-        summary_label = ctk.CTkLabel(summary_frame, 
-                                   text=f"Total de ventas: {total_sales} | Ingresos totales: ${total_revenue:.2f}",
-                                   font=ctk.CTkFont(size=14, weight="bold"))
-        summary_label.pack(pady=10)
-        
-        # Mostrar ventas
-        for sale in sales:
-            self.create_sale_card(sales_frame, sale)
+        sales_frame.pack(fill="both", expand=True, padx=10, pady=10)
     
     def create_sale_card(self, parent, sale):
         """Crea tarjeta de venta"""
@@ -1531,6 +1433,15 @@ class EcommerceApp:
         info_label = ctk.CTkLabel(card_frame, text=info_text)
         info_label.pack(anchor="w", padx=10, pady=10)
     
+    def on_product_change(self, event, product):
+        """Lleva un cambio de producto a la lista visible, si la hay"""
+        frame = self.products_frame
+        if frame is not None and frame.winfo_exists():
+            frame.apply_change(event, product)
+        elif event == 'added' and self.auth_manager.current_user['type'] == 'proveedor':
+            # Inventario vacío: no hay lista que actualizar, se arma con el primer producto
+            self.refresh_products()
+    
     def refresh_products(self):
         """Refresca la vista de productos"""
         if self.auth_manager.current_user['type'] == 'proveedor':
@@ -1540,14 +1451,50 @@ class EcommerceApp:
     
     def logout(self):
         """Cierra sesión"""
+        # Carrito abandonado: liberar el stock reservado
+        self.reservations.release_all()
+        self.cart = []
         self.auth_manager.logout_user()
         self.root.withdraw()
         self.show_login()
     
+    def when_done(self, future, callback):
+        """Llama callback(future) en el hilo de Tk cuando el Future termina"""
+        if future.done():
+            callback(future)
+        else:
+            self.root.after(self.FUTURE_POLL_MS, lambda: self.when_done(future, callback))
+    
+    def renew_reservations(self):
+        """Mantiene vigentes las reservas mientras el carrito siga abierto"""
+        self.reservations.renew_all()
+        self.root.after(self.RESERVATION_RENEW_MS, self.renew_reservations)
+    
+    def on_close(self):
+        """Libera las reservas antes de cerrar la aplicación"""
+        self.reservations.release_all()
+        self.image_loader.shutdown()
+        self.auth_manager.hasher.shutdown()
+        self.root.destroy()
+    
     def run(self):
         """Ejecuta la aplicación"""
         self.root.mainloop()
 
 if __name__ == "__main__":
-    app = EcommerceApp()
-    app.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="E-commerce Platform")
+    parser.add_argument("--storage", choices=["json", "sqlite"],
+                        default=os.environ.get("ECOMMERCE_STORAGE", "json"),
+                        help="Motor de almacenamiento (por defecto: json)")
+    parser.add_argument("--migrate-sqlite", metavar="DB", nargs="?",
+                        const=os.path.join("data", "ecommerce.db"),
+                        help="Importa los JSON de data/ a la base SQLite indicada y termina")
+    args = parser.parse_args()
+    
+    if args.migrate_sqlite:
+        counts = migrate_json_to_sqlite("data", args.migrate_sqlite)
+        for file_type, count in counts.items():
+            print(f"{file_type}: {count} registros importados")
+    else:
+        app = EcommerceApp(args.storage)
+        app.run()
\ No newline at end of file
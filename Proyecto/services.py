@@ -0,0 +1,1988 @@
+"""Capa de servicios del e-commerce, sin interfaz gráfica.
+
+Contiene el almacenamiento (JSON o SQLite) y los managers de autenticación,
+productos, ventas, proveedores y reservas de stock. La usan la aplicación de
+escritorio (main.py) y la API HTTP (api.py)."""
+
+import json
+import os
+import sqlite3
+import hashlib
+import hmac
+import re
+import sys
+from datetime import datetime
+import time
+from contextlib import contextmanager
+import uuid
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+from bisect import bisect_left, insort
+from functools import partial
+from heapq import merge
+from itertools import islice
+from operator import itemgetter
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_ADMIN = {
+    "id": "admin-001",
+    "rut": "11111111-1",
+    "email": "admin@sistema.com",
+    "password": "ef92b778bafe771e89245b89ecbc08a44a4e166c06659911881f383d4473e94f",
+    "type": "admin",
+    "name": "Administrador del Sistema",
+    "created_at": "2024-01-01T00:00:00"
+}
+
+class StockError(Exception):
+    """Stock insuficiente para una línea del carrito al confirmar la compra"""
+    
+    def __init__(self, product_id):
+        super().__init__(f"Stock insuficiente para {product_id}")
+        self.product_id = product_id
+
+
+class FileLock:
+    """Bloqueo consultivo entre procesos sobre un archivo .lock"""
+    
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+    
+    def __enter__(self):
+        self._file = open(self.path, 'a+')
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        else:
+            # msvcrt.locking reintenta solo 10 veces: esperar hasta obtenerlo
+            while True:
+                try:
+                    self._file.seek(0)
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
+
+
+class JsonStorage:
+    """Motor de almacenamiento en archivos JSON con journal de ventas"""
+    
+    # Operaciones del journal de ventas antes de consolidar en sales.json
+    JOURNAL_COMPACT_THRESHOLD = 1000
+    
+    # Colecciones que se reescriben seguido: JSON sin indentar (mitad de tamaño y de tiempo)
+    COMPACT_FILES = ('products', 'sales')
+    
+    def __init__(self, data_dir):
+        self.users_file = os.path.join(data_dir, "users.json")
+        self.products_file = os.path.join(data_dir, "products.json")
+        self.sales_file = os.path.join(data_dir, "sales.json")
+        self.admin_file = os.path.join(data_dir, "admin.json")
+        self.suppliers_file = os.path.join(data_dir, "suppliers.json")
+        self.sales_journal_file = os.path.join(data_dir, "sales.journal.jsonl")
+        self.file_map = {
+            'users': self.users_file,
+            'products': self.products_file,
+            'sales': self.sales_file,
+            'admin': self.admin_file,
+            'suppliers': self.suppliers_file
+        }
+        self._journal_entries = 0
+        
+        # Inicializar archivos JSON
+        self._init_json_files()
+    
+    def _init_json_files(self):
+        """Inicializa archivos JSON si no existen"""
+        for file_path in [self.users_file, self.products_file, self.sales_file, self.suppliers_file]:
+            if not os.path.exists(file_path):
+                with open(file_path, 'w') as f:
+                    json.dump([], f)
+
+        if not os.path.exists(self.admin_file):
+            with open(self.admin_file, 'w') as f:
+                json.dump([DEFAULT_ADMIN], f, indent=2, ensure_ascii=False)
+    
+    def _file_signature(self, file_path):
+        """Devuelve (mtime, tamaño) del archivo para detectar cambios en disco"""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def _lock(self, file_type):
+        """Bloqueo breve entre procesos para el read-modify-write de una colección"""
+        return FileLock(self.file_map[file_type] + ".lock")
+    
+    def signature(self, file_type):
+        """Firma de la colección; las ventas dependen del snapshot y del journal"""
+        signature = self._file_signature(self.file_map[file_type])
+        if file_type == 'sales':
+            return (signature, self._file_signature(self.sales_journal_file))
+        return signature
+    
+    def _write_json_atomic(self, file_path, data, indent=2):
+        """Escribe JSON en un archivo temporal y lo reemplaza atómicamente"""
+        tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            # dumps y no dump: sin indentar usa el codificador en C
+            f.write(json.dumps(data, indent=indent, ensure_ascii=False, default=_json_default))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    
+    def read(self, file_type):
+        """Lee la colección completa desde su archivo JSON.
+        
+        Las ventas se devuelven con el journal aplicado en memoria. Leer no escribe
+        nada: una línea incompleta al final del journal se ignora aquí y se descarta
+        en el próximo append, con el bloqueo tomado."""
+        with open(self.file_map[file_type], 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if file_type == 'sales':
+            self._replay_sales_journal(data)
+        return data
+    
+    def _write(self, file_type, data):
+        """Reescribe la colección completa (el llamador tiene el bloqueo)"""
+        indent = None if file_type in self.COMPACT_FILES else 2
+        self._write_json_atomic(self.file_map[file_type], data, indent)
+        if file_type == 'sales':
+            # El snapshot ya contiene todo lo del journal
+            open(self.sales_journal_file, 'w').close()
+            self._journal_entries = 0
+    
+    def write(self, file_type, data):
+        """Reescribe la colección completa; devuelve las firmas (antes, después)"""
+        with self._lock(file_type):
+            before = self.signature(file_type)
+            self._write(file_type, data)
+            return before, self.signature(file_type)
+    
+    def _current(self, file_type, cached):
+        """Colección vigente en disco (el llamador tiene el bloqueo).
+        
+        cached es la (firma, datos) en memoria del llamador: si la firma sigue siendo
+        la del disco se trabaja sobre una copia de esa lista en vez de releer el JSON."""
+        if cached is not None and cached[0] is not None and cached[0] == self.signature(file_type):
+            return list(cached[1])
+        return self.read(file_type)
+    
+    def write_records(self, file_type, records, cached=None):
+        """Persiste registros nuevos o modificados sobre la versión actual del disco"""
+        with self._lock(file_type):
+            before = self.signature(file_type)
+            current = self._current(file_type, cached)
+            positions = {record.get('id'): i for i, record in enumerate(current)}
+            for record in records:
+                if record.get('id') in positions:
+                    current[positions[record['id']]] = record
+                else:
+                    current.append(record)
+            self._write(file_type, current)
+            return before, self.signature(file_type)
+    
+    def delete_records(self, file_type, records, cached=None):
+        """Elimina registros sobre la versión actual del disco"""
+        deleted_ids = {record.get('id') for record in records}
+        with self._lock(file_type):
+            before = self.signature(file_type)
+            current = [r for r in self._current(file_type, cached) if r.get('id') not in deleted_ids]
+            self._write(file_type, current)
+            return before, self.signature(file_type)
+    
+    def _replay_sales_journal(self, sales):
+        """Aplica sobre el snapshot las operaciones registradas en el journal"""
+        self._journal_entries = 0
+        if not os.path.exists(self.sales_journal_file):
+            return
+        
+        sales_by_id = {sale['id']: sale for sale in sales}
+        with open(self.sales_journal_file, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Append en curso o interrumpido por una caída
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                # Un 'add' ya consolidado en el snapshot no se repite
+                if entry['op'] != 'add' or entry['sale']['id'] not in sales_by_id:
+                    self._apply_sales_entry(sales, entry, sales_by_id)
+                self._journal_entries += 1
+    
+    def _drop_torn_journal_tail(self):
+        """Descarta una última línea sin salto de línea (el llamador tiene el bloqueo).
+        
+        Con el bloqueo no hay otro append en curso: esa línea quedó de una caída, y
+        si no se quita el próximo append quedaría pegado a ella."""
+        try:
+            f = open(self.sales_journal_file, 'r+b')
+        except FileNotFoundError:
+            return
+        with f:
+            end = f.seek(0, os.SEEK_END)
+            if end == 0:
+                return
+            f.seek(end - 1)
+            if f.read(1) == b"\n":
+                return
+            while end > 0:
+                start = max(0, end - 4096)
+                f.seek(start)
+                newline = f.read(end - start).rfind(b"\n")
+                if newline >= 0:
+                    f.truncate(start + newline + 1)
+                    return
+                end = start
+            f.truncate(0)
+    
+    def _apply_sales_entry(self, sales, entry, sales_by_id):
+        """Aplica una operación del journal a la lista de ventas"""
+        op = entry['op']
+        if op == 'add':
+            sales.append(entry['sale'])
+            sales_by_id[entry['sale']['id']] = entry['sale']
+            return
+        
+        sale = sales_by_id.get(entry['id'])
+        if sale is None:
+            return
+        if op == 'update':
+            sale.update(entry['fields'])
+        elif op == 'delete':
+            sales.remove(sale)
+            sales_by_id.pop(entry['id'], None)
+    
+    def append_sales_entry(self, entry):
+        """Agrega una operación al journal con fsync; devuelve las firmas (antes, después)"""
+        with self._lock('sales'):
+            before = self.signature('sales')
+            self._drop_torn_journal_tail()
+            with open(self.sales_journal_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._journal_entries += 1
+            return before, self.signature('sales')
+    
+    def needs_compaction(self):
+        """Indica si el journal de ventas creció lo suficiente para consolidarlo"""
+        return self._journal_entries >= self.JOURNAL_COMPACT_THRESHOLD
+    
+    def compact_sales(self):
+        """Consolida snapshot + journal en sales.json; devuelve (ventas, (firma antes, después))"""
+        with self._lock('sales'):
+            before = self.signature('sales')
+            sales = self.read('sales')
+            self._write('sales', sales)
+            return sales, (before, self.signature('sales'))
+    
+    def _adjust_stock(self, quantities, sign, cached=None):
+        """Suma o resta cantidades al stock vigente en disco, validando que alcance"""
+        with self._lock('products'):
+            before = self.signature('products')
+            products = self._current('products', cached)
+            positions = {p['id']: i for i, p in enumerate(products)}
+            for product_id, quantity in quantities.items():
+                i = positions.get(product_id)
+                if i is None or (sign < 0 and products[i]['stock'] < quantity):
+                    raise StockError(product_id)
+            for product_id, quantity in quantities.items():
+                # Copia: los registros pueden ser los de la caché del llamador
+                product = dict(products[positions[product_id]])
+                product['stock'] += sign * quantity
+                products[positions[product_id]] = product
+            self._write('products', products)
+            return before, self.signature('products')
+    
+    def decrement_stock(self, quantities, cached=None):
+        """Descuenta stock validando contra el disco; devuelve las firmas (antes, después)"""
+        return self._adjust_stock(quantities, -1, cached)
+    
+    def commit_checkout(self, quantities, sale, cached=None):
+        """Descuenta el stock de todo el carrito en una escritura y luego registra la venta"""
+        products_signatures = self._adjust_stock(quantities, -1, cached)
+        try:
+            sales_signatures = self.append_sales_entry({'op': 'add', 'sale': sale})
+        except Exception:
+            # Devolver el stock descontado si la venta no quedó registrada
+            self._adjust_stock(quantities, 1)
+            raise
+        return {'products': products_signatures, 'sales': sales_signatures}
+
+
+class SQLiteStorage:
+    """Motor de almacenamiento en SQLite (modo WAL) con actualizaciones por fila"""
+    
+    # Columnas por tabla; 'extra' guarda como JSON las claves no declaradas
+    TABLES = {
+        'users': ('id', 'rut', 'email', 'password', 'type', 'name', 'created_at',
+                  'updated_at', 'store_name', 'store_description', 'contact_phone'),
+        'admin': ('id', 'rut', 'email', 'password', 'type', 'name', 'created_at', 'updated_at'),
+        'products': ('id', 'name', 'description', 'price', 'stock', 'category', 'image_path',
+                     'supplier_id', 'created_at', 'updated_at'),
+        'sales': ('id', 'customer_id', 'total_amount', 'date', 'payment_status',
+                  'tracking_number', 'updated_at'),
+        'suppliers': ('id',)
+    }
+    SALE_ITEM_COLUMNS = ('product_id', 'quantity', 'price', 'subtotal')
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            id TEXT PRIMARY KEY, rut TEXT, email TEXT, password TEXT, type TEXT, name TEXT,
+            created_at TEXT, updated_at TEXT, store_name TEXT, store_description TEXT,
+            contact_phone TEXT, extra TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
+        CREATE INDEX IF NOT EXISTS idx_users_rut ON users(rut);
+        CREATE INDEX IF NOT EXISTS idx_users_type ON users(type);
+        
+        CREATE TABLE IF NOT EXISTS admin (
+            id TEXT PRIMARY KEY, rut TEXT, email TEXT, password TEXT, type TEXT, name TEXT,
+            created_at TEXT, updated_at TEXT, extra TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_admin_email ON admin(email);
+        
+        CREATE TABLE IF NOT EXISTS products (
+            id TEXT PRIMARY KEY, name TEXT, description TEXT, price REAL, stock INTEGER,
+            category TEXT, image_path TEXT, supplier_id TEXT, created_at TEXT,
+            updated_at TEXT, extra TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_products_supplier ON products(supplier_id);
+        CREATE INDEX IF NOT EXISTS idx_products_category ON products(category);
+        
+        CREATE TABLE IF NOT EXISTS sales (
+            id TEXT PRIMARY KEY, customer_id TEXT, total_amount REAL, date TEXT,
+            payment_status TEXT, tracking_number TEXT, updated_at TEXT, extra TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_sales_customer ON sales(customer_id);
+        CREATE INDEX IF NOT EXISTS idx_sales_date ON sales(date);
+        
+        CREATE TABLE IF NOT EXISTS sale_items (
+            sale_id TEXT NOT NULL REFERENCES sales(id) ON DELETE CASCADE,
+            position INTEGER NOT NULL, product_id TEXT, quantity INTEGER, price REAL,
+            subtotal REAL, PRIMARY KEY (sale_id, position)
+        );
+        CREATE INDEX IF NOT EXISTS idx_sale_items_product ON sale_items(product_id);
+        
+        CREATE TABLE IF NOT EXISTS suppliers (id TEXT PRIMARY KEY, extra TEXT);
+        
+        CREATE TABLE IF NOT EXISTS table_versions (name TEXT PRIMARY KEY, version INTEGER);
+    """
+    
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self._init_schema()
+    
+    def _init_schema(self):
+        """Crea tablas, índices y triggers de versión si no existen"""
+        with self.conn:
+            self.conn.executescript(self.SCHEMA)
+            # Cada tabla lleva un contador de versión para invalidar cachés de otros procesos
+            for table in list(self.TABLES) + ['sale_items']:
+                version_table = 'sales' if table == 'sale_items' else table
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO table_versions (name, version) VALUES (?, 0)",
+                    (version_table,)
+                )
+                for event in ('INSERT', 'UPDATE', 'DELETE'):
+                    self.conn.execute(
+                        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()} "
+                        f"AFTER {event} ON {table} BEGIN "
+                        f"UPDATE table_versions SET version = version + 1 "
+                        f"WHERE name = '{version_table}'; END"
+                    )
+            
+            if self.conn.execute("SELECT COUNT(*) FROM admin").fetchone()[0] == 0:
+                self._upsert('admin', [DEFAULT_ADMIN])
+    
+    def signature(self, file_type):
+        """Versión actual de la tabla (cambia con cualquier escritura, propia o ajena)"""
+        row = self.conn.execute(
+            "SELECT version FROM table_versions WHERE name = ?", (file_type,)
+        ).fetchone()
+        return row[0] if row else None
+    
+    def _row_to_record(self, columns, row):
+        """Convierte una fila en diccionario; las columnas declaradas siempre están (None si son
+        nulas) y 'extra' solo aporta las claves que se guardaron ahí"""
+        record = dict(zip(columns, row[:-1]))
+        if row[-1]:
+            record.update(json.loads(row[-1]))
+        return record
+    
+    def _record_to_row(self, columns, record):
+        """Convierte un diccionario en fila; las claves no declaradas van a 'extra'"""
+        extra = {k: v for k, v in record.items() if k not in columns and k != 'items'}
+        return tuple(record.get(col) for col in columns) + (
+            json.dumps(extra, ensure_ascii=False) if extra else None,
+        )
+    
+    def read(self, file_type):
+        """Lee la tabla completa como lista de diccionarios"""
+        columns = self.TABLES[file_type]
+        rows = self.conn.execute(
+            f"SELECT {', '.join(columns)}, extra FROM {file_type} ORDER BY rowid"
+        ).fetchall()
+        records = [self._row_to_record(columns, row) for row in rows]
+        
+        if file_type == 'sales':
+            by_id = {}
+            for sale in records:
+                sale['items'] = []
+                by_id[sale['id']] = sale
+            for row in self.conn.execute(
+                f"SELECT sale_id, {', '.join(self.SALE_ITEM_COLUMNS)} "
+                "FROM sale_items ORDER BY sale_id, position"
+            ):
+                if row[0] in by_id:
+                    by_id[row[0]]['items'].append(dict(zip(self.SALE_ITEM_COLUMNS, row[1:])))
+        return records
+    
+    def _upsert(self, file_type, records):
+        """Inserta o reemplaza filas (y los ítems de las ventas)"""
+        columns = self.TABLES[file_type]
+        placeholders = ', '.join('?' * (len(columns) + 1))
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO {file_type} ({', '.join(columns)}, extra) "
+            f"VALUES ({placeholders})",
+            [self._record_to_row(columns, record) for record in records]
+        )
+        if file_type == 'sales':
+            for sale in records:
+                self.conn.execute("DELETE FROM sale_items WHERE sale_id = ?", (sale['id'],))
+                self.conn.executemany(
+                    f"INSERT INTO sale_items (sale_id, position, "
+                    f"{', '.join(self.SALE_ITEM_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(sale['id'], i) + tuple(item.get(col) for col in self.SALE_ITEM_COLUMNS)
+                     for i, item in enumerate(sale.get('items', []))]
+                )
+    
+    @contextmanager
+    def _transaction(self, file_type):
+        """Transacción de escritura; entrega [versión antes, versión después] de la tabla"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        signatures = [self.signature(file_type), None]
+        try:
+            yield signatures
+            signatures[1] = self.signature(file_type)
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+    
+    def write(self, file_type, data):
+        """Reemplaza la tabla completa en una sola transacción"""
+        with self._transaction(file_type) as signatures:
+            self.conn.execute(f"DELETE FROM {file_type}")
+            self._upsert(file_type, data)
+        return tuple(signatures)
+    
+    def write_records(self, file_type, records, cached=None):
+        """Actualiza solo las filas de los registros indicados (cached no se usa)"""
+        with self._transaction(file_type) as signatures:
+            self._upsert(file_type, records)
+        return tuple(signatures)
+    
+    def delete_records(self, file_type, records, cached=None):
+        """Elimina solo las filas de los registros indicados (cached no se usa)"""
+        with self._transaction(file_type) as signatures:
+            self.conn.executemany(
+                f"DELETE FROM {file_type} WHERE id = ?", [(r['id'],) for r in records]
+            )
+        return tuple(signatures)
+    
+    def append_sales_entry(self, entry):
+        """Aplica una operación de ventas directamente sobre las filas afectadas"""
+        with self._transaction('sales') as signatures:
+            if entry['op'] == 'add':
+                self._upsert('sales', [entry['sale']])
+            elif entry['op'] == 'delete':
+                self.conn.execute("DELETE FROM sales WHERE id = ?", (entry['id'],))
+            else:
+                self._update_sale_fields(entry['id'], entry['fields'])
+        return tuple(signatures)
+    
+    def _update_sale_fields(self, sale_id, new_fields):
+        """Actualiza columnas de una venta; los campos no declarados van a 'extra'"""
+        sale = self.conn.execute("SELECT extra FROM sales WHERE id = ?", (sale_id,)).fetchone()
+        if sale is None:
+            return
+        columns = self.TABLES['sales']
+        fields = {k: v for k, v in new_fields.items() if k in columns}
+        extra = dict(json.loads(sale[0]) if sale[0] else {})
+        extra.update({k: v for k, v in new_fields.items() if k not in columns})
+        assignments = ''.join(f"{k} = ?, " for k in fields)
+        self.conn.execute(
+            f"UPDATE sales SET {assignments}extra = ? WHERE id = ?",
+            tuple(fields.values()) + (json.dumps(extra) if extra else None, sale_id)
+        )
+    
+    def needs_compaction(self):
+        """SQLite no usa journal propio"""
+        return False
+    
+    def compact_sales(self):
+        """Vuelca el WAL a la base principal"""
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return None
+    
+    def _decrement_stock_rows(self, quantities):
+        """Descuenta stock fila por fila solo si alcanza (compare-and-swap)"""
+        for product_id, quantity in quantities.items():
+            cursor = self.conn.execute(
+                "UPDATE products SET stock = stock - ? WHERE id = ? AND stock >= ?",
+                (quantity, product_id, quantity)
+            )
+            if cursor.rowcount == 0:
+                raise StockError(product_id)
+    
+    def decrement_stock(self, quantities, cached=None):
+        """Descuenta stock en una transacción; devuelve las versiones (antes, después)"""
+        with self._transaction('products') as signatures:
+            self._decrement_stock_rows(quantities)
+        return tuple(signatures)
+    
+    def commit_checkout(self, quantities, sale, cached=None):
+        """Descuenta stock y registra la venta en una sola transacción"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            products_before = self.signature('products')
+            sales_before = self.signature('sales')
+            self._decrement_stock_rows(quantities)
+            self._upsert('sales', [sale])
+            signatures = {
+                'products': (products_before, self.signature('products')),
+                'sales': (sales_before, self.signature('sales'))
+            }
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        return signatures
+    
+    def close(self):
+        """Cierra la conexión"""
+        self.conn.close()
+
+
+def migrate_json_to_sqlite(data_dir, db_path):
+    """Importa las colecciones JSON existentes a una base SQLite"""
+    source = JsonStorage(data_dir)
+    target = SQLiteStorage(db_path)
+    counts = {}
+    try:
+        for file_type in source.file_map:
+            data = source.read(file_type)
+            target.write(file_type, data)
+            counts[file_type] = len(data)
+    finally:
+        target.close()
+    return counts
+
+
+class ProductRecord(MutableMapping):
+    """Producto en memoria compacta con interfaz de diccionario.
+    
+    Los campos conocidos van en __slots__ en vez de un dict por producto, y la
+    categoría y el proveedor se internan (una sola copia por valor). Los valores
+    se guardan tal cual vienen del JSON: leer un campo es un getattr y los índices
+    comparten el mismo objeto que el registro. Las claves desconocidas van a un
+    dict aparte."""
+    
+    FIELDS = ('id', 'name', 'description', 'price', 'stock', 'category',
+              'image_path', 'supplier_id', 'created_at', 'updated_at')
+    __slots__ = FIELDS + ('_extra',)
+    
+    _FIELD_SET = frozenset(FIELDS)
+    _INTERNED = frozenset(('category', 'supplier_id'))
+    MISSING = object()
+    
+    def __init__(self, data=()):
+        # Igual que __setitem__ por cada clave, sin una llamada por campo
+        extra = None
+        fields = self._FIELD_SET
+        interned = self._INTERNED
+        for key, value in (data.items() if hasattr(data, 'items') else data):
+            if key in fields:
+                if key in interned and type(value) is str:
+                    value = sys.intern(value)
+                setattr(self, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        self._extra = extra
+    
+    def __getitem__(self, key):
+        if key in self._FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+    
+    def get(self, key, default=None):
+        # Directo, sin pasar por __getitem__ y KeyError (lo usan los índices)
+        if key in self._FIELD_SET:
+            return getattr(self, key, default)
+        if self._extra is None:
+            return default
+        return self._extra.get(key, default)
+    
+    def __setitem__(self, key, value):
+        if key in self._FIELD_SET:
+            if key in self._INTERNED and type(value) is str:
+                value = sys.intern(value)
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+    
+    def __delitem__(self, key):
+        if key in self._FIELD_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+    
+    def __contains__(self, key):
+        if key in self._FIELD_SET:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+    
+    def __iter__(self):
+        for key in self.FIELDS:
+            if hasattr(self, key):
+                yield key
+        if self._extra:
+            yield from list(self._extra)
+    
+    def __len__(self):
+        return sum(1 for key in self.FIELDS if hasattr(self, key)) + len(self._extra or ())
+    
+    def _raw(self):
+        """Valores de los campos (MISSING si faltan) y claves extra"""
+        return tuple(getattr(self, key, self.MISSING) for key in self.FIELDS), self._extra or {}
+    
+    def __eq__(self, other):
+        if isinstance(other, ProductRecord):
+            return self._raw() == other._raw()
+        return super().__eq__(other)
+    
+    def __repr__(self):
+        return f"ProductRecord({dict(self)!r})"
+    
+    def copy(self):
+        """Copia como diccionario, igual que dict.copy() (más rápido que dict(record))"""
+        data = {}
+        for key in self.FIELDS:
+            value = getattr(self, key, self.MISSING)
+            if value is not self.MISSING:
+                data[key] = value
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+
+def _json_default(value):
+    """Serializa registros compactos como dict"""
+    return value.copy() if isinstance(value, ProductRecord) else dict(value)
+
+class DataManager:
+    """Gestor de datos con caché en memoria sobre un motor de almacenamiento"""
+    
+    # Índices secundarios por colección (además del índice primario por 'id').
+    # 'items.product_id' indexa cada venta por los productos que contiene.
+    INDEXED_FIELDS = {
+        'users': ('email', 'rut', 'type'),
+        'products': ('supplier_id', 'category'),
+        'sales': ('customer_id', 'items.product_id'),
+        'admin': ('email', 'rut'),
+        'suppliers': ()
+    }
+    
+    # Orden de los registros dentro de cada índice secundario (sin entrada: orden de inserción).
+    # Las ventas quedan por (fecha, id), así las páginas se toman con bisect sin ordenar nada.
+    INDEX_ORDER = {'sales': ('date', 'id')}
+    
+    # Colecciones que se guardan en memoria con un registro compacto en vez de dict
+    RECORD_TYPES = {'products': ProductRecord}
+    
+    def __init__(self, storage='json'):
+        self.data_dir = "data"
+        self.images_dir = os.path.join(self.data_dir, "product_images")
+        self.db_file = os.path.join(self.data_dir, "ecommerce.db")
+        
+        # Caché en memoria: file_type -> (firma del almacenamiento, datos)
+        self._cache = {}
+        
+        # Índices: file_type -> {campo: {valor: registro o [registros]}}
+        self._indexes = {}
+        # Valores indexados (y clave de orden) de cada registro al indexarlo: file_type -> {id: claves}.
+        # Permiten reindexar un registro modificado en su lugar sin recorrer la colección.
+        self._index_keys = {}
+        
+        # Firmas (antes, después) de la última escritura de ventas de esta instancia
+        self.last_sales_signatures = None
+        
+        # Crear directorios si no existen
+        os.makedirs(self.data_dir, exist_ok=True)
+        os.makedirs(self.images_dir, exist_ok=True)
+        
+        if storage == 'sqlite':
+            self.storage = SQLiteStorage(self.db_file)
+        else:
+            self.storage = JsonStorage(self.data_dir)
+    
+    def load_data(self, file_type):
+        """Carga datos desde la caché en memoria, releyendo solo si cambiaron en el almacenamiento"""
+        signature = self.storage.signature(file_type)
+        
+        cached = self._cache.get(file_type)
+        if cached is not None and signature is not None and cached[0] == signature:
+            return cached[1]
+        
+        try:
+            data = self.storage.read(file_type)
+            signature = self.storage.signature(file_type)
+        except Exception as e:
+            print(f"Error cargando {file_type}: {e}")
+            return []
+        
+        self._set_cache(file_type, signature, data)
+        return data
+    
+    def save_data(self, file_type, data):
+        """Guarda la colección completa y actualiza la caché en memoria"""
+        try:
+            signatures = self.storage.write(file_type, data)
+        except Exception as e:
+            print(f"Error guardando {file_type}: {e}")
+            self._cache.pop(file_type, None)
+            return False
+        
+        self._set_cache(file_type, signatures[1], data)
+        return True
+    
+    def _finish_write(self, file_type, data, cached_signature, signatures, changed=(), removed=()):
+        """Conserva la caché solo si nadie más escribió la colección desde que se leyó.
+        
+        Los índices se actualizan solo para los registros escritos o eliminados."""
+        before, after = signatures
+        if before == cached_signature and file_type in self._indexes:
+            self._cache[file_type] = (after, data)
+            for record in removed:
+                self._unindex_record(file_type, record)
+            for record in changed:
+                self._reindex_record(file_type, record)
+        else:
+            # Otro proceso escribió entremedio: releer en el próximo acceso
+            self._cache.pop(file_type, None)
+    
+    @staticmethod
+    def _position(data, *records):
+        """Posición (por identidad) de alguno de 'records' en data, buscando desde el final"""
+        for i in range(len(data) - 1, -1, -1):
+            item = data[i]
+            for record in records:
+                if item is record:
+                    return i
+        return None
+    
+    def _place_records(self, file_type, data, records):
+        """Deja cada registro guardado en la lista en caché, con el tipo compacto si lo hay.
+        
+        Los registros nuevos suelen estar recién agregados al final de data, así que
+        se buscan desde atrás; si no están, se agregan."""
+        record_type = self.RECORD_TYPES.get(file_type)
+        by_id = self._indexes.get(file_type, {}).get('id', {})
+        placed = []
+        for record in records:
+            existing = by_id.get(record.get('id'))
+            if existing is record:
+                placed.append(record)
+                continue
+            if record_type is not None and not isinstance(record, record_type):
+                converted = record_type(record)
+            else:
+                converted = record
+            i = self._position(data, record, existing)
+            if i is None:
+                data.append(converted)
+            else:
+                data[i] = converted
+            placed.append(converted)
+        return placed
+    
+    def save_records(self, file_type, records):
+        """Persiste registros nuevos o modificados de la colección en caché"""
+        data = self.load_data(file_type)
+        cached_signature = self._cache.get(file_type, (None,))[0]
+        try:
+            signatures = self.storage.write_records(file_type, records, self._cache.get(file_type))
+        except Exception as e:
+            print(f"Error guardando {file_type}: {e}")
+            self._cache.pop(file_type, None)
+            return False
+        
+        if signatures[0] == cached_signature:
+            records = self._place_records(file_type, data, records)
+        self._finish_write(file_type, data, cached_signature, signatures, changed=records)
+        return True
+    
+    def delete_records(self, file_type, records):
+        """Quita registros de la colección en caché y persiste la eliminación"""
+        data = self.load_data(file_type)
+        cached_signature = self._cache.get(file_type, (None,))[0]
+        by_id = self._indexes.get(file_type, {}).get('id', {})
+        records = [by_id.get(record.get('id'), record) for record in records]
+        for record in records:
+            i = self._position(data, record)
+            if i is not None:
+                del data[i]
+        try:
+            signatures = self.storage.delete_records(file_type, records, self._cache.get(file_type))
+        except Exception as e:
+            print(f"Error guardando {file_type}: {e}")
+            self._cache.pop(file_type, None)
+            return False
+        
+        self._finish_write(file_type, data, cached_signature, signatures, removed=records)
+        return True
+    
+    def _set_cache(self, file_type, signature, data):
+        """Guarda la colección en caché y reconstruye sus índices"""
+        record_type = self.RECORD_TYPES.get(file_type)
+        if record_type is not None:
+            data[:] = [r if isinstance(r, record_type) else record_type(r) for r in data]
+        self._cache[file_type] = (signature, data)
+        self._build_indexes(file_type, data)
+    
+    def _index_values(self, record, field):
+        """Valores de un registro para un campo indexado (sin duplicados)"""
+        if field == 'items.product_id':
+            return tuple(dict.fromkeys(item['product_id'] for item in record.get('items', [])))
+        value = record.get(field)
+        return () if value is None else (value,)
+    
+    def _order_key(self, file_type, record):
+        """Clave de orden del registro en los índices secundarios (None: orden de inserción)"""
+        fields = self.INDEX_ORDER.get(file_type)
+        if fields is None:
+            return None
+        return tuple(record.get(field) or '' for field in fields)
+    
+    def _record_keys(self, file_type, record):
+        """Valores de cada campo indexado más la clave de orden del registro"""
+        return (tuple(self._index_values(record, field) for field in self.INDEXED_FIELDS[file_type]),
+                self._order_key(file_type, record))
+    
+    def _build_indexes(self, file_type, data):
+        """Construye el índice primario por id y los secundarios de la colección"""
+        self._indexes[file_type] = {'id': {}}
+        for field in self.INDEXED_FIELDS[file_type]:
+            self._indexes[file_type][field] = {}
+        self._index_keys[file_type] = {}
+        
+        for record in data:
+            self._index_record(file_type, record, ordered=False)
+        
+        if file_type in self.INDEX_ORDER:
+            # Un solo ordenamiento por lista (casi siempre ya vienen en orden de fecha)
+            order_key = partial(self._order_key, file_type)
+            for field in self.INDEXED_FIELDS[file_type]:
+                for bucket in self._indexes[file_type][field].values():
+                    bucket.sort(key=order_key)
+    
+    def _index_record(self, file_type, record, ordered=True):
+        """Agrega un registro a los índices, en su lugar según INDEX_ORDER"""
+        indexes = self._indexes[file_type]
+        keys = self._record_keys(file_type, record)
+        record_id = record.get('id')
+        if record_id is not None:
+            indexes['id'][record_id] = record
+            self._index_keys[file_type][record_id] = keys
+        values_by_field, order = keys
+        for field, values in zip(self.INDEXED_FIELDS[file_type], values_by_field):
+            for value in values:
+                bucket = indexes[field].setdefault(value, [])
+                if order is None or not ordered or not bucket or self._order_key(file_type, bucket[-1]) <= order:
+                    bucket.append(record)  # lo habitual: la venta nueva es la más reciente
+                else:
+                    insort(bucket, record, key=partial(self._order_key, file_type))
+    
+    def _unindex_record(self, file_type, record):
+        """Quita un registro de los índices, con los valores con que se indexó"""
+        indexes = self._indexes[file_type]
+        record_id = record.get('id')
+        if indexes['id'].get(record_id) is record:
+            del indexes['id'][record_id]
+            keys = self._index_keys[file_type].pop(record_id)
+        else:
+            keys = self._record_keys(file_type, record)
+        for field, values in zip(self.INDEXED_FIELDS[file_type], keys[0]):
+            for value in values:
+                bucket = [r for r in indexes[field].get(value, []) if r is not record]
+                if bucket:
+                    indexes[field][value] = bucket
+                else:
+                    indexes[field].pop(value, None)
+    
+    def _reindex_record(self, file_type, record):
+        """Actualiza los índices de un registro nuevo o modificado (también en su lugar)"""
+        record_id = record.get('id')
+        current = self._indexes[file_type]['id'].get(record_id)
+        if current is record:
+            if self._index_keys[file_type].get(record_id) == self._record_keys(file_type, record):
+                return  # Los campos indexados y el orden no cambiaron
+        if current is not None:
+            self._unindex_record(file_type, current)
+        self._index_record(file_type, record)
+    
+    def cached_signature(self, file_type):
+        """Firma del almacenamiento a la que corresponden los datos en caché"""
+        return self._cache.get(file_type, (None,))[0]
+    
+    def get_by_id(self, file_type, record_id):
+        """Obtiene un registro por su id en O(1)"""
+        self.load_data(file_type)
+        return self._indexes.get(file_type, {}).get('id', {}).get(record_id)
+    
+    def find_by(self, file_type, field, value):
+        """Obtiene los registros cuyo campo indexado tiene el valor dado"""
+        self.load_data(file_type)
+        return list(self._indexes.get(file_type, {}).get(field, {}).get(value, []))
+    
+    def iter_by(self, file_type, field, value, start=None):
+        """Recorre en el orden de INDEX_ORDER los registros del índice desde la clave 'start'
+        (incluida), buscándola con bisect: cada página cuesta lo que devuelve"""
+        self.load_data(file_type)
+        bucket = self._indexes.get(file_type, {}).get(field, {}).get(value, [])
+        first = 0
+        if start is not None:
+            first = bisect_left(bucket, start, key=partial(self._order_key, file_type))
+        return (bucket[i] for i in range(first, len(bucket)))
+    
+    def _append_sales_journal(self, entry):
+        """Registra una operación de ventas en el almacenamiento y la aplica a la caché"""
+        sales = self.load_data('sales')
+        cached_signature = self._cache.get('sales', (None,))[0]
+        
+        try:
+            before, after = self.storage.append_sales_entry(entry)
+        except Exception as e:
+            print(f"Error guardando sales: {e}")
+            return False
+        self.last_sales_signatures = (before, after)
+        
+        if before == cached_signature:
+            self._apply_indexed_sales_entry(sales, entry)
+            self._cache['sales'] = (after, sales)
+        else:
+            self._cache.pop('sales', None)
+        
+        if self.storage.needs_compaction():
+            self.compact_sales()
+        return True
+    
+    def _apply_indexed_sales_entry(self, sales, entry):
+        """Aplica una operación del journal a la caché manteniendo los índices"""
+        if entry['op'] == 'add':
+            sales.append(entry['sale'])
+            self._index_record('sales', entry['sale'])
+            return
+        
+        sale = self._indexes['sales']['id'].get(entry['id'])
+        if sale is None:
+            return
+        if entry['op'] == 'update':
+            sale.update(entry['fields'])
+            self._reindex_record('sales', sale)
+        elif entry['op'] == 'delete':
+            self._unindex_record('sales', sale)
+            del sales[self._position(sales, sale)]
+    
+    def decrement_stock(self, quantities):
+        """Descuenta el stock {product_id: cantidad} solo si alcanza para todas las líneas"""
+        products = self.load_data('products')
+        cached_signature = self._cache.get('products', (None,))[0]
+        
+        try:
+            before, after = self.storage.decrement_stock(quantities, self._cache.get('products'))
+        except StockError:
+            self._cache.pop('products', None)
+            return False
+        except Exception as e:
+            print(f"Error guardando products: {e}")
+            self._cache.pop('products', None)
+            return False
+        
+        if before == cached_signature:
+            for product_id, quantity in quantities.items():
+                self._indexes['products']['id'][product_id]['stock'] -= quantity
+            self._cache['products'] = (after, products)
+        else:
+            self._cache.pop('products', None)
+        return True
+    
+    def commit_checkout(self, quantities, sale):
+        """Descuenta el stock {product_id: cantidad} y registra la venta de forma atómica.
+        
+        Devuelve (éxito, product_id sin stock suficiente o None)."""
+        products = self.load_data('products')
+        sales = self.load_data('sales')
+        products_signature = self._cache.get('products', (None,))[0]
+        sales_signature = self._cache.get('sales', (None,))[0]
+        
+        try:
+            signatures = self.storage.commit_checkout(quantities, sale, self._cache.get('products'))
+        except StockError as e:
+            # El stock en caché estaba desactualizado respecto del almacenamiento
+            self._cache.pop('products', None)
+            return False, e.product_id
+        except Exception as e:
+            print(f"Error procesando compra: {e}")
+            self._cache.pop('products', None)
+            return False, None
+        
+        before, after = signatures['products']
+        if before == products_signature:
+            for product_id, quantity in quantities.items():
+                self._indexes['products']['id'][product_id]['stock'] -= quantity
+            self._cache['products'] = (after, products)
+        else:
+            self._cache.pop('products', None)
+        
+        before, after = signatures['sales']
+        self.last_sales_signatures = (before, after)
+        if before == sales_signature:
+            self._apply_indexed_sales_entry(sales, {'op': 'add', 'sale': sale})
+            self._cache['sales'] = (after, sales)
+        else:
+            self._cache.pop('sales', None)
+        
+        if self.storage.needs_compaction():
+            self.compact_sales()
+        return True, None
+    
+    def append_sale(self, sale):
+        """Registra una venta nueva sin reescribir el historial"""
+        return self._append_sales_journal({'op': 'add', 'sale': sale})
+    
+    def update_sale_record(self, sale_id, fields):
+        """Registra cambios de campos de una venta"""
+        return self._append_sales_journal({'op': 'update', 'id': sale_id, 'fields': fields})
+    
+    def delete_sale_record(self, sale_id):
+        """Registra la eliminación de una venta"""
+        return self._append_sales_journal({'op': 'delete', 'id': sale_id})
+    
+    def compact_sales(self):
+        """Consolida las ventas en un snapshot completo (en JSON vacía el journal)"""
+        try:
+            result = self.storage.compact_sales()
+        except Exception as e:
+            print(f"Error guardando sales: {e}")
+            return False
+        
+        if result is not None:
+            sales, (before, after) = result
+            self._set_cache('sales', after, sales)
+            # Consolidar no cambia las ventas: la última escritura de esta instancia
+            # sigue vigente con la firma nueva (así los agregados no se reconstruyen)
+            if self.last_sales_signatures is not None and self.last_sales_signatures[1] == before:
+                self.last_sales_signatures = (self.last_sales_signatures[0], after)
+        return True
+
+class Validator:
+    """Clase para validaciones"""
+
+    @staticmethod
+    def validate_rut(rut):
+        """Valida el formato y dígito verificador del RUT chileno"""
+        rut = rut.replace(".", "").replace("-", "").upper()
+        if len(rut) < 2:
+            return False
+        cuerpo = rut[:-1]
+        dv = rut[-1]
+
+        try:
+            cuerpo_int = list(map(int, reversed(cuerpo)))
+        except ValueError:
+            return False
+
+        suma = 0
+        multiplicador = 2
+        for d in cuerpo_int:
+            suma += d * multiplicador
+            multiplicador = 2 if multiplicador == 7 else multiplicador + 1
+
+        resto = suma % 11
+        dv_calculado = 11 - resto
+        if dv_calculado == 11:
+            dv_calculado = "0"
+        elif dv_calculado == 10:
+            dv_calculado = "K"
+        else:
+            dv_calculado = str(dv_calculado)
+
+        return dv == dv_calculado
+
+    @staticmethod
+    def validate_email(email):
+        """Valida formato de email"""
+        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+        return re.match(pattern, email) is not None
+
+    @staticmethod
+    def hash_password(password):
+        """Hashea contraseña con PBKDF2-SHA256 y sal aleatoria"""
+        return password_hasher.hash(password)
+
+
+class PasswordHasher:
+    """Hash de contraseñas con PBKDF2-SHA256 salado y costo configurable.
+    
+    Formato: 'pbkdf2_sha256$iteraciones$sal$hash' (hex). Los hashes SHA-256 sin
+    sal de versiones anteriores se aceptan y se marcan para rehashear. El cálculo
+    corre en un pool de pocos hilos (hashlib libera el GIL), lo que acota el uso
+    de CPU cuando llegan muchos logins a la vez."""
+    
+    ALGORITHM = 'pbkdf2_sha256'
+    ITERATIONS = 600_000
+    SALT_BYTES = 16
+    MAX_WORKERS = 2
+    
+    def __init__(self, iterations=ITERATIONS, max_workers=MAX_WORKERS):
+        self.iterations = iterations
+        self.max_workers = max_workers
+        self._executor = None
+        # Hash sin contraseña válida: mismo costo de verificación para emails inexistentes
+        self._dummy = f"{self.ALGORITHM}${iterations}${'00' * self.SALT_BYTES}${'00' * 32}"
+    
+    def _derive(self, password, salt, iterations):
+        return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    
+    def hash(self, password):
+        """Devuelve el hash almacenable de la contraseña"""
+        salt = os.urandom(self.SALT_BYTES)
+        digest = self._derive(password, salt, self.iterations)
+        return f"{self.ALGORITHM}${self.iterations}${salt.hex()}${digest.hex()}"
+    
+    def verify(self, password, stored):
+        """Compara la contraseña con el hash guardado; devuelve (válida, requiere rehash)"""
+        stored = stored or self._dummy
+        parts = stored.split('$')
+        if len(parts) == 4 and parts[0] == self.ALGORITHM:
+            try:
+                iterations = int(parts[1])
+                salt = bytes.fromhex(parts[2])
+                expected = bytes.fromhex(parts[3])
+            except ValueError:
+                return False, False
+            digest = self._derive(password, salt, iterations)
+            valid = hmac.compare_digest(digest, expected)
+            return valid, valid and iterations < self.iterations
+        
+        # Formato anterior: SHA-256 hexadecimal sin sal
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        valid = hmac.compare_digest(legacy, stored)
+        return valid, valid
+    
+    def submit(self, fn, *args):
+        """Ejecuta fn(*args) en el pool de hashing y devuelve el Future"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix="passwords")
+        return self._executor.submit(fn, *args)
+    
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Instancia compartida para los hashes sueltos (Validator.hash_password)
+password_hasher = PasswordHasher()
+
+
+class AuthManager:
+    """Gestor de autenticación"""
+    
+    def __init__(self, data_manager, hasher=None):
+        self.data_manager = data_manager
+        self.hasher = hasher or PasswordHasher()
+        self.current_user = None
+    
+    def validate_registration(self, rut, email, password):
+        """Valida los datos de registro antes de hashear la contraseña"""
+        if not Validator.validate_rut(rut):
+            return False, "RUT inválido"
+        
+        if not Validator.validate_email(email):
+            return False, "Email inválido"
+        
+        if len(password) < 6:
+            return False, "Contraseña debe tener al menos 6 caracteres"
+        
+        # Verificar si el usuario ya existe
+        if self._user_exists(rut, email):
+            return False, "Usuario ya existe"
+        
+        return True, ""
+    
+    def _user_exists(self, rut, email):
+        return bool(self.data_manager.find_by('users', 'rut', rut)
+                    or self.data_manager.find_by('users', 'email', email))
+    
+    def begin_register(self, password):
+        """Hashea la contraseña en el pool; el Future entrega el hash para create_user"""
+        return self.hasher.submit(self.hasher.hash, password)
+    
+    def create_user(self, rut, email, password_hash, user_type, name):
+        """Guarda el usuario con la contraseña ya hasheada"""
+        # Puede haberse registrado otro mientras se hasheaba
+        if self._user_exists(rut, email):
+            return False, "Usuario ya existe"
+        
+        users = self.data_manager.load_data('users')
+        
+        # Crear nuevo usuario
+        new_user = {
+            'id': str(uuid.uuid4()),
+            'rut': rut,
+            'email': email,
+            'password': password_hash,
+            'type': user_type,
+            'name': name,
+            'created_at': datetime.now().isoformat()
+        }
+        
+        users.append(new_user)
+        
+        if self.data_manager.save_records('users', [new_user]):
+            return True, "Usuario registrado exitosamente"
+        else:
+            return False, "Error al guardar usuario"
+    
+    def register_user(self, rut, email, password, user_type, name):
+        """Registra nuevo usuario"""
+        valid, message = self.validate_registration(rut, email, password)
+        if not valid:
+            return False, message
+        return self.create_user(rut, email, self.hasher.hash(password), user_type, name)
+    
+    def _login_candidates(self, email):
+        """Cuentas con ese email (admin primero), vía índice por email"""
+        return ([('admin', admin) for admin in self.data_manager.find_by('admin', 'email', email)]
+                + [('users', user) for user in self.data_manager.find_by('users', 'email', email)])
+    
+    def _check_password(self, candidates, password):
+        """Verifica la contraseña (solo CPU, apto para el pool); devuelve la coincidencia o None"""
+        if not candidates:
+            self.hasher.verify(password, None)
+            return None
+        for file_type, record in candidates:
+            valid, needs_rehash = self.hasher.verify(password, record.get('password'))
+            if valid:
+                return file_type, record, self.hasher.hash(password) if needs_rehash else None
+        if not any(str(record.get('password', '')).startswith(PasswordHasher.ALGORITHM)
+                   for _, record in candidates):
+            self.hasher.verify(password, None)  # Solo hashes antiguos: igualar el costo
+        return None
+    
+    def begin_login(self, email, password):
+        """Inicia el login verificando la contraseña en el pool; el Future se pasa a finish_login"""
+        return self.hasher.submit(self._check_password, self._login_candidates(email), password)
+    
+    def finish_login(self, match):
+        """Completa el login en el hilo principal, rehasheando contraseñas con formato antiguo"""
+        if match is None:
+            return False, "Email o contraseña incorrectos"
+        
+        file_type, record, new_hash = match
+        if new_hash is not None:
+            record['password'] = new_hash
+            record['updated_at'] = datetime.now().isoformat()
+            self.data_manager.save_records(file_type, [record])
+        
+        self.current_user = record
+        return True, "Login exitoso"
+    
+    def login_user(self, email, password):
+        """Autentica usuario"""
+        return self.finish_login(self._check_password(self._login_candidates(email), password))
+    
+    def logout_user(self):
+        """Cierra sesión"""
+        self.current_user = None
+
+class ProductManager:
+    """Gestor de productos.
+    
+    Cada alta, edición o baja exitosa avisa a los suscriptores con
+    listener(evento, producto), evento 'added', 'updated' o 'deleted', para
+    que las vistas actualicen solo el producto afectado."""
+    
+    def __init__(self, data_manager):
+        self.data_manager = data_manager
+        self._listeners = []
+    
+    def subscribe(self, listener):
+        """Registra listener(evento, producto) para los cambios de productos"""
+        self._listeners.append(listener)
+    
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+    
+    def _emit(self, event, product):
+        for listener in list(self._listeners):
+            listener(event, product)
+    
+    def add_product(self, name, description, price, stock, category, image_path, supplier_id):
+        """Agrega nuevo producto"""
+        if price < 0 or stock < 0:
+            return False, "Precio y stock no pueden ser negativos"
+        
+        products = self.data_manager.load_data('products')
+        
+        new_product = {
+            'id': str(uuid.uuid4()),
+            'name': name,
+            'description': description,
+            'price': float(price),
+            'stock': int(stock),
+            'category': category,
+            'image_path': image_path,
+            'supplier_id': supplier_id,
+            'created_at': datetime.now().isoformat()
+        }
+        
+        products.append(new_product)
+        
+        if self.data_manager.save_records('products', [new_product]):
+            # El registro de la caché, no el dict: es el que devuelven get_by_id y find_by
+            self._emit('added', self.data_manager.get_by_id('products', new_product['id']) or new_product)
+            return True, "Producto agregado exitosamente"
+        else:
+            return False, "Error al guardar producto"
+    
+    def update_product(self, product_id, name, description, price, stock, category, image_path):
+        """Actualiza producto existente"""
+        if price < 0 or stock < 0:
+            return False, "Precio y stock no pueden ser negativos"
+        
+        product = self.data_manager.get_by_id('products', product_id)
+        if product is None:
+            return False, "Producto no encontrado"
+        
+        product['name'] = name
+        product['description'] = description
+        product['price'] = float(price)
+        product['stock'] = int(stock)
+        product['category'] = category
+        if image_path:
+            product['image_path'] = image_path
+        product['updated_at'] = datetime.now().isoformat()
+        
+        if self.data_manager.save_records('products', [product]):
+            self._emit('updated', product)
+            return True, "Producto actualizado exitosamente"
+        else:
+            return False, "Error al guardar producto"
+    
+    def delete_product(self, product_id):
+        """Elimina producto"""
+        product = self.data_manager.get_by_id('products', product_id)
+        if product is None:
+            return False, "Producto no encontrado"
+        
+        # Eliminar imagen si existe
+        if product.get('image_path') and os.path.exists(product['image_path']):
+            try:
+                os.remove(product['image_path'])
+            except:
+                pass
+        
+        if self.data_manager.delete_records('products', [product]):
+            self._emit('deleted', product)
+            return True, "Producto eliminado exitosamente"
+        else:
+            return False, "Error al eliminar producto"
+    
+    def get_products_by_supplier(self, supplier_id):
+        """Obtiene productos de un proveedor"""
+        return self.data_manager.find_by('products', 'supplier_id', supplier_id)
+    
+    def get_all_products(self):
+        """Obtiene todos los productos"""
+        return self.data_manager.load_data('products')
+    
+    def update_stock(self, product_id, quantity):
+        """Actualiza stock de producto"""
+        product = self.data_manager.get_by_id('products', product_id)
+        
+        if product is None or product['stock'] < quantity:
+            return False
+        
+        # La validación definitiva ocurre en el almacenamiento (otros procesos pueden vender)
+        return self.data_manager.decrement_stock({product_id: quantity})
+
+class SalesAggregates:
+    """Totales de ventas pre-agregados por proveedor y por producto.
+    
+    Cada proveedor lleva unidades, ingresos y líneas vendidas, también por día y por
+    mes. Se actualizan de forma incremental con cada venta: el cambio se agrega como
+    una línea a un log y el archivo base se reescribe solo cada LOG_FLUSH_ENTRIES
+    entradas. El archivo guarda la firma de ventas que refleja y, si no coincide con
+    la del almacenamiento (por ejemplo, otra instancia cayó antes de actualizarlos),
+    se reconstruyen desde las ventas."""
+    
+    # Entradas del log antes de consolidarlas en el archivo base
+    LOG_FLUSH_ENTRIES = 500
+    
+    def __init__(self, data_manager):
+        self.data_manager = data_manager
+        self.path = os.path.join(data_manager.data_dir, "sales_aggregates.json")
+        self.log_path = os.path.join(data_manager.data_dir, "sales_aggregates.log")
+        # [(mtime, tamaño) del archivo base, bytes del log aplicados, entradas del log, datos]
+        self._loaded = None
+    
+    @staticmethod
+    def _normalize(signature):
+        """Firma comparable con la guardada en JSON (las tuplas se vuelven listas)"""
+        return json.loads(json.dumps(signature))
+    
+    @staticmethod
+    def _totals():
+        return {'units': 0, 'revenue': 0, 'lines': 0}
+    
+    def _lock(self):
+        return FileLock(self.path + ".lock")
+    
+    def _read(self):
+        """Archivo base más el log; en memoria solo se aplican las entradas nuevas del log"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        file_signature = (stat.st_mtime_ns, stat.st_size)
+        if self._loaded is None or self._loaded[0] != file_signature:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                return None
+            self._loaded = [file_signature, 0, 0, data]
+        
+        try:
+            log_size = os.path.getsize(self.log_path)
+        except OSError:
+            log_size = 0
+        if log_size < self._loaded[1]:
+            # El log se vació sin que cambiara el archivo base: releer todo
+            self._loaded = None
+            return self._read()
+        if log_size > self._loaded[1]:
+            self._replay_log()
+        return self._loaded[3]
+    
+    def _replay_log(self):
+        """Aplica las entradas del log agregadas desde la última lectura"""
+        state = self._loaded
+        data = state[3]
+        with open(self.log_path, 'rb') as f:
+            f.seek(state[1])
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Línea incompleta: se descarta en la próxima escritura
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if entry['before'] == data['signature']:
+                    self._apply_lines(data, entry['lines'], entry['sign'])
+                    data['signature'] = entry['after']
+                state[1] += len(line)
+                state[2] += 1
+    
+    def _write(self, data):
+        """Guarda los agregados completos y vacía el log (el llamador tiene el bloqueo)"""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        open(self.log_path, 'w').close()
+        stat = os.stat(self.path)
+        self._loaded = [(stat.st_mtime_ns, stat.st_size), 0, 0, data]
+    
+    def _append_log(self, entry):
+        """Agrega una entrada al log (el llamador tiene el bloqueo y acaba de leerlo)"""
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode('utf-8')
+        with open(self.log_path, 'ab') as f:
+            if f.tell() != self._loaded[1]:
+                f.truncate(self._loaded[1])  # Cola incompleta de una escritura interrumpida
+            f.write(line)
+        self._loaded[1] += len(line)
+        self._loaded[2] += 1
+    
+    def _lines(self, data, sale):
+        """Líneas de una venta como [producto, proveedor, día, mes, unidades, ingresos]"""
+        day = sale['date'][:10]
+        month = sale['date'][:7]
+        lines = []
+        for item in sale['items']:
+            product_id = item['product_id']
+            product_totals = data['products'].get(product_id)
+            if product_totals is not None:
+                supplier_id = product_totals['supplier_id']
+            else:
+                product = self.data_manager.get_by_id('products', product_id)
+                if product is None:
+                    continue  # Producto eliminado: fuera del reporte, como en el detalle
+                supplier_id = product['supplier_id']
+            lines.append([product_id, supplier_id, day, month, item['quantity'], item['subtotal']])
+        return lines
+    
+    def _apply_lines(self, data, lines, sign):
+        """Suma (sign=1) o resta (sign=-1) líneas de venta"""
+        for product_id, supplier_id, day, month, units, revenue in lines:
+            product_totals = data['products'].get(product_id)
+            if product_totals is None:
+                product_totals = data['products'][product_id] = dict(
+                    self._totals(), supplier_id=supplier_id)
+            
+            supplier = data['suppliers'].setdefault(
+                supplier_id, dict(self._totals(), daily={}, monthly={}))
+            buckets = (product_totals, supplier,
+                       supplier['daily'].setdefault(day, self._totals()),
+                       supplier['monthly'].setdefault(month, self._totals()))
+            for totals in buckets:
+                totals['units'] += sign * units
+                totals['revenue'] += sign * revenue
+                totals['lines'] += sign
+    
+    def _rebuild(self):
+        """Recalcula todo desde las ventas (primero los datos, luego su firma)"""
+        sales = self.data_manager.load_data('sales')
+        data = {
+            'signature': self._normalize(self.data_manager.cached_signature('sales')),
+            'suppliers': {},
+            'products': {}
+        }
+        for sale in sales:
+            self._apply_lines(data, self._lines(data, sale), 1)
+        return data
+    
+    def _current(self):
+        """Agregados al día con las ventas del almacenamiento"""
+        signature = self._normalize(self.data_manager.storage.signature('sales'))
+        data = self._read()
+        if data is not None and data['signature'] == signature:
+            return data
+        
+        with self._lock():
+            data = self._read()
+            if data is None or data['signature'] != signature:
+                data = self._rebuild()
+                self._write(data)
+        return data
+    
+    def record(self, sale, signatures, sign=1):
+        """Aplica una venta escrita con las firmas (antes, después); sale=None si no cambian los totales"""
+        if signatures is None:
+            return
+        before, after = signatures
+        with self._lock():
+            data = self._read()
+            if data is None or data['signature'] != self._normalize(before):
+                # Faltan escrituras de ventas en los agregados: reconstruir
+                self._write(self._rebuild())
+                return
+            lines = self._lines(data, sale) if sale is not None else []
+            entry = {'before': data['signature'], 'after': self._normalize(after),
+                     'sign': sign, 'lines': lines}
+            self._apply_lines(data, lines, sign)
+            data['signature'] = entry['after']
+            if self._loaded[2] + 1 >= self.LOG_FLUSH_ENTRIES:
+                self._write(data)
+            else:
+                self._append_log(entry)
+    
+    def supplier_totals(self, supplier_id):
+        """Totales del proveedor, con buckets 'daily' (AAAA-MM-DD) y 'monthly' (AAAA-MM)"""
+        totals = self._current()['suppliers'].get(supplier_id)
+        return totals if totals is not None else dict(self._totals(), daily={}, monthly={})
+    
+    def product_totals(self, product_id):
+        """Totales de un producto"""
+        totals = self._current()['products'].get(product_id)
+        return totals if totals is not None else self._totals()
+
+
+class SalesManager:
+    """Gestor de ventas"""
+    
+    # Registros por página en las consultas paginadas
+    PAGE_SIZE = 50
+    
+    def __init__(self, data_manager):
+        self.data_manager = data_manager
+        self.aggregates = SalesAggregates(data_manager)
+
+    
+    def _build_sale(self, customer_id, products_cart):
+        """Arma el registro de venta a partir de las líneas del carrito"""
+        total_amount = 0
+        sale_items = []
+        
+        for item in products_cart:
+            product_id = item['product_id']
+            quantity = item['quantity']
+            price = item['price']
+            
+            total_amount += price * quantity
+            sale_items.append({
+                'product_id': product_id,
+                'quantity': quantity,
+                'price': price,
+                'subtotal': price * quantity
+            })
+        
+        return {
+            'id': str(uuid.uuid4()),
+            'customer_id': customer_id,
+            'items': sale_items,
+            'total_amount': total_amount,
+            'date': datetime.now().isoformat()
+        }
+    
+    def make_purchase(self, customer_id, products_cart):
+        """Realiza una compra"""
+        new_sale = self._build_sale(customer_id, products_cart)
+        
+        if self.data_manager.append_sale(new_sale):
+            self.aggregates.record(new_sale, self.data_manager.last_sales_signatures)
+            return True, "Compra realizada exitosamente"
+        else:
+            return False, "Error al procesar compra"
+    
+    def checkout(self, customer_id, products_cart, reservations=None):
+        """Valida el carrito, descuenta stock y registra la venta en una sola operación.
+        
+        Con reservas, bloquea solo los productos del carrito mientras confirma y
+        descuenta del disponible lo que otros carritos tienen reservado."""
+        requested = {}
+        names = {}
+        for item in products_cart:
+            requested[item['product_id']] = requested.get(item['product_id'], 0) + item['quantity']
+            names[item['product_id']] = item['name']
+        
+        if reservations is None:
+            return self._commit_checkout(customer_id, products_cart, requested, names, None)
+        
+        with reservations.locked(requested):
+            result = self._commit_checkout(customer_id, products_cart, requested, names, reservations)
+            if result[0]:
+                reservations.release_locked(requested)
+        return result
+    
+    def _commit_checkout(self, customer_id, products_cart, requested, names, reservations):
+        """Valida todas las líneas y confirma la compra"""
+        for product_id, quantity in requested.items():
+            product = self.data_manager.get_by_id('products', product_id)
+            if product is None:
+                return False, f"No hay suficiente stock para {names[product_id]}"
+            
+            available = product['stock']
+            if reservations is not None:
+                available -= reservations.reserved_by_others(product_id)
+            if available < quantity:
+                return False, f"No hay suficiente stock para {names[product_id]}"
+        
+        new_sale = self._build_sale(customer_id, products_cart)
+        
+        success, failed_product = self.data_manager.commit_checkout(requested, new_sale)
+        if success:
+            self.aggregates.record(new_sale, self.data_manager.last_sales_signatures)
+            return True, "Compra realizada exitosamente"
+        if failed_product is not None:
+            return False, f"No hay suficiente stock para {names.get(failed_product, failed_product)}"
+        return False, "Error al procesar compra"
+    
+    @staticmethod
+    def _encode_cursor(key):
+        return "|".join(str(part) for part in key)
+    
+    @staticmethod
+    def _decode_cursor(cursor):
+        """'fecha|id' o 'fecha|id|línea' -> clave de orden"""
+        parts = cursor.split("|")
+        if len(parts) == 3:
+            return (parts[0], parts[1], int(parts[2]))
+        return tuple(parts)
+    
+    def _page(self, keyed_rows, after, limit):
+        """Filas (ya ordenadas) posteriores a la clave 'after' y el cursor de la página siguiente
+        (None si no hay más); solo se recorren las filas de la página"""
+        if after is not None:
+            keyed_rows = (pair for pair in keyed_rows if pair[0] > after)
+        if limit is None:
+            return [row for _, row in keyed_rows], None
+        page = list(islice(keyed_rows, limit + 1))
+        next_cursor = self._encode_cursor(page[limit - 1][0]) if len(page) > limit else None
+        return [row for _, row in page[:limit]], next_cursor
+    
+    def get_customer_purchases_page(self, customer_id, cursor=None, limit=PAGE_SIZE):
+        """Página de compras del cliente ordenadas por fecha: (compras, cursor siguiente)"""
+        after = None if cursor is None else self._decode_cursor(cursor)
+        sales = self.data_manager.iter_by('sales', 'customer_id', customer_id, after)
+        return self._page((((sale['date'], sale['id']), sale) for sale in sales), after, limit)
+    
+    def get_customer_purchases(self, customer_id, cursor=None, limit=None):
+        """Obtiene compras de un cliente (desde el cursor, hasta 'limit' si se indica)"""
+        return self.get_customer_purchases_page(customer_id, cursor, limit)[0]
+    
+    def get_supplier_summary(self, supplier_id):
+        """Totales de ventas del proveedor (unidades, ingresos, líneas y buckets) sin recorrer las ventas"""
+        return self.aggregates.supplier_totals(supplier_id)
+    
+    def _product_lines(self, product, start):
+        """Líneas de venta del producto con su clave de orden, desde la venta 'start' (incluida)"""
+        for sale in self.data_manager.iter_by('sales', 'items.product_id', product['id'], start):
+            for line, item in enumerate(sale['items']):
+                if item['product_id'] == product['id']:
+                    yield (sale['date'], sale['id'], line), {
+                        'sale_id': sale['id'],
+                        'product_name': product['name'],
+                        'quantity': item['quantity'],
+                        'price': item['price'],
+                        'subtotal': item['subtotal'],
+                        'date': sale['date']
+                    }
+    
+    def get_supplier_sales_page(self, supplier_id, cursor=None, limit=PAGE_SIZE):
+        """Página del detalle de ventas del proveedor: (líneas, cursor siguiente)"""
+        after = None if cursor is None else self._decode_cursor(cursor)
+        start = None if after is None else after[:2]
+        # Cada producto ya recorre sus ventas en orden: basta mezclarlos
+        lines = merge(*(self._product_lines(product, start)
+                        for product in self.data_manager.find_by('products', 'supplier_id', supplier_id)),
+                      key=itemgetter(0))
+        return self._page(lines, after, limit)
+    
+    def get_supplier_sales(self, supplier_id, cursor=None, limit=None):
+        """Obtiene ventas de productos de un proveedor (desde el cursor, hasta 'limit' si se indica)"""
+        return self.get_supplier_sales_page(supplier_id, cursor, limit)[0]
+    
+    def update_sale(self, sale_id, new_status=None, tracking_number=None):
+        """Actualiza el estado de pago o número de seguimiento de una venta"""
+        if self.data_manager.get_by_id('sales', sale_id) is None:
+            return False, "Venta no encontrada"
+    
+        fields = {'updated_at': datetime.now().isoformat()}
+        if new_status is not None:
+            fields['payment_status'] = new_status
+        if tracking_number is not None:
+            fields['tracking_number'] = tracking_number
+        saved = self.data_manager.update_sale_record(sale_id, fields)
+        if saved:
+            self.aggregates.record(None, self.data_manager.last_sales_signatures)
+        return saved, "Venta actualizada exitosamente" if saved else "Error al guardar cambios"
+
+    def delete_sale(self, sale_id):
+        """Elimina una venta"""
+        sale = self.data_manager.get_by_id('sales', sale_id)
+        if sale is None:
+            return False, "Venta no encontrada"
+    
+        saved = self.data_manager.delete_sale_record(sale_id)
+        if saved:
+            self.aggregates.record(sale, self.data_manager.last_sales_signatures, sign=-1)
+        return saved, "Venta eliminada exitosamente" if saved else "Error al eliminar venta"
+
+    
+class SupplierManager:
+    """Gestor de proveedores"""
+    
+    def __init__(self, data_manager):
+        self.data_manager = data_manager
+    
+    def get_all_suppliers(self):
+        """Obtiene todos los proveedores"""
+        return self.data_manager.find_by('users', 'type', 'proveedor')
+    
+    def delete_supplier(self, supplier_id):
+        """Elimina un proveedor"""
+        user = self.data_manager.get_by_id('users', supplier_id)
+        if user is None or user['type'] != 'proveedor':
+            return False, "Proveedor no encontrado"
+        
+        if self.data_manager.delete_records('users', [user]):
+            return True, "Proveedor eliminado exitosamente"
+        else:
+            return False, "Error al eliminar proveedor"
+    
+    def update_supplier_info(self, supplier_id, store_name, store_description, contact_phone):
+        """Actualiza información de tienda del proveedor"""
+        user = self.data_manager.get_by_id('users', supplier_id)
+        if user is None or user['type'] != 'proveedor':
+            return False, "Proveedor no encontrado"
+        
+        user['store_name'] = store_name
+        user['store_description'] = store_description
+        user['contact_phone'] = contact_phone
+        user['updated_at'] = datetime.now().isoformat()
+        
+        if self.data_manager.save_records('users', [user]):
+            return True, "Información actualizada exitosamente"
+        else:
+            return False, "Error al actualizar información"
+
+class StockReservationManager:
+    """Reservas de stock por producto con vencimiento, compartidas entre instancias.
+    
+    Cada producto tiene su propio archivo de reservas y su propio bloqueo, de modo
+    que carritos de productos distintos nunca compiten por el mismo lock."""
+    
+    DEFAULT_TTL = 15 * 60  # segundos
+    
+    def __init__(self, data_manager, owner_id=None, ttl=DEFAULT_TTL):
+        self.data_manager = data_manager
+        self.owner_id = owner_id or str(uuid.uuid4())
+        self.ttl = ttl
+        self.reservations_dir = os.path.join(data_manager.data_dir, "reservations")
+        self._held = set()
+        
+        os.makedirs(self.reservations_dir, exist_ok=True)
+    
+    def _path(self, product_id):
+        return os.path.join(self.reservations_dir, f"{product_id}.json")
+    
+    def _lock(self, product_id):
+        return FileLock(os.path.join(self.reservations_dir, f"{product_id}.lock"))
+    
+    def _read(self, product_id):
+        """Reservas vigentes del producto: owner_id -> {'quantity', 'expires_at'}"""
+        try:
+            with open(self._path(product_id), 'r', encoding='utf-8') as f:
+                reservations = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        now = time.time()
+        return {owner: r for owner, r in reservations.items() if r['expires_at'] > now}
+    
+    def _write(self, product_id, reservations):
+        """Guarda las reservas del producto (el llamador tiene el bloqueo)"""
+        path = self._path(product_id)
+        if not reservations:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(reservations, f)
+        os.replace(tmp_path, path)
+    
+    def reserved_by_others(self, product_id):
+        """Unidades del producto reservadas por otros carritos"""
+        return sum(r['quantity'] for owner, r in self._read(product_id).items()
+                   if owner != self.owner_id)
+    
+    def available(self, product_id):
+        """Stock que este carrito todavía puede tomar"""
+        product = self.data_manager.get_by_id('products', product_id)
+        if product is None:
+            return 0
+        return product['stock'] - self.reserved_by_others(product_id)
+    
+    def reserve(self, product_id, quantity):
+        """Fija la reserva de este carrito para el producto en 'quantity' unidades"""
+        with self._lock(product_id):
+            reservations = self._read(product_id)
+            product = self.data_manager.get_by_id('products', product_id)
+            others = sum(r['quantity'] for owner, r in reservations.items()
+                         if owner != self.owner_id)
+            if product is None or product['stock'] - others < quantity:
+                return False
+            
+            reservations[self.owner_id] = {
+                'quantity': quantity,
+                'expires_at': time.time() + self.ttl
+            }
+            self._write(product_id, reservations)
+        self._held.add(product_id)
+        return True
+    
+    def release(self, product_id):
+        """Libera la reserva de este carrito para el producto"""
+        with self._lock(product_id):
+            self.release_locked([product_id])
+    
+    def release_all(self):
+        """Libera todas las reservas de este carrito (carrito abandonado o cierre)"""
+        for product_id in list(self._held):
+            self.release(product_id)
+    
+    def renew_all(self):
+        """Extiende el vencimiento de las reservas vigentes de este carrito"""
+        for product_id in list(self._held):
+            with self._lock(product_id):
+                reservations = self._read(product_id)
+                if self.owner_id in reservations:
+                    reservations[self.owner_id]['expires_at'] = time.time() + self.ttl
+                    self._write(product_id, reservations)
+                else:
+                    self._held.discard(product_id)
+    
+    @contextmanager
+    def locked(self, product_ids):
+        """Bloquea los productos indicados, siempre en el mismo orden para evitar deadlocks"""
+        locks = [self._lock(product_id) for product_id in sorted(product_ids)]
+        acquired = []
+        try:
+            for lock in locks:
+                lock.__enter__()
+                acquired.append(lock)
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.__exit__(None, None, None)
+    
+    def release_locked(self, product_ids):
+        """Libera reservas de este carrito; el llamador ya tiene los bloqueos"""
+        for product_id in product_ids:
+            reservations = self._read(product_id)
+            if reservations.pop(self.owner_id, None) is not None:
+                self._write(product_id, reservations)
+            self._held.discard(product_id)
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+PROYECTO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROYECTO_DIR)
+sys.path.insert(1, os.path.dirname(PROYECTO_DIR))  # shared/
+
+from services import DataManager, ProductManager
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Directorio de trabajo vacío: DataManager crea ahí su carpeta data/"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def seed(workdir):
+    """seed(backend, stocks): DataManager con un producto por stock (proveedores s1/s2
+    alternados); devuelve (manager, ids)"""
+    def seed(backend, stocks):
+        manager = DataManager(backend)
+        products = ProductManager(manager)
+        for i, stock in enumerate(stocks):
+            assert products.add_product(f"Producto {i}", "", 1000 + i, stock, "Otros", "",
+                                        f"s{i % 2 + 1}")[0]
+        return manager, [p['id'] for p in manager.load_data('products')]
+    return seed
+
+
+@pytest.fixture
+def cart_for():
+    """cart_for(manager, {product_id: cantidad}): líneas de carrito como las arma la interfaz"""
+    def cart_for(manager, quantities):
+        cart = []
+        for product_id, quantity in quantities.items():
+            product = manager.get_by_id('products', product_id)
+            cart.append({'product_id': product_id, 'name': product['name'],
+                         'price': product['price'], 'quantity': quantity})
+        return cart
+    return cart_for
@@ -0,0 +1,79 @@
+from array import array
+
+import pytest
+
+import analytics
+from analytics import SalesAnalytics, _top
+from services import DataManager
+
+np = pytest.importorskip('numpy')
+
+PRODUCTS = [
+    {'id': 'p1', 'name': 'Helado', 'price': 1000.0, 'stock': 10, 'category': 'Helados', 'supplier_id': 's1'},
+    {'id': 'p2', 'name': 'Paleta', 'price': 500.0, 'stock': 10, 'category': 'Paletas', 'supplier_id': 's2'},
+    {'id': 'p3', 'name': 'Torta', 'price': 7000.0, 'stock': 10, 'category': None, 'supplier_id': 's1'},
+    {'id': 'p4', 'name': 'Sin ventas', 'price': 10.0, 'stock': 10, 'category': 'Helados', 'supplier_id': 's3'},
+]
+
+
+def sale(sale_id, customer, day, *lines):
+    items = [{'product_id': pid, 'quantity': qty, 'price': price, 'subtotal': price * qty}
+             for pid, qty, price in lines]
+    return {'id': sale_id, 'customer_id': customer, 'date': f'{day}T12:30:00', 'items': items,
+            'total_amount': sum(item['subtotal'] for item in items)}
+
+
+# Fuera de orden, con un mes sin ventas (2024-02), días repetidos y un producto ya eliminado
+SALES = [
+    sale('v1', 'c1', '2024-03-05', ('p1', 2, 1000.0), ('p2', 1, 500.0)),
+    sale('v2', 'c2', '2024-01-31', ('p3', 1, 7000.0)),
+    sale('v3', 'c1', '2024-01-01', ('p2', 4, 500.0), ('borrado', 3, 250.0)),
+    sale('v4', 'c3', '2024-03-05', ('p1', 1, 900.0)),
+    sale('v5', 'c2', '2023-12-31', ('p1', 5, 1000.0), ('p3', 2, 7000.0)),
+]
+
+
+@pytest.fixture
+def manager(workdir):
+    manager = DataManager('json')
+    assert manager.save_data('products', [dict(p) for p in PRODUCTS])
+    assert manager.save_data('sales', [dict(s) for s in SALES])
+    return manager
+
+
+def reports(manager):
+    engine = SalesAnalytics(manager)
+    return {
+        'report': dict(engine.report(top=2, bucket='month'), engine=None),
+        'days': engine.revenue_by_period('day'),
+        'all_products': engine.top_products(n=50),
+    }
+
+
+def test_numpy_and_array_engines_agree(manager, monkeypatch):
+    with_numpy = reports(manager)
+    monkeypatch.setattr(analytics, 'np', None)
+    assert isinstance(SalesAnalytics(manager).columns().line_revenue, array)
+    without_numpy = reports(manager)
+    assert with_numpy == without_numpy
+
+    report = without_numpy['report']
+    assert report['lines'] == 8 and report['revenue'] == 32150.0
+    # Meses con ventas, en orden; el mes vacío no aparece
+    assert [(row['key'], row['revenue'], row['units']) for row in report['by_period']] == [
+        ('2023-12', 19000.0, 7), ('2024-01', 9750.0, 8), ('2024-03', 3400.0, 4)]
+    assert [row['key'] for row in without_numpy['days']] == [
+        '2023-12-31', '2024-01-01', '2024-01-31', '2024-03-05']
+    assert [row['key'] for row in report['top_products']] == ['p3', 'p1']
+    assert [row['key'] for row in without_numpy['all_products']] == ['p3', 'p1', 'p2', 'borrado']
+    assert [row['key'] for row in report['by_category']] == ['(sin categoría)', 'Helados', 'Paletas']
+    assert report['repeat_customers'] == {'customers': 3, 'repeat': 2, 'rate': 2 / 3}
+
+
+@pytest.mark.parametrize('n', [1, 3, 4, 10])
+def test_top_matches_without_numpy(monkeypatch, n):
+    totals = [5.0, 40.0, 0.0, 12.5]
+    expected = sorted(range(len(totals)), key=lambda i: -totals[i])[:n]
+    assert _top(np.array(totals), n) == expected
+    monkeypatch.setattr(analytics, 'np', None)
+    assert _top(totals, n) == expected
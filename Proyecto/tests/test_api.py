@@ -0,0 +1,191 @@
+import asyncio
+import http.client
+import json
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from api import MAX_BODY, ApiServer, EcommerceService
+from services import AuthManager, DataManager, PasswordHasher, ProductManager, Validator
+
+FAST = PasswordHasher(iterations=1000)  # los tests no miden el costo del hashing
+
+
+def rut(number):
+    """RUT válido con el número dado"""
+    return next(f"{number}-{dv}" for dv in "0123456789K" if Validator.validate_rut(f"{number}-{dv}"))
+
+
+class Client:
+    """Cliente HTTP de prueba contra el servidor en un puerto efímero"""
+
+    def __init__(self, server):
+        self.server = server
+
+    def request(self, method, path, body=None, token=None, raw=None):
+        conn = http.client.HTTPConnection(self.server.host, self.server.port, timeout=10)
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        data = raw if raw is not None else None if body is None else json.dumps(body).encode()
+        try:
+            conn.request(method, path, body=data, headers=headers)
+            response = conn.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            conn.close()
+
+    def login(self, email, password='secreta1'):
+        status, data = self.request('POST', '/login', {'email': email, 'password': password})
+        assert status == 200, data
+        return data['token']
+
+
+@pytest.fixture
+def client(workdir):
+    # Datos previos: un proveedor con dos productos
+    manager = DataManager('json')
+    auth = AuthManager(manager, FAST)
+    assert auth.create_user(rut(11111111), 'prov@x.cl', FAST.hash('secreta1'), 'proveedor', 'Prov')[0]
+    supplier_id = manager.find_by('users', 'email', 'prov@x.cl')[0]['id']
+    products = ProductManager(manager)
+    assert products.add_product("Helado de Limón", "ácido", 1000, 5, "Helados", "", supplier_id)[0]
+    assert products.add_product("Paleta", "frutilla", 500, 50, "Paletas", "", supplier_id)[0]
+
+    service = EcommerceService('json')
+    service.auth_manager.hasher = FAST
+    server = ApiServer(service, port=0)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    asyncio.run_coroutine_threadsafe(server.start(), loop).result(10)
+    assert server.port != 0
+    try:
+        yield Client(server)
+    finally:
+        asyncio.run_coroutine_threadsafe(server.stop(), loop).result(10)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(10)
+        loop.close()
+
+
+def product_ids(client):
+    status, data = client.request('GET', '/products')
+    assert status == 200
+    return {p['name']: p['id'] for p in data['products']}
+
+
+def register(client, number, email, user_type='cliente'):
+    return client.request('POST', '/register', {'rut': rut(number), 'email': email,
+                                                'password': 'secreta1', 'name': 'Cliente',
+                                                'type': user_type})
+
+
+def test_register_and_login(client):
+    assert register(client, 22222222, 'c@x.cl') == (200, {'ok': True, 'message': 'Usuario registrado exitosamente'})
+    assert register(client, 22222222, 'c@x.cl') == (400, {'error': 'Usuario ya existe'})
+    assert register(client, 22222222, 'otro@x.cl', 'admin')[0] == 400
+    assert client.request('POST', '/register', {'rut': '1-1', 'email': 'd@x.cl', 'password': 'secreta1',
+                                                'name': 'D'})[0] == 400
+    assert client.request('POST', '/register', {'email': 'd@x.cl'})[0] == 400
+
+    assert client.request('POST', '/login', {'email': 'c@x.cl', 'password': 'mala'})[0] == 401
+    status, data = client.request('POST', '/login', {'email': 'c@x.cl', 'password': 'secreta1'})
+    assert status == 200 and data['token'] and 'password' not in data['user']
+
+    assert client.request('POST', '/logout', token=data['token']) == (200, {'ok': True})
+    assert client.request('GET', '/cart', token=data['token'])[0] == 401
+
+
+def test_products(client):
+    status, data = client.request('GET', '/products')
+    assert status == 200 and data['total'] == 2
+    ids = product_ids(client)
+
+    assert client.request('GET', '/products?category=Paletas')[1]['total'] == 1
+    assert client.request('GET', '/products?q=LIM')[1]['products'][0]['id'] == ids['Helado de Limón']
+    assert len(client.request('GET', '/products?offset=1&limit=5')[1]['products']) == 1
+    assert client.request('GET', '/products?limit=x')[0] == 400
+    assert client.request('GET', '/products?offset=-1')[0] == 400
+
+    status, product = client.request('GET', f"/products/{ids['Paleta']}")
+    assert status == 200 and product['price'] == 500
+    assert client.request('GET', '/products/no-existe') == (404, {'error': 'Producto no encontrado'})
+
+
+def test_cart_checkout_and_reports(client):
+    assert register(client, 22222222, 'c@x.cl')[0] == 200
+    token = client.login('c@x.cl')
+    ids = product_ids(client)
+    helado, paleta = ids['Helado de Limón'], ids['Paleta']
+
+    assert client.request('GET', '/cart')[0] == 401
+    assert client.request('GET', '/cart', token='no-existe')[0] == 401
+    assert client.request('POST', '/checkout', token=token)[0] == 400
+
+    assert client.request('PUT', f'/cart/{helado}', {'quantity': 6}, token)[0] == 409
+    assert client.request('PUT', f'/cart/{helado}', {'quantity': 'dos'}, token)[0] == 400
+    assert client.request('PUT', '/cart/no-existe', {'quantity': 1}, token)[0] == 404
+    assert client.request('PUT', f'/cart/{helado}', {'quantity': 2}, token)[1]['total'] == 2000
+    status, cart = client.request('PUT', f'/cart/{paleta}', {'quantity': 4}, token)
+    assert status == 200 and cart['total'] == 4000
+    assert client.request('DELETE', f'/cart/{paleta}', token=token)[1]['total'] == 2000
+
+    assert client.request('POST', '/checkout', token=token)[0] == 200
+    assert client.request('GET', '/cart', token=token)[1] == {'items': [], 'total': 0}
+    assert client.request('GET', f'/products/{helado}')[1]['stock'] == 3
+
+    status, data = client.request('GET', '/purchases?limit=1', token=token)
+    assert status == 200 and len(data['purchases']) == 1 and data['next_cursor'] is None
+    assert client.request('GET', '/reports/sales', token=token)[0] == 403
+
+    supplier = client.login('prov@x.cl')
+    status, report = client.request('GET', '/reports/sales', token=supplier)
+    assert status == 200 and [line['quantity'] for line in report['sales']] == [2]
+    assert report['summary']['units'] == 2
+
+
+def test_protocol_errors(client):
+    assert client.request('GET', '/nada') == (404, {'error': 'Ruta no encontrada'})
+    assert client.request('GET', '/login') == (405, {'error': 'Método no permitido'})
+    assert client.request('POST', '/login', raw=b'{no es json') == (400, {'error': 'JSON inválido'})
+    assert client.request('POST', '/login', raw=b'[1, 2]')[0] == 400
+
+    # Cuerpo demasiado grande: se responde sin leerlo y se cierra la conexión
+    with socket.create_connection((client.server.host, client.server.port), timeout=10) as sock:
+        sock.sendall(f"POST /login HTTP/1.1\r\nContent-Length: {MAX_BODY + 1}\r\n\r\n".encode())
+        response = b""
+        while chunk := sock.recv(4096):
+            response += chunk
+    assert response.startswith(b"HTTP/1.1 413 ") and b"Connection: close" in response
+
+
+def test_keep_alive_connection(client):
+    conn = http.client.HTTPConnection(client.server.host, client.server.port, timeout=10)
+    try:
+        for _ in range(3):
+            conn.request('GET', '/products')
+            response = conn.getresponse()
+            assert response.status == 200 and json.loads(response.read())['total'] == 2
+    finally:
+        conn.close()
+
+
+def test_concurrent_clients_never_overbook(client):
+    helado = product_ids(client)['Helado de Limón']  # stock 5
+    for i in range(8):
+        assert register(client, 30000000 + i, f'c{i}@x.cl')[0] == 200
+
+    def buy(i):
+        token = client.login(f'c{i}@x.cl')
+        status, _ = client.request('PUT', f'/cart/{helado}', {'quantity': 1}, token)
+        if status != 200:
+            return status
+        return client.request('POST', '/checkout', token=token)[0]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        statuses = list(pool.map(buy, range(8)))
+        listings = list(pool.map(lambda _: client.request('GET', '/products')[0], range(16)))
+    assert sorted(statuses) == [200] * 5 + [409] * 3
+    assert listings == [200] * 16
+    assert client.request('GET', f'/products/{helado}')[1]['stock'] == 0
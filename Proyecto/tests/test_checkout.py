@@ -0,0 +1,46 @@
+import pytest
+
+from services import DataManager, ProductManager, SalesManager
+
+BACKENDS = ['json', 'sqlite']
+
+
+def stocks(backend):
+    return [p['stock'] for p in DataManager(backend).load_data('products')]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_checkout_rolls_back_when_stock_runs_out(seed, cart_for, backend):
+    manager, (first, second) = seed(backend, [5, 1])
+    # Otra instancia vende el último del segundo producto
+    other = DataManager(backend)
+    assert ProductManager(other).update_stock(second, 1)
+
+    sale = SalesManager(manager)._build_sale('c1', cart_for(manager, {first: 2, second: 1}))
+    assert manager.commit_checkout({first: 2, second: 1}, sale) == (False, second)
+    assert stocks(backend) == [5, 0]
+    assert DataManager(backend).load_data('sales') == []
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_checkout_reports_missing_stock(seed, cart_for, backend):
+    manager, (first, second) = seed(backend, [5, 1])
+    ok, message = SalesManager(manager).checkout('c1', cart_for(manager, {first: 1, second: 2}))
+    assert not ok and "Producto 1" in message
+    assert stocks(backend) == [5, 1]
+
+    assert SalesManager(manager).checkout('c1', cart_for(manager, {first: 5, second: 1}))[0]
+    assert stocks(backend) == [0, 0]
+
+
+def test_checkout_restores_stock_when_sale_is_not_recorded(seed, cart_for, monkeypatch):
+    manager, (first, second) = seed('json', [5, 1])
+
+    def fail(entry):
+        raise OSError("disco lleno")
+    monkeypatch.setattr(manager.storage, 'append_sales_entry', fail)
+
+    ok, _ = SalesManager(manager).checkout('c1', cart_for(manager, {first: 2, second: 1}))
+    assert not ok
+    assert stocks('json') == [5, 1]
+    assert DataManager('json').load_data('sales') == []
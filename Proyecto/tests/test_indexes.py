@@ -0,0 +1,74 @@
+import pytest
+
+from services import DataManager, ProductManager, SalesManager
+
+BACKENDS = ['json', 'sqlite']
+
+
+def index_ids(manager, file_type):
+    """Índices como {campo: {valor: ids}}, comprobando que apuntan a los registros en caché"""
+    records = manager.load_data(file_type)
+    by_id = manager._indexes[file_type]['id']
+    assert sorted(by_id) == sorted(record['id'] for record in records)
+    assert all(by_id[record['id']] is record for record in records)
+
+    snapshot = {}
+    for field in DataManager.INDEXED_FIELDS[file_type]:
+        snapshot[field] = {}
+        for value, bucket in manager._indexes[file_type][field].items():
+            assert bucket and all(by_id[record['id']] is record for record in bucket)
+            snapshot[field][value] = sorted(record['id'] for record in bucket)
+    return snapshot
+
+
+def assert_consistent(manager, backend):
+    """Los índices mantenidos en cada escritura son los que se reconstruyen al leer de cero"""
+    for file_type in ('products', 'sales'):
+        assert index_ids(manager, file_type) == index_ids(DataManager(backend), file_type)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_indexes_follow_product_changes(seed, backend):
+    manager, (first, second, third) = seed(backend, [5, 5, 5])
+    products = ProductManager(manager)
+    assert index_ids(manager, 'products')['supplier_id'] == {'s1': sorted([first, third]), 's2': [second]}
+    assert products.add_product("Nuevo", "", 10, 1, "Helados", "", "s2")[0]
+    assert_consistent(manager, backend)
+
+    # Cambio de categoría: sale del valor anterior y entra en el nuevo
+    assert products.update_product(first, "Producto 0", "", 1000, 5, "Helados", "")[0]
+    categories = index_ids(manager, 'products')['category']
+    assert first in categories['Helados'] and first not in categories['Otros']
+    assert_consistent(manager, backend)
+
+    assert products.delete_product(second)[0]
+    assert manager.get_by_id('products', second) is None
+    assert second not in index_ids(manager, 'products')['supplier_id'].get('s2', [])
+    assert_consistent(manager, backend)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_indexes_follow_sale_changes(seed, cart_for, backend):
+    manager, (first, second) = seed(backend, [50, 50])
+    sales = SalesManager(manager)
+    assert sales.make_purchase('c1', cart_for(manager, {first: 1, second: 1}))[0]
+    assert sales.checkout('c2', cart_for(manager, {second: 2}))[0]
+    assert sales.make_purchase('c1', cart_for(manager, {first: 3}))[0]
+    assert_consistent(manager, backend)
+
+    by_product = index_ids(manager, 'sales')['items.product_id']
+    assert len(by_product[first]) == 2 and len(by_product[second]) == 2
+
+    kept, deleted = manager.find_by('sales', 'customer_id', 'c1')
+    assert sales.update_sale(kept['id'], new_status='pagado', tracking_number='T1')[0]
+    assert manager.find_by('sales', 'customer_id', 'c1')[0]['payment_status'] == 'pagado'
+    assert_consistent(manager, backend)
+
+    assert sales.delete_sale(deleted['id'])[0]
+    assert [sale['id'] for sale in manager.find_by('sales', 'customer_id', 'c1')] == [kept['id']]
+    assert index_ids(manager, 'sales')['items.product_id'][first] == [kept['id']]
+    assert_consistent(manager, backend)
+
+    # Consolidar el journal reconstruye la caché con los mismos índices
+    assert manager.compact_sales()
+    assert_consistent(manager, backend)
@@ -0,0 +1,66 @@
+import pytest
+
+from services import DataManager, SalesManager
+
+BACKENDS = ['json', 'sqlite']
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_paging_cursors(seed, cart_for, backend):
+    manager, (first, second) = seed(backend, [100, 100])
+    sales = SalesManager(manager)
+    for quantity in range(1, 24):
+        assert sales.make_purchase('c1', cart_for(manager, {first: quantity, second: 1}))[0]
+    assert sales.make_purchase('c2', cart_for(manager, {first: 1}))[0]
+
+    full = sales.get_customer_purchases('c1')
+    assert len(full) == 23
+    assert [sale['date'] for sale in full] == sorted(sale['date'] for sale in full)
+
+    rows, cursor = sales.get_customer_purchases_page('c1', limit=5)
+    pages = [rows]
+    # Una venta nueva entre páginas aparece al final sin repetir ni saltar filas
+    assert sales.make_purchase('c1', cart_for(manager, {first: 1}))[0]
+    while cursor is not None:
+        rows, cursor = sales.get_customer_purchases_page('c1', cursor, limit=5)
+        pages.append(rows)
+    assert [len(page) for page in pages] == [5, 5, 5, 5, 4]
+    assert [sale for page in pages for sale in page] == sales.get_customer_purchases('c1')
+
+    # Proveedor: una fila por línea de venta, con cursores de tres partes
+    lines = sales.get_supplier_sales('s2')
+    assert len(lines) == 23
+    rows, cursor = sales.get_supplier_sales_page('s2', limit=10)
+    walked = list(rows)
+    while cursor is not None:
+        assert cursor.count("|") == 2
+        rows, cursor = sales.get_supplier_sales_page('s2', cursor, limit=10)
+        walked += rows
+    assert walked == lines
+    assert sales.get_customer_purchases_page('nadie') == ([], None)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_pages_follow_date_order_for_out_of_order_sales(seed, cart_for, backend):
+    manager, (first, second) = seed(backend, [100, 100])
+    sales = SalesManager(manager)
+    dates = ['2024-03-01T00:00:00', '2024-01-01T00:00:00', '2024-02-01T00:00:00', '2023-12-31T00:00:00']
+    for i, date in enumerate(dates):
+        sale = dict(sales._build_sale('c1', cart_for(manager, {first: 1, second: i + 1})), date=date)
+        assert manager.append_sale(sale)
+
+    # Venta con fecha anterior a las ya indexadas: se inserta en su lugar, no al final
+    expected = sorted(dates)
+    assert [sale['date'] for sale in sales.get_customer_purchases('c1')] == expected
+    rows, cursor = sales.get_customer_purchases_page('c1', limit=3)
+    rest, last = sales.get_customer_purchases_page('c1', cursor, limit=3)
+    assert [sale['date'] for sale in rows + rest] == expected and last is None
+
+    # Otra instancia lee las ventas en el orden del archivo y las ordena al indexar
+    other = SalesManager(DataManager(backend))
+    assert [sale['date'] for sale in other.get_customer_purchases('c1')] == expected
+    lines, cursor = other.get_supplier_sales_page('s2', limit=2)
+    while cursor is not None:
+        rows, cursor = other.get_supplier_sales_page('s2', cursor, limit=2)
+        lines += rows
+    assert [line['quantity'] for line in lines] == [4, 2, 3, 1]
@@ -0,0 +1,53 @@
+import hashlib
+
+import services
+from services import AuthManager, DataManager, PasswordHasher, Validator
+
+FAST = 1000  # iteraciones bajas: los tests no miden el costo
+
+
+def test_hash_and_verify():
+    hasher = PasswordHasher(iterations=FAST)
+    stored = hasher.hash('secreta1')
+    assert stored.startswith(f'pbkdf2_sha256${FAST}$')
+    assert hasher.hash('secreta1') != stored  # sal distinta en cada hash
+    assert hasher.verify('secreta1', stored) == (True, False)
+    assert hasher.verify('otra', stored) == (False, False)
+    assert hasher.verify('secreta1', None) == (False, False)
+    assert hasher.verify('secreta1', 'pbkdf2_sha256$x$zz$zz') == (False, False)
+
+
+def test_weaker_and_legacy_hashes_need_rehash():
+    hasher = PasswordHasher(iterations=FAST * 2)
+    assert hasher.verify('secreta1', PasswordHasher(iterations=FAST).hash('secreta1')) == (True, True)
+    legacy = hashlib.sha256(b'secreta1').hexdigest()
+    assert hasher.verify('secreta1', legacy) == (True, True)
+    assert hasher.verify('otra', legacy) == (False, False)
+
+
+def test_login_rehashes_legacy_password(workdir):
+    manager = DataManager('json')
+    legacy = hashlib.sha256(b'secreta1').hexdigest()
+    assert manager.save_records('users', [{'id': 'u1', 'rut': '1-9', 'email': 'a@x.cl',
+                                           'password': legacy, 'type': 'cliente', 'name': 'A'}])
+    auth = AuthManager(manager, PasswordHasher(iterations=FAST))
+
+    assert auth.login_user('a@x.cl', 'otra')[0] is False
+    assert DataManager('json').get_by_id('users', 'u1')['password'] == legacy
+
+    assert auth.login_user('a@x.cl', 'secreta1')[0]
+    stored = DataManager('json').get_by_id('users', 'u1')
+    assert stored['password'].startswith(f'pbkdf2_sha256${FAST}$')
+    assert auth.hasher.verify('secreta1', stored['password']) == (True, False)
+
+    # Ya con el hash actual: el siguiente login no vuelve a escribir
+    assert auth.login_user('a@x.cl', 'secreta1')[0]
+    assert DataManager('json').get_by_id('users', 'u1') == stored
+
+
+def test_hash_password_reuses_shared_hasher(monkeypatch):
+    shared = PasswordHasher(iterations=FAST)
+    monkeypatch.setattr(services, 'password_hasher', shared)
+    monkeypatch.setattr(services, 'PasswordHasher', None)  # no se construye uno por llamada
+    stored = Validator.hash_password('secreta1')
+    assert shared.verify('secreta1', stored) == (True, False)
@@ -0,0 +1,80 @@
+import json
+import os
+
+import pytest
+
+from services import DataManager, ProductRecord
+
+PRODUCTS = [
+    # Ids y fechas de distintos tipos: todos vuelven tal cual
+    {'id': '0c9d6723-6cf9-426d-853a-246baa30311f', 'name': 'Zapatilla', 'description': 'Talla 42',
+     'price': 19990.0, 'stock': 3, 'category': 'Calzado', 'image_path': 'data/a.jpg',
+     'supplier_id': 's1', 'created_at': '2025-06-06T12:04:58.123456',
+     'updated_at': '2025-06-07T00:00:00'},
+    {'id': 7, 'name': 'Entero', 'description': '', 'price': 1.5, 'stock': 0,
+     'category': 'Otros', 'image_path': None, 'supplier_id': 's1', 'created_at': 1700000000},
+    {'id': 'prod-42', 'name': 'Texto', 'description': 'd', 'price': 2.0, 'stock': 1,
+     'category': 'Otros', 'image_path': '', 'supplier_id': 's2',
+     'created_at': '2025-06-06T12:04:58+00:00', 'updated_at': '2025-06-06T12:04:58.000000'},
+    {'id': '0C9D6723-6CF9-426D-853A-246BAA30311F', 'name': 'UUID en mayúsculas',
+     'description': 'd', 'price': 3.0, 'stock': 2, 'category': 'Otros', 'image_path': '',
+     'supplier_id': 's2', 'created_at': '2025-06-06', 'color': 'rojo'},
+    {'id': '00000000-0000-0000-0000-000000000007', 'name': 'UUID chico', 'description': 'd',
+     'price': 4.0, 'stock': 5, 'category': 'Otros', 'image_path': '', 'supplier_id': 's2',
+     'created_at': None},
+]
+
+
+@pytest.mark.parametrize('product', PRODUCTS, ids=lambda p: str(p['id']))
+def test_record_round_trip(product):
+    record = ProductRecord(product)
+    assert dict(record) == product
+    assert record.copy() == product
+    assert list(record) == list(product)
+    assert json.loads(json.dumps(record, default=dict)) == product
+
+
+def test_values_are_stored_as_given():
+    product = dict(PRODUCTS[0], category=''.join(['Cal', 'zado']))
+    record = ProductRecord(product)
+    # Leer no decodifica nada: el mismo objeto que se guardó
+    assert record['id'] is product['id']
+    assert record['created_at'] is product['created_at']
+    # Categoría y proveedor internados: una sola copia por valor
+    assert record['category'] is ProductRecord(PRODUCTS[0])['category']
+
+    record['id'] = 8
+    assert record['id'] == 8
+    del record['created_at']
+    assert 'created_at' not in record
+    with pytest.raises(KeyError):
+        record['created_at']
+    record['created_at'] = 5
+    assert record['created_at'] == 5
+
+
+def write_products(products):
+    os.makedirs('data', exist_ok=True)
+    with open(os.path.join('data', 'products.json'), 'w', encoding='utf-8') as f:
+        json.dump(products, f)
+
+
+def test_round_trip_through_json(workdir):
+    write_products(PRODUCTS)
+    manager = DataManager('json')
+    assert [dict(p) for p in manager.load_data('products')] == PRODUCTS
+    # Guardar escribe los registros tal cual; una instancia nueva los relee iguales
+    assert manager.save_data('products', manager.load_data('products'))
+    loaded = DataManager('json').load_data('products')
+    assert all(isinstance(p, ProductRecord) for p in loaded)
+    assert [dict(p) for p in loaded] == PRODUCTS
+    with open(os.path.join('data', 'products.json'), encoding='utf-8') as f:
+        assert json.load(f) == PRODUCTS
+
+
+def test_read_only_load_leaves_data_dir_untouched(workdir):
+    write_products(PRODUCTS)
+    DataManager('json')  # crea los archivos que falten
+    before = sorted(os.listdir('data'))
+    DataManager('json').load_data('products')
+    assert sorted(os.listdir('data')) == before
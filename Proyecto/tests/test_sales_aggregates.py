@@ -0,0 +1,22 @@
+from services import DataManager, JsonStorage, SalesAggregates, SalesManager
+
+
+def test_compaction_keeps_aggregates(seed, cart_for, monkeypatch):
+    monkeypatch.setattr(JsonStorage, 'JOURNAL_COMPACT_THRESHOLD', 3)
+    monkeypatch.setattr(SalesAggregates, 'LOG_FLUSH_ENTRIES', 4)
+    rebuilds = []
+    rebuild = SalesAggregates._rebuild
+    monkeypatch.setattr(SalesAggregates, '_rebuild',
+                        lambda self: rebuilds.append(1) or rebuild(self))
+
+    manager, (first, second) = seed('json', [100, 100])
+    sales = SalesManager(manager)
+    sales.get_supplier_summary('s1')
+    for _ in range(10):
+        assert sales.checkout('c1', cart_for(manager, {first: 1, second: 2}))[0]
+
+    # Las consolidaciones automáticas no obligan a recalcular los agregados
+    assert len(rebuilds) == 1
+    assert sales.get_supplier_summary('s1')['units'] == 10
+    assert sales.get_supplier_summary('s2')['units'] == 20
+    assert SalesManager(DataManager('json')).get_supplier_summary('s2')['revenue'] == 10 * 2 * 1001
@@ -0,0 +1,63 @@
+import json
+import os
+
+from services import DataManager, SalesManager
+
+JOURNAL = os.path.join('data', 'sales.journal.jsonl')
+
+
+def read_sales_file():
+    with open(os.path.join('data', 'sales.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def journal_bytes():
+    with open(JOURNAL, 'rb') as f:
+        return f.read()
+
+
+def test_journal_replay_and_compaction(seed, cart_for):
+    manager, (first, second) = seed('json', [10, 10])
+    sales = SalesManager(manager)
+    for quantity in (1, 2, 3):
+        assert sales.make_purchase('c1', cart_for(manager, {first: quantity, second: 1}))[0]
+    kept, deleted = manager.load_data('sales')[:2]
+    assert sales.update_sale(kept['id'], new_status='pagado')[0]
+    assert sales.delete_sale(deleted['id'])[0]
+
+    # Las operaciones quedan en el journal, sales.json no se reescribe
+    assert read_sales_file() == []
+    assert len(journal_bytes().splitlines()) == 5
+    expected = [dict(sale) for sale in manager.load_data('sales')]
+    assert len(expected) == 2 and expected[0]['payment_status'] == 'pagado'
+    assert DataManager('json').load_data('sales') == expected
+
+    assert manager.compact_sales()
+    assert read_sales_file() == expected
+    assert not os.path.exists(JOURNAL) or os.path.getsize(JOURNAL) == 0
+    assert DataManager('json').load_data('sales') == expected
+
+
+def test_torn_tail_is_ignored_on_read_and_dropped_on_append(seed, cart_for):
+    manager, (first,) = seed('json', [10])
+    sales = SalesManager(manager)
+    assert sales.make_purchase('c1', cart_for(manager, {first: 1}))[0]
+    expected = [dict(sale) for sale in manager.load_data('sales')]
+
+    # Línea a medias: un append en curso de otro proceso o una caída
+    torn = b'{"op": "add", "sale": {"id": "cortada'
+    with open(JOURNAL, 'ab') as f:
+        f.write(torn)
+    before = journal_bytes()
+
+    # Leer no toca el journal
+    assert DataManager('json').load_data('sales') == expected
+    assert journal_bytes() == before
+
+    # El siguiente append (con el bloqueo) descarta la línea incompleta
+    other = DataManager('json')
+    assert SalesManager(other).make_purchase('c2', cart_for(other, {first: 2}))[0]
+    lines = journal_bytes().splitlines(keepends=True)
+    assert len(lines) == 2 and all(line.endswith(b"\n") for line in lines)
+    assert torn not in journal_bytes()
+    assert [sale['customer_id'] for sale in DataManager('json').load_data('sales')] == ['c1', 'c2']
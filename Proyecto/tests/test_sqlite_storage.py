@@ -0,0 +1,29 @@
+from services import SQLiteStorage
+
+
+def test_null_columns_are_kept(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / 'tienda.db'))
+    product = {'id': 'p1', 'name': 'Producto', 'description': None, 'price': 1000.0, 'stock': 3,
+               'category': 'Otros', 'image_path': None, 'supplier_id': 's1', 'color': 'rojo'}
+    storage.write('products', [product])
+
+    record, = storage.read('products')
+    # Todas las columnas declaradas aunque sean nulas; 'extra' solo agrega lo no declarado
+    assert set(record) == set(SQLiteStorage.TABLES['products']) | {'color'}
+    assert record['description'] is None and record['image_path'] is None
+    assert record['created_at'] is None and record['updated_at'] is None
+    assert record == dict(dict.fromkeys(SQLiteStorage.TABLES['products']), **product)
+    storage.close()
+
+
+def test_sale_without_tracking_number(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / 'tienda.db'))
+    sale = {'id': 'v1', 'customer_id': 'c1', 'total_amount': 2000, 'date': '2024-01-01T00:00:00',
+            'payment_status': 'pendiente', 'tracking_number': None,
+            'items': [{'product_id': 'p1', 'quantity': 2, 'price': 1000, 'subtotal': 2000}]}
+    storage.write('sales', [sale])
+
+    record, = storage.read('sales')
+    assert record['tracking_number'] is None and record['updated_at'] is None
+    assert record['items'] == sale['items']
+    storage.close()
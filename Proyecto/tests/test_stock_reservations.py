@@ -0,0 +1,74 @@
+import multiprocessing
+import time
+
+from services import DataManager, SalesManager, StockReservationManager
+
+
+def test_reserve_and_release(seed):
+    manager, (product,) = seed('json', [5])
+    first = StockReservationManager(manager, 'carrito-1')
+    second = StockReservationManager(DataManager('json'), 'carrito-2')
+
+    assert first.reserve(product, 3)
+    assert second.available(product) == 2
+    assert not second.reserve(product, 3)
+    assert second.reserve(product, 2)
+    # Cambiar la cantidad reemplaza la reserva propia, no la suma
+    assert not first.reserve(product, 4)
+    assert first.reserve(product, 1)
+    assert second.available(product) == 4
+
+    first.release(product)
+    assert second.available(product) == 5
+    assert first.available(product) == 3
+    second.release_all()
+    assert first.available(product) == 5
+
+
+def test_expired_reservations_are_ignored(seed):
+    manager, (product,) = seed('json', [5])
+    stale = StockReservationManager(manager, 'abandonado', ttl=0.05)
+    assert stale.reserve(product, 5)
+    other = StockReservationManager(manager, 'activo')
+    assert other.available(product) == 0
+
+    time.sleep(0.1)
+    assert other.available(product) == 5
+    assert other.reserve(product, 5)
+    # Renovar una reserva vencida no la revive
+    stale.renew_all()
+    assert other.reserved_by_others(product) == 0
+
+
+def test_checkout_respects_other_reservations(seed, cart_for):
+    manager, (product,) = seed('json', [5])
+    assert StockReservationManager(DataManager('json'), 'otro').reserve(product, 4)
+    mine = StockReservationManager(manager, 'mio')
+    assert mine.reserve(product, 1)
+
+    sales = SalesManager(manager)
+    assert not sales.checkout('c1', cart_for(manager, {product: 2}), mine)[0]
+    assert sales.checkout('c1', cart_for(manager, {product: 1}), mine)[0]
+    assert manager.get_by_id('products', product)['stock'] == 4
+    assert mine.reserved_by_others(product) == 4 and not mine._held
+
+
+def reserve_one(product, owner, start):
+    while time.time() < start:
+        pass
+    reservations = StockReservationManager(DataManager('json'), owner)
+    raise SystemExit(0 if reservations.reserve(product, 1) else 1)
+
+
+def test_concurrent_reservations_never_overbook(seed):
+    manager, (product,) = seed('json', [5])
+    # fork: los procesos heredan el directorio de trabajo del test
+    ctx = multiprocessing.get_context('fork')
+    start = time.time() + 0.2
+    workers = [ctx.Process(target=reserve_one, args=(product, f'carrito-{i}', start)) for i in range(12)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert sorted(worker.exitcode for worker in workers) == [0] * 5 + [1] * 7
+    assert StockReservationManager(manager, 'nuevo').available(product) == 0
@@ -0,0 +1,40 @@
+import os
+
+from PIL import Image
+
+from shared.images import ThumbnailCache
+
+
+def make_cache(tmp_path, **kwargs):
+    # Sin Tk: la "imagen de Tk" es la misma miniatura PIL
+    return ThumbnailCache(tmp_path / 'thumbnails', to_photo=lambda img, size: img, **kwargs)
+
+
+def test_thumbnail_reused_from_disk_until_source_changes(tmp_path):
+    source = str(tmp_path / 'foto.png')
+    Image.new('RGB', (400, 200), 'red').save(source)
+    cache = make_cache(tmp_path)
+
+    assert cache.get_image(source, (100, 100)).size == (100, 50)
+    thumbs = os.listdir(tmp_path / 'thumbnails')
+    assert len(thumbs) == 1
+    # Otra instancia (otro arranque) lee la miniatura del disco
+    assert make_cache(tmp_path).get_image(source, (100, 100)).size == (100, 50)
+    assert os.listdir(tmp_path / 'thumbnails') == thumbs
+
+    Image.new('RGB', (200, 400), 'blue').save(source)
+    os.utime(source, ns=(1, 1))
+    assert cache.get_image(source, (100, 100)).size == (50, 100)
+
+
+def test_relative_sources_and_bounded_memory(tmp_path):
+    (tmp_path / 'images').mkdir()
+    for name in 'abc':
+        Image.new('RGB', (50, 50)).save(tmp_path / 'images' / f'{name}.png')
+    cache = make_cache(tmp_path, base_dir=str(tmp_path), max_in_memory=2)
+
+    photos = {name: cache.get(f'images/{name}.png', (20, 20)) for name in 'abc'}
+    assert all(photo is not None for photo in photos.values())
+    assert cache.cached('images/a.png', (20, 20)) is None  # expulsada del LRU
+    assert cache.cached('images/c.png', (20, 20)) is photos['c']
+    assert cache.get('images/falta.png', (20, 20)) is None
@@ -0,0 +1 @@
+"""Código común a las dos tiendas (Proyecto e ICE STORE)"""
@@ -0,0 +1,184 @@
+"""Miniaturas de productos para las interfaces de Proyecto e ICE STORE.
+
+ThumbnailCache guarda en disco las miniaturas ya redimensionadas y mantiene un LRU
+acotado de imágenes de Tk; ImageLoader las decodifica en un pool de hilos y las
+entrega en el hilo de Tk. PIL y urllib se importan al cargar la primera imagen
+(desde el pool), no al arrancar la aplicación."""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_IN_MEMORY = 256
+MAX_WORKERS = 4
+POLL_MS = 30
+URL_TIMEOUT = 10
+
+
+def open_image(source):
+    from PIL import Image
+    return Image.open(source)
+
+
+def fetch_image(url):
+    from io import BytesIO
+    from urllib.request import urlopen
+    return open_image(BytesIO(urlopen(url, timeout=URL_TIMEOUT).read()))
+
+
+def photo_image(img, size):
+    """Conversión por defecto: PhotoImage de Tk"""
+    from PIL import ImageTk
+    return ImageTk.PhotoImage(img)
+
+
+class ThumbnailCache:
+    """Caché de miniaturas de productos.
+    
+    Las miniaturas se guardan en disco (clave: ruta, mtime y tamaño del original, o la
+    URL, más el tamaño pedido) y las imágenes de Tk decodificadas se mantienen en un LRU
+    acotado, así cada original se decodifica una sola vez. Las rutas relativas se
+    resuelven contra base_dir; to_photo(img, size) convierte la miniatura PIL en la
+    imagen que usa la interfaz (PhotoImage, CTkImage...)."""
+    
+    def __init__(self, cache_dir, base_dir=None, to_photo=photo_image, max_in_memory=MAX_IN_MEMORY):
+        self.cache_dir = str(cache_dir)
+        self.base_dir = base_dir
+        self.to_photo = to_photo
+        self.max_in_memory = max_in_memory
+        self._photos = OrderedDict()
+    
+    def _source(self, source):
+        """(clave del original, función que lo abre); las URL no se consultan para la clave"""
+        if source.startswith(("http://", "https://")):
+            return source, lambda: fetch_image(source)
+        path = os.path.join(self.base_dir, source) if self.base_dir is not None else source
+        stat = os.stat(path)
+        return f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}", lambda: open_image(path)
+    
+    @staticmethod
+    def _digest(raw, size):
+        return hashlib.sha1(f"{raw}|{size[0]}x{size[1]}".encode('utf-8')).hexdigest()
+    
+    def key(self, source, size):
+        """Clave estable de la miniatura; cambia si el original cambia en disco"""
+        return self._digest(self._source(source)[0], size)
+    
+    def get_image(self, source, size):
+        """Devuelve la miniatura como imagen PIL, generándola en disco si no existe"""
+        raw, opener = self._source(source)
+        thumb_path = os.path.join(self.cache_dir, self._digest(raw, size) + ".png")
+        if os.path.exists(thumb_path):
+            try:
+                img = open_image(thumb_path)
+                img.load()
+                return img
+            except OSError:
+                pass  # Miniatura dañada: regenerarla
+        
+        img = opener()
+        img.thumbnail(size)
+        if img.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'):
+            img = img.convert('RGBA')
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{thumb_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        img.save(tmp_path, format="PNG")
+        os.replace(tmp_path, thumb_path)
+        return img
+    
+    def cached(self, source, size):
+        """Devuelve la imagen de Tk si ya está en memoria, sin decodificar nada"""
+        try:
+            key = self.key(source, size)
+        except OSError:
+            return None
+        
+        photo = self._photos.get(key)
+        if photo is not None:
+            self._photos.move_to_end(key)
+        return photo
+    
+    def store(self, source, size, img):
+        """Convierte una miniatura PIL con to_photo y la guarda en el LRU (solo hilo de Tk)"""
+        photo = self.to_photo(img, size)
+        try:
+            key = self.key(source, size)
+        except OSError:
+            return photo
+        
+        self._photos[key] = photo
+        if len(self._photos) > self.max_in_memory:
+            self._photos.popitem(last=False)
+        return photo
+    
+    def get(self, source, size):
+        """Devuelve la imagen de Tk de la miniatura o None si no se puede leer"""
+        photo = self.cached(source, size)
+        if photo is not None:
+            return photo
+        
+        try:
+            return self.store(source, size, self.get_image(source, size))
+        except Exception:
+            return None
+
+
+class ImageLoader:
+    """Carga de miniaturas en segundo plano.
+    
+    Un pool de hilos decodifica y redimensiona las imágenes; los resultados se
+    recogen en el hilo de Tk con after() y se entregan a los callbacks, de modo
+    que la interfaz se pinta sin esperar a ninguna imagen."""
+    
+    def __init__(self, root, thumbnails, max_workers=MAX_WORKERS, poll_ms=POLL_MS):
+        self.root = root
+        self.thumbnails = thumbnails
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="thumbnails")
+        self._pending = {}  # (origen, tamaño) -> (future, [callbacks])
+        self._polling = False
+    
+    def request(self, source, size, callback):
+        """Pide una miniatura; callback(photo) se llama en el hilo de Tk (photo None si falla)"""
+        photo = self.thumbnails.cached(source, size)
+        if photo is not None:
+            callback(photo)
+            return
+        
+        key = (source, size)
+        if key in self._pending:
+            # Varias tarjetas con la misma imagen comparten una sola decodificación
+            self._pending[key][1].append(callback)
+            return
+        
+        future = self._executor.submit(self.thumbnails.get_image, source, size)
+        self._pending[key] = (future, [callback])
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_ms, self._poll)
+    
+    def _poll(self):
+        """Entrega las miniaturas terminadas y sigue sondeando mientras queden pendientes"""
+        for key, (future, callbacks) in list(self._pending.items()):
+            if not future.done():
+                continue
+            del self._pending[key]
+            try:
+                photo = self.thumbnails.store(key[0], key[1], future.result())
+            except Exception:
+                photo = None
+            for callback in callbacks:
+                callback(photo)
+        
+        if self._pending:
+            self.root.after(self.poll_ms, self._poll)
+        else:
+            self._polling = False
+    
+    def shutdown(self):
+        """Descarta las cargas pendientes y detiene el pool"""
+        self._pending.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)